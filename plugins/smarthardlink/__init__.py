@@ -1,12 +1,14 @@
 import datetime
-import hashlib
+import json
 import os
-import re
+import queue
+import stat
 import threading
 import traceback
 import time
+import uuid
 from pathlib import Path
-from typing import List, Tuple, Dict, Any, Optional, Set
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import pytz
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -19,6 +21,25 @@ from app.log import logger
 from app.plugins import _PluginBase
 from app.schemas.types import EventType, NotificationType
 from app.utils.system import SystemUtils
+from plugins.smarthardlink.budget import BudgetCursor, ScanBudget
+from plugins.smarthardlink.checkpoint import ScanCheckpoint
+from plugins.smarthardlink.filetable import FileTable
+from plugins.smarthardlink.hasher import DEFAULT_ALGORITHM, HashCancelled, HashEngine, available_algorithms, \
+    files_identical, hash_file, hash_sample
+from plugins.smarthardlink.hashindex import HashIndex
+from plugins.smarthardlink.linker import LinkExecutor, LinkOp, recover_journal
+from plugins.smarthardlink.metrics import RunMetrics
+from plugins.smarthardlink.pipeline import compare_bucket, plan_buckets
+from plugins.smarthardlink.report import DuplicateReport
+from plugins.smarthardlink.throttle import DiskIdleGate, RateLimiter
+from plugins.smarthardlink.walker import ExcludeMatcher, FileRecord, walk_files
+
+
+class ScanCancelled(Exception):
+    """
+    扫描任务被取消
+    """
+    pass
 
 lock = threading.Lock()
 
@@ -31,7 +52,7 @@ class smarthardlink(_PluginBase):
     # 插件图标
     plugin_icon = "https://raw.githubusercontent.com/madrays/MoviePilot-Plugins/main/icons/hardlink.png"
     # 插件版本
-    plugin_version = "1.0.5"
+    plugin_version = "1.5.0"
     # 插件作者
     plugin_author = "madrays"
     # 作者主页
@@ -55,11 +76,62 @@ class smarthardlink(_PluginBase):
     _exclude_keywords = ""
     _hash_buffer_size = 65536  # 计算哈希时的缓冲区大小，默认64KB
     _dry_run = True  # 默认为试运行模式，不实际创建硬链接
-    _hash_cache = {}  # 保存文件哈希值的缓存
+    _use_hash_index = True  # 是否使用持久化哈希索引，未变化的文件直接复用上次的哈希
+    _hash_index: Optional[HashIndex] = None  # 本次运行打开的哈希索引
+    _index_hits = 0  # 哈希索引命中次数
+    _hash_threads = 4  # 并行计算哈希的线程数
+    _per_device_threads = 1  # 每个设备（磁盘）同时读取的文件数，机械硬盘建议为1
+    _stats_lock = threading.Lock()  # 保护哈希线程更新的统计计数
+    _exclude_matcher: Optional[ExcludeMatcher] = None  # 根据排除规则预编译的匹配器
+    _report_cross_device = False  # 是否报告跨设备的疑似重复文件（仅根据文件大小，不计算哈希）
+    _cross_device_groups = 0  # 跨设备疑似重复的文件组数
+    _cross_device_bytes = 0  # 跨设备疑似重复文件中，除每组最大的一份外的总大小
+    _hash_algorithm = DEFAULT_ALGORITHM  # 哈希算法，哈希值仅用于分组，可选用更快的算法
+    _verify_before_link = False  # 创建硬链接前是否逐字节比较源文件与重复文件
+    _verify_failed_count = 0  # 逐字节比较不一致而跳过的文件数
+    _resume_scan = True  # 扫描被中断后，下次运行是否从断点继续
+    _checkpoint: Optional[ScanCheckpoint] = None  # 本次运行打开的扫描断点
+    _revalidate_before_link = False  # 文件列表来自断点时，链接前重新确认文件未变化
+    _resumed = False  # 本次运行是否从断点继续
+    _resumed_buckets = 0  # 从断点恢复时跳过的已完成文件组数
     _process_count = 0  # 处理的文件计数
     _hardlink_count = 0  # 创建的硬链接计数
     _saved_space = 0  # 节省的空间统计，单位字节
     _skipped_hardlinks_count = 0 # 新增：跳过的已存在硬链接计数
+    _hash_skipped_files = 0  # 因大小唯一而跳过哈希的文件数
+    _hash_skipped_bytes = 0  # 因大小唯一而跳过哈希的字节数
+    _sample_chunk_size = 1024 * 1024  # 抽样指纹每段读取的字节数，分别读取头/中/尾三段
+    _sample_hashed_files = 0  # 计算抽样指纹的文件数
+    _sample_bytes_read = 0  # 抽样指纹读取的字节数
+    _full_hashed_files = 0  # 计算完整哈希的文件数
+    _full_bytes_read = 0  # 完整哈希读取的字节数
+
+    _read_rate_limit = 0.0  # 哈希读取总速度上限（MB/s），0 表示不限速
+    _idle_only = False  # 是否只在磁盘空闲时读取
+    _idle_threshold = 20  # 磁盘利用率低于该值（百分比）时视为空闲
+    _rate_limiter: Optional[RateLimiter] = None  # 本次运行使用的限速器
+    _idle_gate: Optional[DiskIdleGate] = None  # 本次运行使用的磁盘空闲检测
+    _metrics: RunMetrics = RunMetrics()  # 本次运行的阶段耗时、错误计数和最慢文件/目录
+    _budget_hash_gb = 0.0  # 每次运行最多读取的哈希数据量（GB），0 表示不限
+    _budget_minutes = 0.0  # 每次运行的最长时间（分钟），0 表示不限
+    _budget: Optional[ScanBudget] = None  # 本次运行的预算
+    _budget_skipped = 0  # 因预算用尽留待下次运行的文件组数
+    _budget_priority = 0  # 本次优先处理的、位于变化目录中的文件组数
+    _report: Optional[DuplicateReport] = None  # 本次运行的重复文件组报告
+    _report_run_id = 0  # 报告中本次运行的标识
+    _link_executor: Optional[LinkExecutor] = None  # 本次运行的批量链接执行器，试运行时为空
+    _incremental_on_transfer = False  # 整理完成后是否对新入库的文件增量去重
+    _incremental_queue: "queue.Queue[List[str]]" = queue.Queue()  # 等待增量去重的路径批次
+    _incremental_thread: Optional[threading.Thread] = None  # 增量去重线程，队列为空时退出
+    _run_lock = threading.Lock()  # 完整扫描与增量去重互斥执行，二者共用计数器和哈希索引
+    _job_lock = threading.Lock()  # 保护后台扫描任务的启动
+    _job: Optional[Dict[str, Any]] = None  # 当前或最近一次后台扫描任务
+    _job_thread: Optional[threading.Thread] = None  # 执行后台扫描任务的线程
+    _cancel_event = threading.Event()  # 取消后台扫描任务，在处理每个文件前检查
+    _stop_event = threading.Event()  # 插件正在停止，此时开始的增量去重批次不会清除取消标志
+    _stop_timeout = 60  # 停止插件时等待扫描任务和增量去重退出的最长时间（秒）
+    _scan_progress: Dict[str, Any] = {}  # 当前扫描的阶段与进度
+    _last_run_summary: Optional[Dict[str, Any]] = None  # 最近一次扫描的结果摘要
 
     # 退出事件
     _event = threading.Event()
@@ -72,6 +144,9 @@ class smarthardlink(_PluginBase):
         logger.info(f"SmartHardlink init_plugin received config: {config}")
         # --- 日志结束 ---
 
+        # 停止现有任务：须在修改配置之前，运行中的任务不能看到新的哈希算法、扫描目录等配置
+        self.stop_service()
+
         # 读取配置
         if config:
             self._enabled = config.get("enabled")
@@ -100,9 +175,54 @@ class smarthardlink(_PluginBase):
                 self._hash_buffer_size = 65536
             # --- 加固结束 ---
             self._dry_run = bool(config.get("dry_run"))
+            self._use_hash_index = config.get("use_hash_index", True)
+            self._report_cross_device = bool(config.get("report_cross_device"))
+            self._hash_algorithm = config.get("hash_algorithm") or DEFAULT_ALGORITHM
+            if self._hash_algorithm not in available_algorithms():
+                logger.warning(f"哈希算法 {self._hash_algorithm} 在当前环境不可用，使用默认算法 {DEFAULT_ALGORITHM}")
+                self._hash_algorithm = DEFAULT_ALGORITHM
+            self._verify_before_link = bool(config.get("verify_before_link"))
+            self._resume_scan = config.get("resume_scan", True)
+            self._hash_threads = self._parse_positive_int(config.get("hash_threads"), 4, "hash_threads")
+            self._per_device_threads = self._parse_positive_int(config.get("per_device_threads"), 1,
+                                                                "per_device_threads")
+            read_rate_limit_val = config.get("read_rate_limit")
+            try:
+                self._read_rate_limit = max(0.0, float(read_rate_limit_val)) if read_rate_limit_val else 0.0
+            except (ValueError, TypeError):
+                logger.warning(f"无法将配置中的 read_rate_limit '{read_rate_limit_val}' 解析为数字，不限速")
+                self._read_rate_limit = 0.0
+            self._idle_only = bool(config.get("idle_only"))
+            self._idle_threshold = self._parse_positive_int(config.get("idle_threshold"), 20, "idle_threshold")
+            self._incremental_on_transfer = bool(config.get("incremental_on_transfer"))
+            budget_hash_gb_val = config.get("budget_hash_gb")
+            try:
+                self._budget_hash_gb = max(0.0, float(budget_hash_gb_val)) if budget_hash_gb_val else 0.0
+            except (ValueError, TypeError):
+                logger.warning(f"无法将配置中的 budget_hash_gb '{budget_hash_gb_val}' 解析为数字，不限制读取量")
+                self._budget_hash_gb = 0.0
+            budget_minutes_val = config.get("budget_minutes")
+            try:
+                self._budget_minutes = max(0.0, float(budget_minutes_val)) if budget_minutes_val else 0.0
+            except (ValueError, TypeError):
+                logger.warning(f"无法将配置中的 budget_minutes '{budget_minutes_val}' 解析为数字，不限制运行时长")
+                self._budget_minutes = 0.0
 
-        # 停止现有任务
-        self.stop_service()
+        # 排除规则只在配置变化时编译一次
+        self._exclude_matcher = self._build_exclude_matcher()
+
+        # 新配置已生效，允许新的任务；未能在等待时间内退出的任务保持取消状态
+        with self._job_lock:
+            self._stop_event.clear()
+            if not (self._job_thread and self._job_thread.is_alive()) and not self._run_lock.locked():
+                self._cancel_event.clear()
+
+        # 处理上次退出时未完成的链接批次；扫描仍在收尾时由下次运行处理
+        if self._run_lock.acquire(blocking=False):
+            try:
+                self._recover_link_journal()
+            finally:
+                self._run_lock.release()
 
         if self._enabled or self._onlyonce:
             # 定时服务管理器
@@ -113,7 +233,8 @@ class smarthardlink(_PluginBase):
                 logger.info("智能硬链接服务启动，立即运行一次")
                 self._scheduler.add_job(
                     name="智能硬链接",
-                    func=self.scan_and_process,
+                    func=self.start_scan_job,
+                    kwargs={"source": "立即运行一次"},
                     trigger="date",
                     run_date=datetime.datetime.now(tz=pytz.timezone(settings.TZ))
                     + datetime.timedelta(seconds=3),
@@ -144,9 +265,38 @@ class smarthardlink(_PluginBase):
                 "exclude_keywords": self._exclude_keywords,
                 "hash_buffer_size": self._hash_buffer_size,
                 "dry_run": self._dry_run,
+                "use_hash_index": self._use_hash_index,
+                "report_cross_device": self._report_cross_device,
+                "hash_algorithm": self._hash_algorithm,
+                "verify_before_link": self._verify_before_link,
+                "resume_scan": self._resume_scan,
+                "hash_threads": self._hash_threads,
+                "per_device_threads": self._per_device_threads,
+                "read_rate_limit": self._read_rate_limit,
+                "idle_only": self._idle_only,
+                "idle_threshold": self._idle_threshold,
+                "incremental_on_transfer": self._incremental_on_transfer,
+                "budget_hash_gb": self._budget_hash_gb,
+                "budget_minutes": self._budget_minutes,
             }
         )
 
+    @staticmethod
+    def _parse_positive_int(value: Any, default: int, name: str) -> int:
+        """
+        解析正整数配置项，无效时使用默认值
+        """
+        if value in (None, ""):
+            return default
+        try:
+            parsed = int(value)
+            if parsed > 0:
+                return parsed
+        except (ValueError, TypeError):
+            pass
+        logger.warning(f"无法将配置中的 {name} '{value}' 解析为正整数，使用默认值 {default}")
+        return default
+
     @eventmanager.register(EventType.PluginAction)
     def remote_scan(self, event: Event):
         """
@@ -162,40 +312,347 @@ class smarthardlink(_PluginBase):
                 userid=event.event_data.get("user"),
             )
         
-        # 记录开始时间
-        start_time = datetime.datetime.now()
-        
-        # 执行扫描和处理
-        self.scan_and_process()
-        
-        # 计算耗时
-        elapsed_time = datetime.datetime.now() - start_time
-        elapsed_seconds = elapsed_time.total_seconds()
-        elapsed_formatted = self._format_time(elapsed_seconds)
-        
-        if event:
-            # 发送美观的通知
-            title = "【✅ 智能硬链接处理完成】"
-            text = (
-                f"📢 执行结果\n"
-                f"━━━━━━━━━━\n"
-                f"🕐 时间：{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-                f"⏱️ 耗时：{elapsed_formatted}\n"
-                f"📁 文件数：{self._process_count} 个\n"
-                f"🔗 硬链接：{self._hardlink_count} 个\n"
-                f"💾 节省空间：{self._format_size(self._saved_space)}\n"
-                f"📊 处理模式：{'试运行' if self._dry_run else '实际运行'}\n"
-                f"━━━━━━━━━━"
-            )
-            
+        # 扫描在后台任务中执行，不阻塞事件处理；任务结束后回复发起命令的用户
+        event_data = event.event_data if event else None
+        started, job = self.start_scan_job(
+            source="远程命令",
+            on_finish=(lambda finished_job: self._reply_remote_scan(event_data, finished_job)) if event_data else None
+        )
+        if not started and event_data:
             self.post_message(
-                channel=event.event_data.get("channel"),
-                mtype=NotificationType.SiteMessage,
-                title=title,
-                text=text,
-                userid=event.event_data.get("user"),
+                channel=event_data.get("channel"),
+                title=f"已有扫描任务正在运行（任务ID：{job.get('id')}），请等待其结束",
+                userid=event_data.get("user"),
             )
 
+    def _reply_remote_scan(self, event_data: Dict[str, Any], job: Dict[str, Any]):
+        """
+        远程命令发起的扫描结束后回复结果，内容取自任务结束时保存的摘要
+        """
+        summary = job.get("summary") or {}
+        elapsed_formatted = self._format_time((job.get("finished_at") or time.time()) - job.get("started_at"))
+        if job.get("status") == "completed":
+            title = "【✅ 智能硬链接处理完成】"
+        elif job.get("status") == "cancelled":
+            title = "【⏹️ 智能硬链接扫描已取消】"
+        else:
+            title = "【❌ 智能硬链接处理失败】"
+        # 发送美观的通知
+        text = (
+            f"📢 执行结果\n"
+            f"━━━━━━━━━━\n"
+            f"🕐 时间：{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"⏱️ 耗时：{elapsed_formatted}\n"
+            f"📁 文件数：{summary.get('processed_files', 0)} 个\n"
+            f"🔗 硬链接：{summary.get('hardlinks_created', 0)} 个\n"
+            f"💾 节省空间：{self._format_size(summary.get('space_saved', 0))}\n"
+            f"📊 处理模式：{summary.get('mode') or '未知'}\n"
+            f"━━━━━━━━━━"
+        )
+        
+        self.post_message(
+            channel=event_data.get("channel"),
+            mtype=NotificationType.SiteMessage,
+            title=title,
+            text=text,
+            userid=event_data.get("user"),
+        )
+
+    def start_scan_job(self, source: str = "定时任务",
+                       on_finish: Optional[Callable[[Dict[str, Any]], None]] = None) -> Tuple[bool, Dict[str, Any]]:
+        """
+        在后台线程中启动扫描任务，同一时间只运行一个任务
+        :param source: 任务来源，记录在任务信息中
+        :param on_finish: 任务结束后的回调，参数为任务信息
+        :return: (是否启动了新任务, 任务信息)；已有任务运行时返回该任务
+        """
+        with self._job_lock:
+            if self._job_thread and self._job_thread.is_alive():
+                logger.info(f"扫描任务 {self._job.get('id')} 正在运行，忽略来自{source}的启动请求")
+                return False, self._job
+            self._cancel_event.clear()
+            self._job = {
+                "id": uuid.uuid4().hex[:12],
+                "source": source,
+                "status": "running",
+                "started_at": time.time(),
+                "finished_at": None,
+                "summary": None,
+            }
+            self._job_thread = threading.Thread(target=self._run_scan_job, args=(self._job, on_finish),
+                                                name="smarthardlink-job", daemon=True)
+            self._job_thread.start()
+            logger.info(f"扫描任务 {self._job['id']} 已启动（来源：{source}）")
+            return True, self._job
+
+    def _run_scan_job(self, job: Dict[str, Any], on_finish: Optional[Callable[[Dict[str, Any]], None]]):
+        """
+        后台扫描任务线程
+        """
+        try:
+            with self._run_lock:
+                # 摘要须在持有锁时读取，释放后增量去重会覆盖 _last_run_summary 和各计数器
+                self._last_run_summary = None
+                try:
+                    self.scan_and_process()
+                finally:
+                    job["summary"] = self._last_run_summary
+            status = (job["summary"] or {}).get("status", "")
+            if status.startswith("完成"):
+                job["status"] = "completed"
+            elif status.startswith("已取消"):
+                job["status"] = "cancelled"
+            else:
+                job["status"] = "failed"
+        except Exception as e:
+            job["status"] = "failed"
+            logger.error(f"扫描任务 {job['id']} 异常退出: {str(e)}\n{traceback.format_exc()}")
+        finally:
+            job["finished_at"] = time.time()
+            if on_finish:
+                try:
+                    on_finish(job)
+                except Exception as e:
+                    logger.error(f"扫描任务 {job['id']} 结束回调失败: {str(e)}")
+
+    def cancel_scan_job(self) -> bool:
+        """
+        取消正在运行的扫描任务，任务会在处理下一个文件前停止
+        :return: 是否有任务被取消
+        """
+        if not self._job_thread or not self._job_thread.is_alive():
+            return False
+        self._cancel_event.set()
+        logger.info(f"已请求取消扫描任务 {self._job.get('id')}")
+        return True
+
+    @eventmanager.register(EventType.TransferComplete)
+    def on_transfer_complete(self, event: Event):
+        """
+        整理完成后对新入库的文件增量去重
+        """
+        if not self._enabled or not self._incremental_on_transfer or not event:
+            return
+        transferinfo = (event.event_data or {}).get("transferinfo")
+        if not transferinfo or not getattr(transferinfo, "success", False):
+            return
+        target_item = getattr(transferinfo, "target_item", None)
+        if target_item and getattr(target_item, "storage", "local") != "local":
+            return
+        paths = list(getattr(transferinfo, "file_list_new", None) or [])
+        if not paths and target_item and getattr(target_item, "path", None):
+            paths = [target_item.path]
+        self.dedup_paths(paths, source="整理完成")
+
+    def dedup_paths(self, paths: List[str], source: str = "API") -> int:
+        """
+        将新文件加入增量去重队列，由后台线程依次处理
+        :param paths: 文件或目录路径，只处理位于扫描目录中的文件
+        :param source: 路径来源，用于日志
+        :return: 加入队列的路径数
+        """
+        paths = [str(path) for path in paths if path]
+        if not paths:
+            return 0
+        self._incremental_queue.put(paths)
+        logger.info(f"{source}：{len(paths)} 个路径加入增量去重队列")
+        with self._job_lock:
+            if not self._incremental_thread:
+                self._incremental_thread = threading.Thread(target=self._incremental_worker,
+                                                            name="smarthardlink-incremental", daemon=True)
+                self._incremental_thread.start()
+        return len(paths)
+
+    def _incremental_worker(self):
+        """
+        增量去重线程：合并排队中的批次后处理，队列持续为空时退出
+        """
+        while True:
+            try:
+                paths = self._incremental_queue.get(timeout=10)
+            except queue.Empty:
+                with self._job_lock:
+                    if self._incremental_queue.empty():
+                        self._incremental_thread = None
+                        return
+                continue
+            while True:
+                try:
+                    paths.extend(self._incremental_queue.get_nowait())
+                except queue.Empty:
+                    break
+            # 完整扫描运行时在此等待，避免两者同时修改哈希索引和同一批文件
+            with self._run_lock:
+                try:
+                    self.process_new_paths(list(dict.fromkeys(paths)))
+                except Exception as e:
+                    logger.error(f"增量去重失败: {str(e)}\n{traceback.format_exc()}")
+
+    def _in_scan_dirs(self, path: str) -> bool:
+        """
+        路径是否位于配置的扫描目录中
+        """
+        for scan_dir in self._scan_dirs.split("\n"):
+            scan_dir = scan_dir.strip().rstrip(os.sep)
+            if scan_dir and (path == scan_dir or path.startswith(scan_dir + os.sep)):
+                return True
+        return False
+
+    def _collect_new_files(self, paths: List[str]) -> List[FileRecord]:
+        """
+        收集新路径中符合扫描条件的文件，目录会被完整遍历
+        """
+        exclude_matcher = self._exclude_matcher or self._build_exclude_matcher()
+        records = []
+        for path in paths:
+            if not self._in_scan_dirs(path):
+                logger.debug(f"{path} 不在扫描目录中，跳过增量去重")
+                continue
+            if os.path.isdir(path):
+                if exclude_matcher.is_dir_excluded(path):
+                    continue
+                records.extend(walk_files(path, on_error=lambda p, e: logger.error(f"获取文件信息失败 {p}: {str(e)}"),
+                                          skip_dir=exclude_matcher.is_dir_excluded))
+                continue
+            try:
+                st = os.stat(path, follow_symlinks=False)
+            except OSError as e:
+                logger.error(f"获取文件信息失败 {path}: {str(e)}")
+                continue
+            if stat.S_ISREG(st.st_mode):
+                records.append(FileRecord(path, st.st_size, st.st_dev, st.st_ino, st.st_mtime_ns, st.st_nlink))
+        return [record for record in records
+                if record.size >= self._min_size * 1024 and not exclude_matcher.is_excluded(record.path)]
+
+    def process_new_paths(self, paths: List[str]):
+        """
+        增量去重：按 (设备号, 文件大小) 在哈希索引中查找候选文件，内容相同时立即将新文件替换为已有文件的硬链接；
+        没有匹配的新文件记入索引，供之后入库的文件匹配。调用方需持有 _run_lock
+        """
+        if not self._use_hash_index:
+            logger.warning("增量去重依赖哈希索引，请在设置中启用哈希索引")
+            return
+        with self._job_lock:
+            if self._stop_event.is_set():
+                logger.info(f"插件正在停止，跳过 {len(paths)} 个路径的增量去重")
+                return
+            # 在锁内清除，不会覆盖同时发出的停止请求
+            self._cancel_event.clear()
+        run_start_time = datetime.datetime.now()
+        self._reset_run_state()
+        run_id = int(time.time())
+        self._hash_index = self._open_hash_index()
+        if not self._hash_index:
+            return
+        self._report = self._open_report("增量")
+        try:
+            self._link_executor = self._open_link_executor()
+            records = self._collect_new_files(paths)
+            logger.info(f"增量去重：{len(paths)} 个路径中有 {len(records)} 个符合条件的文件")
+            for record in records:
+                if self._cancel_event.is_set():
+                    break
+                self._process_count += 1
+                try:
+                    self._dedup_new_file(record, run_id)
+                except Exception as e:
+                    logger.error(f"增量去重 {record.path} 时出错: {str(e)}")
+        finally:
+            if self._link_executor:
+                self._link_executor.flush()
+            self._hash_index.close()
+            self._hash_index = None
+            self._close_report("已取消" if self._cancel_event.is_set() else "完成", drop_if_empty=True)
+        if self._hardlink_count:
+            mode_str = "试运行" if self._dry_run else "实际运行"
+            logger.info(f"增量去重完成 ({mode_str}模式)：创建硬链接 {self._hardlink_count} 个，"
+                        f"节省空间 {self._format_size(self._saved_space)}")
+            # 只记录有结果的增量运行，避免频繁的整理事件挤占历史记录
+            self._last_run_summary = self._build_run_summary(run_start_time, f"完成 (增量{mode_str})", "")
+            self._save_link_history(self._last_run_summary)
+
+    def _dedup_new_file(self, record: FileRecord, run_id: int):
+        """
+        将单个新文件与索引中同设备、同大小的文件比较，找到内容相同的文件后替换为其硬链接
+        """
+        candidates = [candidate for candidate in self._hash_index.find_by_size(record.dev, record.size)
+                      if candidate.ino != record.ino]
+        # 新文件先记入索引，之后入库的同大小文件可以与其比较
+        self._hash_index.save(record.dev, record.ino, record.size, record.mtime_ns, record.path, run_id)
+        # 大文件先比较抽样指纹，索引中没有哈希的候选文件按需计算
+        use_sample = record.size > self._sample_chunk_size * 3
+        sample_hash = file_hash = None
+        for candidate in candidates:
+            source = FileRecord(candidate.path, candidate.size, candidate.dev, candidate.ino,
+                                candidate.mtime_ns, 0)
+            # 索引中的文件可能已被删除或修改
+            if not self._record_unchanged(source):
+                self._hash_index.remove(candidate.dev, candidate.ino)
+                continue
+            if use_sample:
+                sample_hash = sample_hash or self._get_sample_hash(record, run_id)
+                if not sample_hash:
+                    return
+                if (candidate.sample_hash or self._get_sample_hash(source, run_id)) != sample_hash:
+                    continue
+            file_hash = file_hash or self._get_full_hash(record, run_id)
+            if not file_hash:
+                return
+            if (candidate.full_hash or self._get_full_hash(source, run_id)) != file_hash:
+                continue
+            self._link_duplicate_group(file_hash, [source, record], keep_order=True)
+            if not self._dry_run:
+                # 新文件已成为源文件的硬链接，原 inode 不再存在
+                self._hash_index.remove(record.dev, record.ino)
+            return
+
+    def _update_scan_progress(self, **kwargs):
+        """
+        更新扫描进度信息
+        """
+        self._scan_progress.update(kwargs)
+
+    def get_scan_progress(self) -> Dict[str, Any]:
+        """
+        获取当前或最近一次扫描任务的进度
+        """
+        job = self._job or {}
+        progress = self._scan_progress
+        now = time.time()
+        bytes_read = self._sample_bytes_read + self._full_bytes_read
+        # 吞吐量按哈希阶段的耗时计算，遍历阶段不读取文件内容
+        hash_started_at = progress.get("hash_started_at")
+        hash_elapsed = ((job.get("finished_at") or now) - hash_started_at) if hash_started_at else 0
+        throughput = bytes_read / hash_elapsed if hash_elapsed > 0 else 0
+        # 剩余时间按已完成文件组的预计读取量占比估算（抽样指纹排除的文件不需要完整读取，故为上限）
+        eta = None
+        bytes_total = progress.get("bytes_to_hash") or 0
+        bytes_done = progress.get("bytes_hashed_estimate") or 0
+        if job.get("status") == "running" and hash_elapsed > 0 and 0 < bytes_done <= bytes_total:
+            eta = hash_elapsed * (bytes_total - bytes_done) / bytes_done
+        return {
+            "job_id": job.get("id"),
+            "status": job.get("status", "idle"),
+            "source": job.get("source"),
+            "cancel_requested": self._cancel_event.is_set(),
+            "phase": progress.get("phase"),
+            "current_path": progress.get("current_path"),
+            "elapsed": ((job.get("finished_at") or now) - job["started_at"]) if job else 0,
+            "files_walked": progress.get("files_walked", 0),
+            "files_processed": self._process_count,
+            "buckets_total": progress.get("buckets_total", 0),
+            "buckets_done": progress.get("buckets_done", 0),
+            "bytes_read": bytes_read,
+            "bytes_read_formatted": self._format_size(bytes_read),
+            "throughput": throughput,
+            "throughput_formatted": f"{self._format_size(int(throughput))}/s",
+            "eta": eta,
+            "eta_formatted": self._format_time(eta) if eta is not None else "",
+            "hardlinks": self._hardlink_count,
+            "saved_space": self._saved_space,
+            "saved_space_formatted": self._format_size(self._saved_space),
+        }
+
     @staticmethod
     def _format_time(seconds):
         """
@@ -228,53 +685,243 @@ class smarthardlink(_PluginBase):
 
     def calculate_file_hash(self, file_path):
         """
-        计算文件的SHA1哈希值
+        计算文件的哈希值
         """
-        # 检查缓存
-        if file_path in self._hash_cache:
-            return self._hash_cache[file_path]
-
         try:
-            hash_sha1 = hashlib.sha1()
-            with open(file_path, "rb") as f:
-                while True:
-                    data = f.read(self._hash_buffer_size)
-                    if not data:
-                        break
-                    hash_sha1.update(data)
-            
-            file_hash = hash_sha1.hexdigest()
-            # 保存到缓存
-            self._hash_cache[file_path] = file_hash
+            self._update_scan_progress(current_path=file_path)
+            start = time.perf_counter()
+            file_hash, bytes_read = hash_file(file_path, self._hash_buffer_size, self._hash_algorithm,
+                                              self._rate_limiter, should_stop=self._cancel_event.is_set)
+            self._metrics.record_slow("files", file_path, time.perf_counter() - start, bytes_read)
+            with self._stats_lock:
+                self._full_bytes_read += bytes_read
+                self._full_hashed_files += 1
             return file_hash
+        except HashCancelled:
+            return None
         except Exception as e:
+            self._metrics.count_error("hash")
             logger.error(f"计算文件 {file_path} 哈希值失败: {str(e)}")
             return None
 
+    def calculate_sample_hash(self, file_path: str, file_size: int) -> Optional[str]:
+        """
+        计算文件的抽样指纹，用于在同大小文件中快速排除内容不同的文件
+        """
+        try:
+            self._update_scan_progress(current_path=file_path)
+            sample_hash, bytes_read = hash_sample(file_path, file_size, self._sample_chunk_size,
+                                                  self._hash_algorithm, self._rate_limiter,
+                                                  should_stop=self._cancel_event.is_set)
+            with self._stats_lock:
+                self._sample_bytes_read += bytes_read
+                self._sample_hashed_files += 1
+            return sample_hash
+        except HashCancelled:
+            return None
+        except Exception as e:
+            self._metrics.count_error("hash")
+            logger.error(f"计算文件 {file_path} 抽样指纹失败: {str(e)}")
+            return None
+
+    def _get_sample_hash(self, record: FileRecord, run_id: int) -> Optional[str]:
+        """
+        获取文件的抽样指纹，优先从哈希索引中读取
+        """
+        if self._hash_index:
+            cached = self._hash_index.lookup(record.dev, record.ino, record.size, record.mtime_ns)
+            if cached and cached[0]:
+                with self._stats_lock:
+                    self._index_hits += 1
+                return cached[0]
+        self._wait_for_idle_disk(record.dev)
+        sample_hash = self.calculate_sample_hash(record.path, record.size)
+        if sample_hash and self._hash_index:
+            self._hash_index.save(record.dev, record.ino, record.size, record.mtime_ns, record.path, run_id,
+                                  sample_hash=sample_hash)
+        return sample_hash
+
+    def _get_full_hash(self, record: FileRecord, run_id: int) -> Optional[str]:
+        """
+        获取文件的完整哈希，优先从哈希索引中读取
+        """
+        if self._hash_index:
+            cached = self._hash_index.lookup(record.dev, record.ino, record.size, record.mtime_ns)
+            if cached and cached[1]:
+                with self._stats_lock:
+                    self._index_hits += 1
+                return cached[1]
+        self._wait_for_idle_disk(record.dev)
+        file_hash = self.calculate_file_hash(record.path)
+        if file_hash and self._hash_index:
+            self._hash_index.save(record.dev, record.ino, record.size, record.mtime_ns, record.path, run_id,
+                                  full_hash=file_hash)
+        return file_hash
+
+    def _wait_for_idle_disk(self, dev: int):
+        """
+        开启空闲检测时，读取文件前等待所在磁盘空闲
+        """
+        if not self._idle_gate:
+            return
+        waited = self._idle_gate.wait_until_idle(dev, should_stop=self._cancel_event.is_set)
+        if waited:
+            logger.info(f"磁盘 {os.major(dev)}:{os.minor(dev)} 繁忙，已等待 {self._format_time(waited)}")
+
+    @staticmethod
+    def _hash_task(func, record: FileRecord, run_id: int) -> Optional[str]:
+        """
+        在哈希线程中执行的任务，异常只记录日志，不中断整个扫描
+        """
+        try:
+            return func(record, run_id)
+        except Exception as e:
+            logger.error(f"处理文件 {record.path} 时出错: {str(e)}")
+            return None
+
+    def _open_hash_index(self) -> Optional[HashIndex]:
+        """
+        打开插件数据目录下的哈希索引
+        """
+        if not self._use_hash_index:
+            return None
+        try:
+            return HashIndex(str(self.get_data_path() / "hash_index.db"), self._hash_algorithm)
+        except Exception as e:
+            logger.error(f"打开哈希索引失败，本次将不使用索引: {str(e)}")
+            return None
+
+    def _open_report(self, kind: str, checkpoint_id: Optional[int] = None,
+                     resume: bool = False) -> Optional[DuplicateReport]:
+        """
+        打开插件数据目录下的重复文件组报告，并开始记录本次运行
+        :param kind: 完整扫描或增量
+        :param checkpoint_id: 完整扫描断点的运行标识
+        :param resume: 是否从断点继续，是则沿用同一份报告
+        """
+        try:
+            report = DuplicateReport(str(self.get_data_path() / "duplicate_report.db"))
+            self._report_run_id = report.start_run(kind, "试运行" if self._dry_run else "实际运行",
+                                                   checkpoint_id, resume)
+        except Exception as e:
+            logger.error(f"打开重复文件组报告失败，本次将不保存报告: {str(e)}")
+            return None
+        return report
+
+    def _close_report(self, status: str, drop_if_empty: bool = False):
+        """
+        结束本次运行的报告并关闭
+        """
+        if not self._report:
+            return
+        try:
+            self._report.finish_run(self._report_run_id, status, drop_if_empty)
+            self._report.close()
+        except Exception as e:
+            logger.error(f"保存重复文件组报告失败: {str(e)}")
+        self._report = None
+
+    def _recover_link_journal(self):
+        """
+        根据意图日志完成或撤销上次中断的链接操作
+        """
+        try:
+            replayed, rolled_back = recover_journal(str(self.get_data_path() / "link_journal.jsonl"))
+        except Exception as e:
+            logger.error(f"处理链接意图日志失败: {str(e)}")
+            return
+        if replayed or rolled_back:
+            logger.warning(f"上次链接过程被中断，已完成 {replayed} 个、撤销 {rolled_back} 个未完成的链接操作")
+
+    def _open_link_executor(self) -> Optional[LinkExecutor]:
+        """
+        处理中断的链接批次后创建本次运行的批量链接执行器，试运行不需要
+        """
+        self._recover_link_journal()
+        if self._dry_run:
+            return None
+        return LinkExecutor(str(self.get_data_path() / "link_journal.jsonl"), self._on_link_result)
+
+    def _on_link_result(self, op: LinkOp, error: Optional[str]):
+        """
+        批量链接中每个操作完成后的回调
+        """
+        if error:
+            self._metrics.count_error("link")
+            logger.error(f"  创建硬链接失败 {op.target}: {error}")
+            return
+        logger.info(f"  已创建硬链接: {op.target} -> {op.source}")
+        self._hardlink_count += 1
+        self._saved_space += op.size
+
+    def _open_checkpoint(self) -> Optional[ScanCheckpoint]:
+        """
+        打开插件数据目录下的扫描断点
+        """
+        if not self._resume_scan:
+            return None
+        try:
+            return ScanCheckpoint(str(self.get_data_path() / "checkpoint.db"))
+        except Exception as e:
+            logger.error(f"打开扫描断点失败，本次将不记录断点: {str(e)}")
+            return None
+
+    def _checkpoint_fingerprint(self, scan_dirs: List[str]) -> str:
+        """
+        影响扫描结果的配置指纹，配置变化后旧断点失效
+        """
+        return json.dumps([scan_dirs, self._min_size, self._exclude_dirs, self._exclude_extensions,
+                           self._exclude_keywords, self._hash_algorithm, self._dry_run], ensure_ascii=False)
+
+    @staticmethod
+    def _record_unchanged(record: FileRecord) -> bool:
+        """
+        文件自遍历以来是否未发生变化
+        """
+        try:
+            st = os.stat(record.path, follow_symlinks=False)
+        except OSError:
+            return False
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns) == \
+            (record.dev, record.ino, record.size, record.mtime_ns)
+
+    def _build_exclude_matcher(self) -> ExcludeMatcher:
+        """
+        根据当前配置编译排除规则
+        """
+        return ExcludeMatcher(
+            exclude_dirs=self._exclude_dirs.split("\n") if self._exclude_dirs else (),
+            exclude_extensions=self._exclude_extensions.split(",") if self._exclude_extensions else (),
+            exclude_keywords=self._exclude_keywords.split("\n") if self._exclude_keywords else (),
+            on_invalid=lambda keyword, e: logger.warning(f"排除关键词 '{keyword}' 不是有效的正则表达式，已忽略: {e}")
+        )
+
     def is_excluded(self, file_path: str) -> bool:
         """
         检查文件是否应该被排除
         """
-        # 检查排除目录
-        if self._exclude_dirs:
-            for exclude_dir in self._exclude_dirs.split("\n"):
-                if exclude_dir and file_path.startswith(exclude_dir):
-                    return True
-
-        # 检查排除文件扩展名
-        if self._exclude_extensions:
-            file_ext = os.path.splitext(file_path)[1].lower()
-            extensions = [f".{ext.strip().lower()}" for ext in self._exclude_extensions.split(",")]
-            if file_ext in extensions:
-                return True
-
-        # 检查排除关键词
-        if self._exclude_keywords:
-            for keyword in self._exclude_keywords.split("\n"):
-                if keyword and re.findall(keyword, file_path):
-                    return True
+        if not self._exclude_matcher:
+            self._exclude_matcher = self._build_exclude_matcher()
+        return self._exclude_matcher.is_excluded(file_path)
 
-        return False
+    def _report_cross_device_candidates(self, candidates: List[Tuple[int, Dict[int, str]]],
+                                        max_log_groups: int = 20):
+        """
+        仅根据遍历得到的 stat 信息，报告分布在不同设备上的同大小文件。
+        这些文件即使内容相同也无法硬链接，因此不计算哈希，只作为参考
+        :param candidates: [(file_size, {st_dev: 该设备上的一个示例路径}), ...]
+        """
+        candidates.sort(key=lambda x: x[0], reverse=True)
+        for file_size, devices in candidates:
+            self._cross_device_groups += 1
+            self._cross_device_bytes += file_size * (len(devices) - 1)
+        if not candidates:
+            return
+        logger.info(f"发现 {self._cross_device_groups} 组跨设备的同大小文件（可能重复但无法硬链接），"
+                    f"涉及 {self._format_size(self._cross_device_bytes)}")
+        for file_size, devices in candidates[:max_log_groups]:
+            paths = list(devices.values())
+            logger.info(f"  跨设备同大小文件 ({self._format_size(file_size)}): {' | '.join(paths)}")
 
     def _save_link_history(self, summary: Dict[str, Any]):
         """
@@ -294,6 +941,107 @@ class smarthardlink(_PluginBase):
         except Exception as e:
             logger.error(f"保存硬链接历史记录失败: {str(e)}", exc_info=True)
 
+    def _reset_run_state(self):
+        """
+        重置单次运行的计数器、进度和读取限速
+        """
+        self._process_count = 0
+        self._hardlink_count = 0
+        self._saved_space = 0
+        self._index_hits = 0
+        self._cross_device_groups = 0
+        self._cross_device_bytes = 0
+        self._verify_failed_count = 0
+        self._resumed = False
+        self._resumed_buckets = 0
+        self._revalidate_before_link = False
+        self._skipped_hardlinks_count = 0 # 重置跳过计数
+        self._hash_skipped_files = 0
+        self._hash_skipped_bytes = 0
+        self._sample_hashed_files = 0
+        self._sample_bytes_read = 0
+        self._full_hashed_files = 0
+        self._full_bytes_read = 0
+        self._scan_progress = {"phase": "walk", "files_walked": 0}
+        self._metrics = RunMetrics()
+        self._rate_limiter = RateLimiter(self._read_rate_limit * 1024 * 1024) if self._read_rate_limit else None
+        self._idle_gate = DiskIdleGate(self._idle_threshold) if self._idle_only else None
+        self._budget = None
+        self._budget_skipped = 0
+        self._link_executor = None
+        self._budget_priority = 0
+
+    def _effective_read_rate(self) -> float:
+        """
+        本次运行哈希阶段的实际平均读取速度（字节/秒），包含限速和等待磁盘空闲的时间
+        """
+        hash_started_at = self._scan_progress.get("hash_started_at")
+        if not hash_started_at:
+            return 0.0
+        elapsed = time.time() - hash_started_at
+        return round((self._sample_bytes_read + self._full_bytes_read) / elapsed, 1) if elapsed > 0 else 0.0
+
+    def _build_perf_summary(self) -> Dict[str, Any]:
+        """
+        本次运行的性能统计，用于定位遍历、哈希或链接中的瓶颈
+        """
+        perf = self._metrics.to_dict()
+        bytes_hashed = self._sample_bytes_read + self._full_bytes_read
+        hash_seconds = self._metrics.phase_time("hash")
+        hash_lookups = self._index_hits + self._sample_hashed_files + self._full_hashed_files
+        perf.update({
+            "files_stat": self._scan_progress.get("files_walked", 0),
+            "bytes_hashed": bytes_hashed,
+            "hash_rate": round(bytes_hashed / hash_seconds, 1) if hash_seconds > 0 else 0.0,
+            "cache_hit_rate": round(self._index_hits / hash_lookups, 4) if hash_lookups else 0.0,
+        })
+        return perf
+
+    def _build_run_summary(self, run_start_time: datetime.datetime, run_status: str,
+                           error_message: str) -> Dict[str, Any]:
+        """
+        构建本次运行的历史记录摘要
+        """
+        run_end_time = datetime.datetime.now()
+        return {
+            "start_time": run_start_time.strftime('%Y-%m-%d %H:%M:%S'),
+            "end_time": run_end_time.strftime('%Y-%m-%d %H:%M:%S'),
+            "duration": self._format_time((run_end_time - run_start_time).total_seconds()),
+            "status": run_status,
+            "processed_files": self._process_count,
+            "hardlinks_created": self._hardlink_count, # Record count even in dry run
+            "skipped_hardlinks": self._skipped_hardlinks_count, # 添加跳过计数
+            "space_saved": self._saved_space,
+            "space_saved_formatted": self._format_size(self._saved_space), # Record saved space even in dry run
+            "hash_skipped_files": self._hash_skipped_files,
+            "hash_skipped_bytes": self._hash_skipped_bytes,
+            "hash_skipped_bytes_formatted": self._format_size(self._hash_skipped_bytes),
+            "sample_hashed_files": self._sample_hashed_files,
+            "sample_bytes_read": self._sample_bytes_read,
+            "full_hashed_files": self._full_hashed_files,
+            "full_bytes_read": self._full_bytes_read,
+            "hash_index_hits": self._index_hits,
+            "cross_device_groups": self._cross_device_groups,
+            "cross_device_bytes": self._cross_device_bytes,
+            "hash_algorithm": self._hash_algorithm,
+            "verify_failed": self._verify_failed_count,
+            "resumed": self._resumed,
+            "resumed_buckets": self._resumed_buckets,
+            "read_rate_limit": self._read_rate_limit,
+            "throttle_wait": round(self._rate_limiter.waited, 1) if self._rate_limiter else 0,
+            "idle_only": self._idle_only,
+            "idle_threshold": self._idle_threshold,
+            "idle_wait": round(self._idle_gate.waited, 1) if self._idle_gate else 0,
+            "effective_read_rate": self._effective_read_rate(),
+            "budget_exhausted": bool(self._budget and self._budget.reason),
+            "budget_reason": self._budget.reason if self._budget else None,
+            "budget_skipped_buckets": self._budget_skipped,
+            "budget_priority_buckets": self._budget_priority,
+            "perf": self._build_perf_summary(),
+            "mode": "试运行" if self._dry_run else "实际运行",
+            "error": error_message
+        }
+
     def scan_and_process(self):
         """
         扫描目录并处理重复文件
@@ -301,13 +1049,12 @@ class smarthardlink(_PluginBase):
         run_start_time = datetime.datetime.now() # Record start time for duration
         run_status = "失败" # Default status
         error_message = ""
+        budget_cursor = None
         try:
             # 重置计数器
-            self._process_count = 0
-            self._hardlink_count = 0
-            self._saved_space = 0
-            self._hash_cache = {}
-            self._skipped_hardlinks_count = 0 # 重置跳过计数
+            self._reset_run_state()
+            # 分片扫描：哈希读取量或运行时长达到预算后不再处理新的文件组，剩余部分由后续运行按游标继续
+            self._budget = ScanBudget(int(self._budget_hash_gb * 1024 * 1024 * 1024), self._budget_minutes * 60)
             
             logger.info("开始扫描目录并处理重复文件 ...")
             logger.warning("提醒：本插件仍处于开发试验阶段，请确保数据安全")
@@ -317,108 +1064,267 @@ class smarthardlink(_PluginBase):
                 run_status = "失败 (未配置目录)"
                 error_message = "未配置扫描目录"
                 # --- 在此处也保存历史记录 ---
-                run_end_time = datetime.datetime.now()
-                self._save_link_history({
-                    "start_time": run_start_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    "end_time": run_end_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    "duration": self._format_time((run_end_time - run_start_time).total_seconds()),
-                    "status": run_status,
-                    "processed_files": self._process_count,
-                    "hardlinks_created": self._hardlink_count,
-                    "skipped_hardlinks": self._skipped_hardlinks_count,
-                    "space_saved": self._saved_space,
-                    "space_saved_formatted": self._format_size(self._saved_space),
-                    "mode": "试运行" if self._dry_run else "实际运行",
-                    "error": error_message
-                })
+                self._save_link_history(self._build_run_summary(run_start_time, run_status, error_message))
                 # --- 历史保存结束 ---
                 return
             
             scan_dirs = self._scan_dirs.split("\n")
             
-            # 第一步：收集所有文件并计算哈希值
-            file_hashes = {}  # {hash: [(file_path, file_size), ...]}
-            all_files = []  # 存储所有符合条件的文件路径和大小
+            # 打开哈希索引，本次运行的标识用于标记仍然存在的文件
+            run_id = int(time.time())
+            self._hash_index = self._open_hash_index()
+            budget_cursor = self._open_budget_cursor() if self._budget.enabled else None
+            walk_complete = True  # 所有扫描目录是否都完整遍历，否则不能清理索引
+            
+            # 读取断点：配置未变化时跳过已遍历的目录和已完成的文件组，沿用中断前的运行标识
+            walked_dirs = set()  # 断点中已完整遍历的扫描目录
+            done_buckets = set()  # 断点中已完成的 (设备号, 文件大小)
+            self._checkpoint = self._open_checkpoint()
+            if self._checkpoint:
+                fingerprint = self._checkpoint_fingerprint(scan_dirs)
+                checkpoint_meta = self._checkpoint.load(fingerprint)
+                if checkpoint_meta:
+                    self._resumed = True
+                    run_id = checkpoint_meta.get("run_id") or run_id
+                    walked_dirs = set(checkpoint_meta.get("walked_dirs") or [])
+                    done_buckets = self._checkpoint.done_buckets()
+                    logger.info(f"从断点继续扫描：已遍历 {len(walked_dirs)} 个扫描目录，"
+                                f"已完成 {len(done_buckets)} 组同大小文件")
+                else:
+                    self._checkpoint.start(fingerprint, run_id)
+            # 从断点继续时沿用同一份报告
+            self._report = self._open_report("完整扫描", checkpoint_id=run_id, resume=self._resumed)
+            self._link_executor = self._open_link_executor()
+            
+            # 第一步：收集所有符合条件的文件
+            file_table = FileTable()  # 按列紧凑存储所有符合条件的文件
+            
+            walk_errors = []  # 遍历时无法访问的路径
+            dir_mtimes = {} if budget_cursor else None  # 分片扫描时记录遍历到的目录的修改时间
+            exclude_matcher = self._exclude_matcher or self._build_exclude_matcher()
+            
+            def on_walk_error(path: str, error: OSError):
+                walk_errors.append(path)
+                self._metrics.count_error("walk")
+                logger.error(f"获取文件信息失败 {path}: {str(error)}")
+            
+            resumed_bucket_count = len(done_buckets)
             
             # 首先收集所有文件信息，避免在遍历时计算哈希
+            files_walked = 0
+            walk_started = time.perf_counter()
             for scan_dir in scan_dirs:
+                if self._cancel_event.is_set():
+                    raise ScanCancelled()
                 if not scan_dir or not os.path.exists(scan_dir):
                     logger.warning(f"扫描目录不存在: {scan_dir}")
+                    if scan_dir:
+                        walk_complete = False
+                    continue
+                    
+                if exclude_matcher.is_dir_excluded(scan_dir):
+                    logger.info(f"扫描目录 {scan_dir} 位于排除目录中，跳过")
+                    continue
+                
+                if scan_dir in walked_dirs:
+                    # 断点中的文件信息可能已过时，链接前需要重新确认
+                    dir_start = len(file_table)
+                    file_table.extend(self._checkpoint.load_walked_dir(scan_dir))
+                    files_walked += len(file_table) - dir_start
+                    self._update_scan_progress(files_walked=files_walked)
+                    self._revalidate_before_link = True
+                    logger.info(f"扫描目录 {scan_dir} 已在断点中完成遍历，读取 {len(file_table) - dir_start} 个文件")
                     continue
                     
                 logger.info(f"扫描目录: {scan_dir}")
                 file_count = 0
+                dir_start = len(file_table)
+                dir_errors = len(walk_errors)
                 
                 try:
-                    for root, dirs, files in os.walk(scan_dir):
+                    for record in walk_files(scan_dir, on_error=on_walk_error,
+                                             skip_dir=exclude_matcher.is_dir_excluded,
+                                             on_dir_done=lambda path, seconds, count:
+                                             self._metrics.record_slow("dirs", path, seconds, count),
+                                             dir_mtimes=dir_mtimes):
+                        if self._cancel_event.is_set():
+                            break
+                        file_count += 1
+                        files_walked += 1
                         # 定期报告进度
-                        if file_count > 0 and file_count % 1000 == 0:
+                        if file_count % 1000 == 0:
                             logger.info(f"目录 {scan_dir} 已发现 {file_count} 个文件")
-                            
-                        for file_name in files:
-                            file_count += 1
-                            file_path = os.path.join(root, file_name)
-                            
-                            # 跳过符号链接
-                            if os.path.islink(file_path):
-                                continue
-                                
-                            # 检查排除条件
-                            if self.is_excluded(file_path):
-                                continue
-                                
-                            try:
-                                # 检查文件大小
-                                file_size = os.path.getsize(file_path)
-                                if file_size < self._min_size * 1024:  # 转换为字节
-                                    continue
-                                    
-                                # 添加到待处理文件列表
-                                all_files.append((file_path, file_size))
-                                
-                            except Exception as e:
-                                logger.error(f"获取文件信息失败 {file_path}: {str(e)}")
+                            self._update_scan_progress(files_walked=files_walked, current_path=record.path)
+                        
+                        # 检查文件大小
+                        if record.size < self._min_size * 1024:  # 转换为字节
+                            continue
+                        
+                        # 检查排除条件
+                        if exclude_matcher.is_excluded(record.path):
+                            continue
+                        
+                        # 添加到待处理文件列表
+                        file_table.append(record)
+                        # 重新遍历的目录中的文件可能未参与断点中已完成文件组的比较，这些组需要重新比较
+                        if done_buckets:
+                            done_buckets.discard((record.dev, record.size))
                     
+                    if self._cancel_event.is_set():
+                        raise ScanCancelled()
                     logger.info(f"目录 {scan_dir} 扫描完成，共发现 {file_count} 个文件")
+                    self._update_scan_progress(files_walked=files_walked)
+                    # 完整遍历且没有出错的目录记入断点，恢复时无需再次遍历
+                    if self._checkpoint and len(walk_errors) == dir_errors:
+                        self._checkpoint.save_walked_dir(scan_dir, file_table.iter_records(dir_start))
+                except ScanCancelled:
+                    raise
                 except Exception as e:
+                    walk_complete = False
                     logger.error(f"扫描目录 {scan_dir} 时出错: {str(e)}")
             
+            self._metrics.add_time("walk", time.perf_counter() - walk_started)
+            if resumed_bucket_count > len(done_buckets):
+                logger.info(f"重新遍历的目录中有文件属于断点中已完成的文件组，"
+                            f"其中 {resumed_bucket_count - len(done_buckets)} 组将重新比较")
+            
+            if walk_errors:
+                walk_complete = False
+                logger.warning(f"遍历过程中有 {len(walk_errors)} 个目录或文件无法访问")
+            
             # 报告收集到的文件总数
-            total_files = len(all_files)
-            logger.info(f"符合条件的文件总数: {total_files}")
+            logger.info(f"符合条件的文件总数: {len(file_table)}，"
+                        f"文件表占用内存约 {self._format_size(file_table.nbytes())}")
             
-            # 根据文件大小排序，优先处理大文件，可以更快发现重复文件节省空间
-            all_files.sort(key=lambda x: x[1], reverse=True)
+            # 分片扫描时找出自上次访问后变化的目录，其中的文件优先处理
+            changed_dirs = {}  # {目录编号: (目录路径, 修改时间)}
+            priority_buckets = set()  # {(文件大小, 设备号), ...}，包含变化目录中文件或之前未处理完的优先文件组
+            if budget_cursor:
+                changed_dirs = self._find_changed_dirs(file_table, budget_cursor, walk_complete, dir_mtimes)
+                priority_buckets = budget_cursor.pending_buckets()
+                logger.info(f"分片扫描：{file_table.dir_count()} 个目录中有 {len(changed_dirs)} 个自上次访问后发生变化")
             
-            # 处理文件并计算哈希值
-            for idx, (file_path, file_size) in enumerate(all_files):
-                # 定期报告进度
-                if idx > 0 and (idx % 100 == 0 or idx == total_files - 1):
-                    logger.info(f"已处理 {idx}/{total_files} 个文件 ({(idx/total_files*100):.1f}%)")
-                
-                try:
-                    # 计算哈希值
-                    file_hash = self.calculate_file_hash(file_path)
-                    if not file_hash:
+            # 记录仍然存在的文件，新文件只保存 stat 信息，供增量去重按大小查找
+            if self._hash_index:
+                with self._metrics.phase("index"):
+                    self._hash_index.save_seen(
+                        ((file_table.dev[idx], file_table.ino[idx], file_table.size[idx], file_table.mtime_ns[idx],
+                          file_table.path(idx)) for idx in range(len(file_table))), run_id)
+            
+            # 第一阶段：按 (设备号, 文件大小) 分组，整个流程按设备分区，同一设备上大小唯一的文件
+            # 不可能有可硬链接的重复文件，无需计算哈希；只有需要比较的文件才还原为 FileRecord
+            if self._checkpoint:
+                self._checkpoint.set_phase("hash")
+            group_started = time.perf_counter()
+            size_buckets = self._plan_buckets(file_table, done_buckets, changed_dirs, priority_buckets)
+            # 分组完成后不再需要完整的文件表
+            del file_table
+            total_buckets = len(size_buckets)
+            if self._resumed_buckets:
+                logger.info(f"跳过断点中已完成的 {self._resumed_buckets} 组同大小文件")
+            logger.info(f"大小唯一或已完全硬链接的文件 {self._hash_skipped_files} 个，"
+                        f"跳过哈希 {self._format_size(self._hash_skipped_bytes)}，"
+                        f"需进一步比较 {total_buckets} 组同大小文件")
+            
+            # 根据文件大小排序，优先处理大文件，可以更快发现重复文件节省空间（从列表末尾依次取出）
+            if budget_cursor:
+                cursor = budget_cursor.get_cursor()
+                # 之前记录的优先文件组可能已不存在
+                priority_buckets.intersection_update((file_size, groups[0][0].dev) for file_size, groups in size_buckets)
+                self._budget_priority = len(priority_buckets)
+                self._order_budget_buckets(size_buckets, priority_buckets, cursor)
+                logger.info(f"分片扫描：优先处理变化目录中的 {len(priority_buckets)} 组文件，其余"
+                            + (f"从 {self._format_size(cursor[0])} 的文件组继续" if cursor else "开始新一轮"))
+            else:
+                size_buckets.sort(key=lambda x: x[0])
+            self._metrics.add_time("group", time.perf_counter() - group_started)
+            # 预计读取量按每个 inode 完整读取一次计算，用于估算剩余时间
+            self._update_scan_progress(
+                phase="hash", buckets_total=total_buckets, buckets_done=0, hash_started_at=time.time(),
+                bytes_to_hash=sum(file_size * len(groups) for file_size, groups in size_buckets),
+                bytes_hashed_estimate=0)
+            
+            def drain_buckets():
+                # 哈希引擎在有空闲线程时才按需取出下一组，取出即从列表中移除，处理完的组随即释放；
+                # 取消后不再取出新的组
+                while size_buckets and not self._cancel_event.is_set():
+                    file_size, groups = size_buckets.pop()
+                    yield groups[0][0].dev, groups
+            
+            # 第二步：流水线处理。每个同大小文件组作为一个任务，在其所在设备上依次计算抽样指纹和完整哈希；
+            # 组内哈希完成后立即通过有界队列交给链接线程，无需等待整个扫描结束，内存占用只与在途的组有关；
+            # 链接线程处理完一组后将其记入断点
+            hash_started = time.perf_counter()
+            hash_engine = HashEngine(self._hash_threads, self._per_device_threads)
+            link_queue = queue.Queue(maxsize=self._hash_threads * 2)
+            linker = threading.Thread(target=self._link_worker, args=(link_queue,),
+                                      name="smarthardlink-link", daemon=True)
+            linker.start()
+            duplicate_count = 0
+            buckets_done = 0
+            budget_skipped = []  # 因预算用尽未处理的 (文件大小, 设备号)
+            try:
+                for groups, result in hash_engine.run(drain_buckets(),
+                                                      lambda groups: self._hash_bucket(groups, run_id),
+                                                      should_stop=self._cancel_event.is_set):
+                    if result is None:
+                        # 任务被取消或预算用尽，该组未处理完
+                        if not self._cancel_event.is_set():
+                            budget_skipped.append((groups[0][0].size, groups[0][0].dev))
                         continue
-                        
-                    # 记录文件信息
-                    if file_hash not in file_hashes:
-                        file_hashes[file_hash] = []
-                    file_hashes[file_hash].append((file_path, file_size))
-                    
-                    self._process_count += 1
-                except Exception as e:
-                    logger.error(f"处理文件 {file_path} 时出错: {str(e)}")
+                    buckets_done += 1
+                    # 定期报告进度
+                    if buckets_done % 100 == 0 or buckets_done == total_buckets:
+                        logger.info(f"已比较 {buckets_done}/{total_buckets} 组同大小文件 "
+                                    f"({(buckets_done/total_buckets*100):.1f}%)")
+                    self._update_scan_progress(
+                        buckets_done=buckets_done,
+                        bytes_hashed_estimate=self._scan_progress.get("bytes_hashed_estimate", 0)
+                        + groups[0][0].size * len(groups))
+                    processed, duplicate_groups = result
+                    self._process_count += processed
+                    duplicate_count += sum(len(files) - 1 for _, files in duplicate_groups)
+                    # 队列已满时在此等待，避免哈希结果堆积
+                    link_queue.put(((groups[0][0].dev, groups[0][0].size), duplicate_groups))
+            finally:
+                link_queue.put(None)
+                linker.join()
+                # 哈希阶段为流水线的总耗时，其中与之并行的链接耗时另行统计
+                self._metrics.add_time("hash", time.perf_counter() - hash_started)
+            if self._cancel_event.is_set():
+                raise ScanCancelled()
+            
+            if budget_cursor:
+                self._budget_skipped = len(budget_skipped)
+                self._save_budget_cursor(budget_cursor, cursor, budget_skipped, priority_buckets, changed_dirs)
+            budget_note = f"，{self._budget.reason}预算用尽" if self._budget.reason else ""
+            
+            if self._idle_gate and self._idle_gate.unsupported_devices:
+                logger.warning("以下设备在 /proc/diskstats 中没有统计信息，未进行空闲检测: " + ", ".join(
+                    f"{os.major(dev)}:{os.minor(dev)}" for dev in self._idle_gate.unsupported_devices))
+            logger.info(f"抽样指纹：{self._sample_hashed_files} 个文件，读取 {self._format_size(self._sample_bytes_read)}；"
+                        f"完整哈希：{self._full_hashed_files} 个文件，读取 {self._format_size(self._full_bytes_read)}；"
+                        f"哈希索引命中 {self._index_hits} 次")
+            
+            # 清理索引中已不存在的文件，仅在所有目录都完整遍历时执行，避免误删
+            if self._hash_index:
+                with self._metrics.phase("index"):
+                    if walk_complete:
+                        pruned = self._hash_index.prune(run_id)
+                        logger.info(f"哈希索引已清理 {pruned} 条失效记录")
+                    else:
+                        self._hash_index.commit()
+            
+            # 扫描正常结束，清除断点
+            if self._checkpoint:
+                self._checkpoint.clear()
             
-            # 找出重复文件的数量
-            duplicate_count = sum(len(files) - 1 for files in file_hashes.values() if len(files) > 1)
             logger.info(f"发现 {duplicate_count} 个重复文件")
             
-            # 没有重复文件时发送通知 and save history
+            # 没有重复文件时发送通知
             if duplicate_count == 0:
                 logger.info("没有发现重复文件")
-                run_status = "完成 (无重复)"
+                run_status = f"完成 (无重复{budget_note})"
                 notification_title = "【✅ 智能硬链接扫描完成】"
                 notification_text = (
                     f"📢 执行结果\n"
@@ -431,96 +1337,18 @@ class smarthardlink(_PluginBase):
                 self._send_notify_message(notification_title, notification_text)
                 return
             
-            # 第二步：处理重复文件
-            processed_count = 0
-            for file_hash, files in file_hashes.items():
-                if len(files) <= 1:
-                    continue  # 没有重复
-                
-                processed_count += len(files) - 1
-                if processed_count % 10 == 0 or processed_count == duplicate_count:
-                    logger.info(f"已处理 {processed_count}/{duplicate_count} 个重复文件 ({(processed_count/duplicate_count*100):.1f}%)")
-                    
-                # 按文件路径排序，保持第一个文件作为源文件
-                files.sort(key=lambda x: x[0])
-                source_file, source_size = files[0]
-                
-                logger.info(f"发现重复文件组 (SHA1: {file_hash}):")
-                logger.info(f"  保留源文件: {source_file}")
-                
-                # --- 获取源文件的 inode 和设备号 ---
-                try:
-                    source_stat = os.stat(source_file)
-                    source_inode = source_stat.st_ino
-                    source_dev = source_stat.st_dev
-                except OSError as e:
-                    logger.error(f"  无法获取源文件 {source_file} 的状态信息: {e}，跳过此组")
-                    continue
-                # --- 获取结束 ---
-                
-                # 处理重复文件
-                for dup_file, dup_size in files[1:]:
-                    logger.info(f"  检查重复文件: {dup_file}")
-                    
-                    # --- 检查是否已是硬链接 ---
-                    try:
-                        dup_stat = os.stat(dup_file)
-                        # 必须在同一设备上且 inode 相同
-                        if dup_stat.st_dev == source_dev and dup_stat.st_ino == source_inode:
-                            logger.info(f"  文件 {dup_file} 已是源文件的硬链接，跳过")
-                            self._skipped_hardlinks_count += 1
-                            continue # 跳过此文件，处理下一个重复文件
-                    except OSError as e:
-                        logger.warning(f"  无法获取重复文件 {dup_file} 的状态信息: {e}，继续尝试硬链接")
-                    # --- 检查结束 ---
-                    
-                    if self._dry_run:
-                        logger.info(f"  试运行模式：将创建从 {source_file} 到 {dup_file} 的硬链接")
-                        self._hardlink_count += 1
-                        self._saved_space += dup_size
-                    else:
-                        try:
-                            # 创建临时备份文件名
-                            temp_file = f"{dup_file}.temp_{int(time.time())}"
-                            
-                            # 重命名原文件为临时文件
-                            os.rename(dup_file, temp_file)
-                            
-                            # 创建硬链接（保持原文件名）
-                            os.link(source_file, dup_file)
-                            
-                            # 删除临时文件
-                            os.remove(temp_file)
-                            
-                            logger.info(f"  已创建硬链接: {dup_file} -> {source_file}")
-                            self._hardlink_count += 1
-                            self._saved_space += dup_size
-                        except Exception as e:
-                            # 如果出错，尝试恢复原文件
-                            if 'temp_file' in locals() and os.path.exists(temp_file):
-                                try:
-                                    if os.path.exists(dup_file):
-                                        # 如果硬链接意外创建成功但后续步骤失败，先删除错误的硬链接
-                                        try:
-                                            dup_stat_after_link = os.stat(dup_file)
-                                            if dup_stat_after_link.st_dev == source_dev and dup_stat_after_link.st_ino == source_inode:
-                                                os.remove(dup_file)
-                                        except OSError:
-                                            pass # 如果获取状态或删除失败，继续尝试恢复
-                                    os.rename(temp_file, dup_file)
-                                    logger.error(f"  创建硬链接失败，已恢复原文件: {str(e)}")
-                                except Exception as recover_err:
-                                    logger.error(f"  创建硬链接失败且恢复原文件也失败: {str(recover_err)}，原文件位于: {temp_file}")
-                            else:
-                                logger.error(f"  创建硬链接失败: {str(e)}")
-            
             mode_str = "试运行" if self._dry_run else "实际运行"
             logger.info(f"处理完成！({mode_str}模式) 共处理文件 {self._process_count} 个，创建硬链接 {self._hardlink_count} 个，节省空间 {self._format_size(self._saved_space)}")
-            run_status = f"完成 ({mode_str})"
+            run_status = f"完成 ({mode_str}{budget_note})"
 
             # 发送通知
             self._send_completion_notification()
             
+        except ScanCancelled:
+            run_status = "已取消"
+            error_message = "扫描任务被取消"
+            logger.info(f"扫描任务已取消，已处理文件 {self._process_count} 个，创建硬链接 {self._hardlink_count} 个"
+                        + ("，下次运行将从断点继续" if self._checkpoint else ""))
         except Exception as e:
             run_status = "失败"
             error_message = str(e)
@@ -541,23 +1369,268 @@ class smarthardlink(_PluginBase):
                 )
             )
         finally:
+            if self._hash_index:
+                try:
+                    self._hash_index.close()
+                except Exception as e:
+                    logger.error(f"关闭哈希索引失败: {str(e)}")
+                self._hash_index = None
+            if self._checkpoint:
+                try:
+                    self._checkpoint.close()
+                except Exception as e:
+                    logger.error(f"关闭扫描断点失败: {str(e)}")
+                self._checkpoint = None
+            self._close_report(run_status)
+            if budget_cursor:
+                try:
+                    budget_cursor.close()
+                except Exception as e:
+                    logger.error(f"关闭分片扫描游标失败: {str(e)}")
+            self._update_scan_progress(phase="done", current_path=None)
             # --- 统一保存历史记录 (无论成功或失败) ---
-            run_end_time = datetime.datetime.now()
-            self._save_link_history({
-                "start_time": run_start_time.strftime('%Y-%m-%d %H:%M:%S'),
-                "end_time": run_end_time.strftime('%Y-%m-%d %H:%M:%S'),
-                "duration": self._format_time((run_end_time - run_start_time).total_seconds()),
-                "status": run_status,
-                "processed_files": self._process_count,
-                "hardlinks_created": self._hardlink_count, # Record count even in dry run
-                "skipped_hardlinks": self._skipped_hardlinks_count, # 添加跳过计数
-                "space_saved": self._saved_space,
-                "space_saved_formatted": self._format_size(self._saved_space), # Record saved space even in dry run
-                "mode": "试运行" if self._dry_run else "实际运行",
-                "error": error_message
-            })
+            self._last_run_summary = self._build_run_summary(run_start_time, run_status, error_message)
+            self._save_link_history(self._last_run_summary)
             # --- 历史保存结束 ---
 
+    def _plan_buckets(self, file_table: FileTable, done_buckets: Set[Tuple[int, int]],
+                      changed_dirs: Dict[int, Tuple[str, Optional[int]]],
+                      priority_buckets: Set[Tuple[int, int]]) -> List[Tuple[int, List[List[FileRecord]]]]:
+        """
+        将文件表分为需要计算哈希的同大小文件组，并累计无需计算哈希的文件
+        :param done_buckets: 断点中已完成哈希和链接的 (设备号, 文件大小)，直接跳过
+        :param changed_dirs: 分片扫描中发生变化的目录，其中文件所在的文件组加入 priority_buckets
+        :return: [(file_size, [inode_group, ...]), ...]，每个 inode_group 为共享同一 inode 的文件
+        """
+        cross_device_candidates = []  # [(file_size, {st_dev: 示例路径}), ...]
+
+        def on_size_group(file_size: int, rows_by_dev: Dict[int, List[int]]):
+            if len(rows_by_dev) > 1:
+                cross_device_candidates.append(
+                    (file_size, {file_dev: file_table.path(rows[0]) for file_dev, rows in rows_by_dev.items()}))
+
+        def on_bucket(file_size: int, file_dev: int, rows: List[int]):
+            if any(file_table.dir_of(row) in changed_dirs for row in rows):
+                priority_buckets.add((file_size, file_dev))
+
+        plan = plan_buckets(file_table, done_buckets,
+                            on_size_group=on_size_group if self._report_cross_device else None,
+                            on_bucket=on_bucket if changed_dirs else None)
+        self._resumed_buckets += plan.resumed_buckets
+        self._hash_skipped_files += plan.skipped_files
+        self._hash_skipped_bytes += plan.skipped_bytes
+        self._skipped_hardlinks_count += plan.hardlinks
+        self._process_count += plan.resumed_files + plan.skipped_files
+        if cross_device_candidates:
+            self._report_cross_device_candidates(cross_device_candidates)
+        return plan.buckets
+
+    def _open_budget_cursor(self) -> Optional[BudgetCursor]:
+        """
+        打开插件数据目录下的分片扫描游标，试运行与实际运行分别记录
+        """
+        try:
+            return BudgetCursor(str(self.get_data_path() / f"budget_cursor{'_dry_run' if self._dry_run else ''}.db"))
+        except Exception as e:
+            logger.error(f"打开分片扫描游标失败，本次将按文件大小顺序处理: {str(e)}")
+            return None
+
+    @staticmethod
+    def _find_changed_dirs(file_table: FileTable, budget_cursor: BudgetCursor,
+                           walk_complete: bool, dir_mtimes: Dict[str, int]) -> Dict[int, Tuple[str, Optional[int]]]:
+        """
+        找出自上次访问后修改时间变化的目录（文件新增、删除或改名都会改变目录的修改时间）
+        :param walk_complete: 是否完整遍历，是则同时清理已不存在目录的访问记录
+        :param dir_mtimes: 遍历时记录的目录修改时间，从断点恢复的目录不在其中，需要重新获取
+        :return: {目录编号: (目录路径, 修改时间)}，无法获取修改时间的目录也视为变化，修改时间为 None
+        """
+        changed = {}
+        current_dirs = set()
+        for dir_id in range(file_table.dir_count()):
+            dir_path = file_table.dir_path(dir_id)
+            current_dirs.add(dir_path)
+            mtime_ns = dir_mtimes.get(dir_path)
+            if mtime_ns is None:
+                try:
+                    mtime_ns = os.stat(dir_path).st_mtime_ns
+                except OSError:
+                    changed[dir_id] = (dir_path, None)
+                    continue
+            if budget_cursor.is_changed(dir_path, mtime_ns):
+                changed[dir_id] = (dir_path, mtime_ns)
+        if walk_complete:
+            budget_cursor.prune(current_dirs)
+        return changed
+
+    @staticmethod
+    def _order_budget_buckets(size_buckets: List[Tuple[int, List[List[FileRecord]]]],
+                              priority_buckets: Set[Tuple[int, int]],
+                              cursor: Optional[Tuple[int, int]]):
+        """
+        按分片扫描的处理顺序排列文件组（从列表末尾依次取出）：
+        变化目录中的文件组优先，其余从游标处继续按 (文件大小, 设备号) 从大到小处理，到最小后回到最大
+        """
+        def rank(bucket):
+            file_size, groups = bucket
+            key = (file_size, groups[0][0].dev)
+            if key in priority_buckets:
+                return 2, key
+            return (1 if cursor is None or key <= cursor else 0), key
+
+        size_buckets.sort(key=rank)
+
+    def _save_budget_cursor(self, budget_cursor: BudgetCursor, cursor: Optional[Tuple[int, int]],
+                            skipped: List[Tuple[int, int]], priority_buckets: Set[Tuple[int, int]],
+                            changed_dirs: Dict[int, Tuple[str, Optional[int]]]):
+        """
+        保存分片扫描的进度：游标移到轮转顺序中第一个未处理的文件组，未处理的优先文件组留待下次优先处理，
+        变化目录记录新的修改时间
+        :param cursor: 本次运行开始时的游标
+        :param skipped: 因预算用尽未处理的文件组
+        """
+        pending = [key for key in skipped if key in priority_buckets]
+        remaining = [key for key in skipped if key not in priority_buckets]
+        before_cursor = [key for key in remaining if cursor is None or key <= cursor]
+        next_cursor = max(before_cursor or remaining) if remaining else None
+        budget_cursor.save(next_cursor, pending,
+                           ((dir_path, mtime_ns) for dir_path, mtime_ns in changed_dirs.values() if mtime_ns is not None))
+        if self._budget.reason:
+            logger.info(f"{self._budget.reason}预算已用尽，剩余 {len(skipped)} 组文件留待下次运行"
+                        + (f"，其中 {len(pending)} 组将优先处理" if pending else ""))
+        else:
+            logger.info("分片扫描：本轮所有文件组已处理完")
+
+    def _hash_bucket(self, groups: List[List[FileRecord]], run_id: int) -> Tuple[int, List[Tuple[str, List[FileRecord]]]]:
+        """
+        计算一组同设备、同大小文件的哈希，在哈希线程中执行
+        :param groups: 按 inode 分组的文件，每个 inode 只读取一个代表文件
+        :return: (处理的文件数, [(哈希值, [FileRecord, ...]), ...] 内容相同且包含多个 inode 的文件组)；
+                 任务被取消或预算用尽时返回 None
+        """
+        if self._budget and self._budget.exhausted(self._sample_bytes_read + self._full_bytes_read):
+            return None
+        return compare_bucket(groups,
+                              lambda record: self._hash_task(self._get_sample_hash, record, run_id),
+                              lambda record: self._hash_task(self._get_full_hash, record, run_id),
+                              self._sample_chunk_size, should_stop=self._cancel_event.is_set)
+
+    def _link_worker(self, link_queue: queue.Queue):
+        """
+        链接线程：依次处理哈希完成的同大小文件组中的重复文件，收到 None 时退出
+        """
+        unflushed = []  # 已处理完、链接操作尚未执行的文件组 [(设备号, 文件大小), ...]
+        while True:
+            item = link_queue.get()
+            if item is None:
+                break
+            (file_dev, file_size), duplicate_groups = item
+            with self._metrics.phase("link"):
+                for file_hash, files in duplicate_groups:
+                    try:
+                        self._link_duplicate_group(file_hash, files)
+                    except Exception as e:
+                        self._metrics.count_error("link")
+                        logger.error(f"处理重复文件组 {file_hash} 时出错: {str(e)}\n{traceback.format_exc()}")
+                # 被取消时该组可能未处理完，不记入断点
+                if not self._cancel_event.is_set():
+                    unflushed.append((file_dev, file_size))
+                if not self._link_executor or self._link_executor.due():
+                    self._flush_links(unflushed)
+        with self._metrics.phase("link"):
+            self._flush_links(unflushed)
+
+    def _flush_links(self, buckets: List[Tuple[int, int]]):
+        """
+        执行当前批次的链接操作，之后才将对应的文件组记入断点
+        """
+        if self._link_executor:
+            try:
+                self._link_executor.flush()
+            except Exception as e:
+                self._metrics.count_error("link")
+                logger.error(f"执行链接批次时出错: {str(e)}\n{traceback.format_exc()}")
+                buckets.clear()
+                return
+        if self._checkpoint:
+            for file_dev, file_size in buckets:
+                try:
+                    self._checkpoint.mark_bucket_done(file_dev, file_size)
+                except Exception as e:
+                    logger.error(f"记录扫描断点失败: {str(e)}")
+        buckets.clear()
+
+    def _link_duplicate_group(self, file_hash: str, files: List[FileRecord], keep_order: bool = False):
+        """
+        将重复文件组中的文件替换为源文件的硬链接
+        :param keep_order: 为 True 时以 files[0] 作为源文件，否则按路径排序后取第一个
+        """
+        # 按文件路径排序，保持第一个文件作为源文件
+        if not keep_order:
+            files.sort(key=lambda x: x.path)
+        source = files[0]
+        source_file = source.path
+        # 源文件的 inode 和设备号直接来自遍历时的 stat，无需再次获取
+        source_inode = source.ino
+        source_dev = source.dev
+        
+        logger.info(f"发现重复文件组 ({self._hash_algorithm.upper()}: {file_hash}):")
+        logger.info(f"  保留源文件: {source_file}")
+        if self._report:
+            try:
+                self._report.add_group(self._report_run_id, file_hash, files)
+            except Exception as e:
+                logger.error(f"  保存重复文件组报告失败: {str(e)}")
+        
+        # 文件列表来自断点时，源文件可能在中断期间被修改
+        if self._revalidate_before_link and not self._dry_run and not self._record_unchanged(source):
+            logger.warning(f"  源文件 {source_file} 自上次遍历后已变化，跳过该组")
+            return
+        
+        # 处理重复文件
+        for dup in files[1:]:
+            if self._cancel_event.is_set():
+                return
+            dup_file, dup_size = dup.path, dup.size
+            self._update_scan_progress(current_path=dup_file)
+            logger.info(f"  检查重复文件: {dup_file}")
+            
+            # --- 检查是否已是硬链接（必须在同一设备上且 inode 相同） ---
+            if dup.dev == source_dev and dup.ino == source_inode:
+                # 已在按 inode 分组时计入跳过数
+                logger.info(f"  文件 {dup_file} 已是源文件的硬链接，跳过")
+                continue # 跳过此文件，处理下一个重复文件
+            # --- 检查结束 ---
+            
+            if self._revalidate_before_link and not self._dry_run and not self._record_unchanged(dup):
+                logger.warning(f"  文件 {dup_file} 自上次遍历后已变化，跳过")
+                continue
+            
+            # --- 逐字节校验，确保哈希算法不会导致错误的硬链接 ---
+            if self._verify_before_link and not self._dry_run:
+                try:
+                    identical = files_identical(source_file, dup_file, limiter=self._rate_limiter,
+                                                should_stop=self._cancel_event.is_set)
+                except HashCancelled:
+                    return
+                except Exception as e:
+                    self._metrics.count_error("verify")
+                    logger.error(f"  逐字节比较 {dup_file} 失败: {str(e)}，跳过")
+                    self._verify_failed_count += 1
+                    continue
+                if not identical:
+                    logger.warning(f"  文件 {dup_file} 与源文件内容不一致（哈希冲突或文件已被修改），跳过")
+                    self._verify_failed_count += 1
+                    continue
+            # --- 校验结束 ---
+            
+            if self._dry_run:
+                logger.info(f"  试运行模式：将创建从 {source_file} 到 {dup_file} 的硬链接")
+                self._hardlink_count += 1
+                self._saved_space += dup_size
+            else:
+                # 加入链接批次，由执行器以“临时链接 + 原子替换”的方式完成，结果在回调中统计
+                self._link_executor.add(source, dup)
+
     def _send_completion_notification(self):
         """
         发送任务完成通知
@@ -631,7 +1704,64 @@ class smarthardlink(_PluginBase):
                 "endpoint": self.api_scan,
                 "methods": ["GET"],
                 "summary": "智能硬链接扫描",
-                "description": "扫描目录并处理重复文件",
+                "description": "在后台启动扫描任务，返回任务ID",
+            },
+            {
+                "path": "/scan/progress",
+                "endpoint": self.api_scan_progress,
+                "methods": ["GET"],
+                "summary": "扫描任务进度",
+                "description": "查询当前或最近一次扫描任务的阶段、吞吐量和剩余时间",
+            },
+            {
+                "path": "/scan/cancel",
+                "endpoint": self.api_scan_cancel,
+                "methods": ["GET"],
+                "summary": "取消扫描任务",
+                "description": "在处理下一个文件前停止正在运行的扫描任务",
+            },
+            {
+                "path": "/dedup_paths",
+                "endpoint": self.api_dedup_paths,
+                "methods": ["POST"],
+                "summary": "增量去重",
+                "description": "对指定的新文件或目录增量去重，请求体为 {\"paths\": [路径, ...]}",
+            },
+            {
+                "path": "/history",
+                "endpoint": self.api_history,
+                "methods": ["GET"],
+                "summary": "运行历史",
+                "description": "按时间倒序返回历次运行的摘要，perf 字段包含各阶段耗时、哈希速度、缓存命中率、错误计数和最慢的文件/目录",
+            },
+            {
+                "path": "/duplicates/runs",
+                "endpoint": self.api_duplicate_runs,
+                "methods": ["GET"],
+                "summary": "重复文件报告列表",
+                "description": "列出已保存重复文件组报告的运行，包含文件组数、文件数和可节省空间",
+            },
+            {
+                "path": "/duplicates",
+                "endpoint": self.api_duplicates,
+                "methods": ["GET"],
+                "summary": "重复文件组报告",
+                "description": "分页查询一次运行发现的重复文件组，run_id 默认为最近一次，"
+                               "sort 可选 reclaimable（可节省空间）、files（文件数）、directory（目录），order 为 desc 或 asc",
+            },
+            {
+                "path": "/checkpoint",
+                "endpoint": self.api_checkpoint,
+                "methods": ["GET"],
+                "summary": "查看扫描断点",
+                "description": "查看上次被中断的扫描留下的断点",
+            },
+            {
+                "path": "/checkpoint/clear",
+                "endpoint": self.api_clear_checkpoint,
+                "methods": ["GET"],
+                "summary": "清除扫描断点",
+                "description": "丢弃扫描断点，下次扫描从头开始",
             }
         ]
 
@@ -645,23 +1775,108 @@ class smarthardlink(_PluginBase):
                     "id": "smarthardlink",
                     "name": "智能硬链接定时扫描服务",
                     "trigger": CronTrigger.from_crontab(self._cron),
-                    "func": self.scan_and_process,
-                    "kwargs": {},
+                    "func": self.start_scan_job,
+                    "kwargs": {"source": "定时任务"},
                 }
             ]
         return []
 
     def api_scan(self) -> schemas.Response:
         """
-        API调用扫描处理
+        API启动后台扫描任务，立即返回任务ID
         """
-        self.scan_and_process()
-        return schemas.Response(success=True, data={
-            "processed": self._process_count,
-            "hardlinked": self._hardlink_count,
-            "saved_space": self._saved_space,
-            "saved_space_formatted": self._format_size(self._saved_space)
-        })
+        started, job = self.start_scan_job(source="API")
+        return schemas.Response(success=started,
+                                message="扫描任务已启动" if started else "已有扫描任务正在运行",
+                                data={"job_id": job.get("id")})
+
+    def api_scan_progress(self) -> schemas.Response:
+        """
+        API查询扫描任务进度
+        """
+        return schemas.Response(success=True, data=self.get_scan_progress())
+
+    def api_scan_cancel(self) -> schemas.Response:
+        """
+        API取消扫描任务
+        """
+        if self.cancel_scan_job():
+            return schemas.Response(success=True, message="已请求取消，任务将在处理下一个文件前停止",
+                                    data={"job_id": self._job.get("id")})
+        return schemas.Response(success=False, message="没有正在运行的扫描任务")
+
+    def api_dedup_paths(self, payload: dict) -> schemas.Response:
+        """
+        API增量去重
+        """
+        paths = (payload or {}).get("paths")
+        if isinstance(paths, str):
+            paths = [paths]
+        if not isinstance(paths, list):
+            return schemas.Response(success=False, message="paths 必须为路径列表")
+        queued = self.dedup_paths(paths, source="API")
+        return schemas.Response(success=bool(queued), message=f"{queued} 个路径已加入增量去重队列")
+
+    def api_history(self, limit: int = 20) -> schemas.Response:
+        """
+        API查询运行历史
+        :param limit: 返回的记录数
+        """
+        historys = sorted(self.get_data('link_history') or [], key=lambda x: x.get("end_time", ""), reverse=True)
+        return schemas.Response(success=True, data=historys[:max(int(limit), 0)])
+
+    def api_duplicate_runs(self) -> schemas.Response:
+        """
+        API列出已保存报告的运行
+        """
+        report = DuplicateReport(str(self.get_data_path() / "duplicate_report.db"))
+        try:
+            return schemas.Response(success=True, data=report.runs())
+        finally:
+            report.close()
+
+    def api_duplicates(self, run_id: int = 0, page: int = 1, page_size: int = 50, sort: str = "reclaimable",
+                       order: str = "desc") -> schemas.Response:
+        """
+        API分页查询重复文件组
+        """
+        report = DuplicateReport(str(self.get_data_path() / "duplicate_report.db"))
+        try:
+            run_id = int(run_id) or report.latest_run_id()
+            if not run_id:
+                return schemas.Response(success=False, message="暂无重复文件组报告")
+            data = report.page(run_id, page, page_size, sort, descending=order != "asc")
+        except ValueError as e:
+            return schemas.Response(success=False, message=str(e))
+        finally:
+            report.close()
+        data["run_id"] = run_id
+        return schemas.Response(success=True, data=data)
+
+    def api_checkpoint(self) -> schemas.Response:
+        """
+        API查看扫描断点
+        """
+        if self._checkpoint:
+            return schemas.Response(success=True, message="扫描正在进行", data=self._checkpoint.summary())
+        checkpoint = ScanCheckpoint(str(self.get_data_path() / "checkpoint.db"))
+        try:
+            return schemas.Response(success=True, data=checkpoint.summary())
+        finally:
+            checkpoint.close()
+
+    def api_clear_checkpoint(self) -> schemas.Response:
+        """
+        API清除扫描断点
+        """
+        if self._checkpoint:
+            return schemas.Response(success=False, message="扫描正在进行，无法清除断点")
+        checkpoint = ScanCheckpoint(str(self.get_data_path() / "checkpoint.db"))
+        try:
+            checkpoint.clear()
+        finally:
+            checkpoint.close()
+        return schemas.Response(success=True, message="扫描断点已清除")
 
     def get_form(self) -> Tuple[List[dict], Dict[str, Any]]:
         # --- Reverting Switch style and making Alerts more compact --- 
@@ -731,35 +1946,200 @@ class smarthardlink(_PluginBase):
                             # Switches Row (Reverted style)
                             {
                                 'component': 'VRow',
-                                'class': 'align-center mb-2',
+                                'class': 'align-center mb-2',
+                                'content': [
+                                    {
+                                        'component': 'VCol',
+                                        'props': {"cols": 12, "sm": 4},
+                                        'content': [
+                                            {
+                                                'component': 'VSwitch',
+                                                'props': {
+                                                    'model': 'enabled',
+                                                    'label': '启用插件',
+                                                    'color': 'primary',
+                                                    # 'inset': False, # Reverted
+                                                    # 'hide-details': False # Reverted
+                                                },
+                                            }
+                                        ],
+                                    },
+                                    {
+                                        'component': 'VCol',
+                                        'props': {"cols": 12, "sm": 4},
+                                        'content': [
+                                            {
+                                                'component': 'VSwitch',
+                                                'props': {
+                                                    'model': 'onlyonce',
+                                                    'label': '立即运行一次',
+                                                    # 'inset': False,
+                                                    # 'hide-details': False
+                                                },
+                                            }
+                                        ],
+                                    },
+                                    {
+                                        'component': 'VCol',
+                                        'props': {"cols": 12, "sm": 4},
+                                        'content': [
+                                            {
+                                                'component': 'VSwitch',
+                                                'props': {
+                                                    'model': 'dry_run',
+                                                    'label': '试运行模式',
+                                                    'hint': '开启后不实际创建链接', # Reverted to hint
+                                                    # 'inset': False,
+                                                    'persistent-hint': True
+                                                },
+                                            }
+                                        ],
+                                    },
+                                ],
+                            },
+                            # Cron and Min Size Row (Removed dense)
+                            {
+                                'component': 'VRow',
+                                'class': 'mb-2',
+                                'content': [
+                                     {
+                                        'component': 'VCol',
+                                        'props': {"cols": 12, "sm": 6},
+                                        'content': [
+                                            {
+                                                'component': 'VCronField',
+                                                'props': {
+                                                    'model': 'cron',
+                                                    'label': '定时扫描周期',
+                                                    'placeholder': '5位cron表达式，留空关闭',
+                                                    'variant': 'outlined' 
+                                                },
+                                            }
+                                        ],
+                                    },
+                                    {
+                                        'component': 'VCol',
+                                        'props': {"cols": 12, "sm": 6},
+                                        'content': [
+                                            {
+                                                'component': 'VTextField',
+                                                'props': {
+                                                    'model': 'min_size',
+                                                    'label': '最小文件大小（KB）',
+                                                    'placeholder': '1024',
+                                                    'type': 'number',
+                                                    'hint': '小于此大小的文件将被忽略',
+                                                    'persistent-hint': True, 
+                                                    'variant': 'outlined'
+                                                },
+                                            }
+                                        ],
+                                    },
+                                ],
+                            },
+                            # Hash Buffer Size Row (Removed dense)
+                            {
+                                'component': 'VRow',
+                                'class': 'mb-2',
+                                'content': [
+                                      {
+                                        'component': 'VCol',
+                                        'props': {'cols': 12, 'sm': 8},
+                                        'content': [
+                                            {
+                                                'component': 'VTextField',
+                                                'props': {
+                                                    'model': 'hash_buffer_size',
+                                                    'label': '哈希缓冲区大小（字节）',
+                                                    'placeholder': '65536',
+                                                    'type': 'number',
+                                                    'hint': '计算文件哈希时每次读取的字节数。增大可加快I/O速度（需足够内存），减小可降低内存占用。建议默认65536 (64KB)。',
+                                                    'persistent-hint': True,
+                                                    # 'density': 'compact',
+                                                    'variant': 'outlined'
+                                                },
+                                            }
+                                        ],
+                                    },
+                                    {
+                                        'component': 'VCol',
+                                        'props': {'cols': 12, 'sm': 4},
+                                        'content': [
+                                            {
+                                                'component': 'VSwitch',
+                                                'props': {
+                                                    'model': 'use_hash_index',
+                                                    'label': '使用哈希索引',
+                                                    'hint': '文件大小和修改时间未变化时复用上次的哈希',
+                                                    'persistent-hint': True
+                                                },
+                                            }
+                                        ],
+                                    },
+                                ]
+                            },
+                            # Hash Concurrency Row
+                            {
+                                'component': 'VRow',
+                                'class': 'mb-2',
                                 'content': [
                                     {
                                         'component': 'VCol',
-                                        'props': {"cols": 12, "sm": 4},
+                                        'props': {"cols": 12, "sm": 6},
                                         'content': [
                                             {
-                                                'component': 'VSwitch',
+                                                'component': 'VTextField',
                                                 'props': {
-                                                    'model': 'enabled',
-                                                    'label': '启用插件',
-                                                    'color': 'primary',
-                                                    # 'inset': False, # Reverted
-                                                    # 'hide-details': False # Reverted
+                                                    'model': 'hash_threads',
+                                                    'label': '哈希线程数',
+                                                    'placeholder': '4',
+                                                    'type': 'number',
+                                                    'hint': '同时计算哈希的总线程数',
+                                                    'persistent-hint': True,
+                                                    'variant': 'outlined'
+                                                },
+                                            }
+                                        ],
+                                    },
+                                    {
+                                        'component': 'VCol',
+                                        'props': {"cols": 12, "sm": 6},
+                                        'content': [
+                                            {
+                                                'component': 'VTextField',
+                                                'props': {
+                                                    'model': 'per_device_threads',
+                                                    'label': '单磁盘并发读取数',
+                                                    'placeholder': '1',
+                                                    'type': 'number',
+                                                    'hint': '同一设备上同时读取的文件数。机械硬盘建议1，SSD可适当增大',
+                                                    'persistent-hint': True,
+                                                    'variant': 'outlined'
                                                 },
                                             }
                                         ],
                                     },
+                                ]
+                            },
+                            # IO Throttle Row
+                            {
+                                'component': 'VRow',
+                                'class': 'mb-2',
+                                'content': [
                                     {
                                         'component': 'VCol',
                                         'props': {"cols": 12, "sm": 4},
                                         'content': [
                                             {
-                                                'component': 'VSwitch',
+                                                'component': 'VTextField',
                                                 'props': {
-                                                    'model': 'onlyonce',
-                                                    'label': '立即运行一次',
-                                                    # 'inset': False,
-                                                    # 'hide-details': False
+                                                    'model': 'read_rate_limit',
+                                                    'label': '读取限速 (MB/s)',
+                                                    'placeholder': '0',
+                                                    'type': 'number',
+                                                    'hint': '所有哈希线程的总读取速度上限，0为不限速',
+                                                    'persistent-hint': True,
+                                                    'variant': 'outlined'
                                                 },
                                             }
                                         ],
@@ -771,33 +2151,53 @@ class smarthardlink(_PluginBase):
                                             {
                                                 'component': 'VSwitch',
                                                 'props': {
-                                                    'model': 'dry_run',
-                                                    'label': '试运行模式',
-                                                    'hint': '开启后不实际创建链接', # Reverted to hint
-                                                    # 'inset': False,
+                                                    'model': 'idle_only',
+                                                    'label': '仅在磁盘空闲时读取',
+                                                    'hint': '根据 /proc/diskstats 检测磁盘利用率，繁忙时暂停读取',
                                                     'persistent-hint': True
                                                 },
                                             }
                                         ],
                                     },
-                                ],
+                                    {
+                                        'component': 'VCol',
+                                        'props': {"cols": 12, "sm": 4},
+                                        'content': [
+                                            {
+                                                'component': 'VTextField',
+                                                'props': {
+                                                    'model': 'idle_threshold',
+                                                    'label': '空闲阈值 (%)',
+                                                    'placeholder': '20',
+                                                    'type': 'number',
+                                                    'hint': '磁盘利用率低于该值视为空闲',
+                                                    'persistent-hint': True,
+                                                    'variant': 'outlined'
+                                                },
+                                            }
+                                        ],
+                                    },
+                                ]
                             },
-                            # Cron and Min Size Row (Removed dense)
+                            # Budget Row
                             {
                                 'component': 'VRow',
                                 'class': 'mb-2',
                                 'content': [
-                                     {
+                                    {
                                         'component': 'VCol',
                                         'props': {"cols": 12, "sm": 6},
                                         'content': [
                                             {
-                                                'component': 'VCronField',
+                                                'component': 'VTextField',
                                                 'props': {
-                                                    'model': 'cron',
-                                                    'label': '定时扫描周期',
-                                                    'placeholder': '5位cron表达式，留空关闭',
-                                                    'variant': 'outlined' 
+                                                    'model': 'budget_hash_gb',
+                                                    'label': '每次最多读取 (GB)',
+                                                    'placeholder': '0',
+                                                    'type': 'number',
+                                                    'hint': '哈希读取量达到后停止，剩余部分下次运行继续，0为不限',
+                                                    'persistent-hint': True,
+                                                    'variant': 'outlined'
                                                 },
                                             }
                                         ],
@@ -809,43 +2209,57 @@ class smarthardlink(_PluginBase):
                                             {
                                                 'component': 'VTextField',
                                                 'props': {
-                                                    'model': 'min_size',
-                                                    'label': '最小文件大小（KB）',
-                                                    'placeholder': '1024',
+                                                    'model': 'budget_minutes',
+                                                    'label': '每次最长运行 (分钟)',
+                                                    'placeholder': '0',
                                                     'type': 'number',
-                                                    'hint': '小于此大小的文件将被忽略',
-                                                    'persistent-hint': True, 
+                                                    'hint': '达到后停止，下次优先处理有变化的目录，0为不限',
+                                                    'persistent-hint': True,
                                                     'variant': 'outlined'
                                                 },
                                             }
                                         ],
                                     },
-                                ],
+                                ]
                             },
-                            # Hash Buffer Size Row (Removed dense)
+                            # Hash Algorithm Row
                             {
                                 'component': 'VRow',
                                 'class': 'mb-2',
                                 'content': [
-                                      {
+                                    {
                                         'component': 'VCol',
-                                        'props': {'cols': 12},
+                                        'props': {"cols": 12, "sm": 6},
                                         'content': [
                                             {
-                                                'component': 'VTextField',
+                                                'component': 'VSelect',
                                                 'props': {
-                                                    'model': 'hash_buffer_size',
-                                                    'label': '哈希缓冲区大小（字节）',
-                                                    'placeholder': '65536',
-                                                    'type': 'number',
-                                                    'hint': '计算文件哈希时每次读取的字节数。增大可加快I/O速度（需足够内存），减小可降低内存占用。建议默认65536 (64KB)。',
+                                                    'model': 'hash_algorithm',
+                                                    'label': '哈希算法',
+                                                    'items': [{'title': algorithm.upper(), 'value': algorithm}
+                                                              for algorithm in available_algorithms()],
+                                                    'hint': 'BLAKE2b 通常比 SHA1 更快；安装 xxhash 后可选 XXH3_128。更换算法后需重新计算哈希',
                                                     'persistent-hint': True,
-                                                    # 'density': 'compact',
                                                     'variant': 'outlined'
                                                 },
                                             }
                                         ],
                                     },
+                                    {
+                                        'component': 'VCol',
+                                        'props': {"cols": 12, "sm": 6},
+                                        'content': [
+                                            {
+                                                'component': 'VSwitch',
+                                                'props': {
+                                                    'model': 'verify_before_link',
+                                                    'label': '链接前逐字节校验',
+                                                    'hint': '实际创建硬链接前再完整比较一次文件内容，更安全但需额外读取',
+                                                    'persistent-hint': True
+                                                },
+                                            }
+                                        ],
+                                    },
                                 ]
                             },
                         ]
@@ -892,6 +2306,65 @@ class smarthardlink(_PluginBase):
                                         ],
                                     }
                                 ],
+                            },
+                            # Cross Device Report
+                            {
+                                'component': 'VRow',
+                                'class': 'mb-2',
+                                'content': [
+                                    {
+                                        'component': 'VCol',
+                                        'props': {"cols": 12, "sm": 6},
+                                        'content': [
+                                            {
+                                                'component': 'VSwitch',
+                                                'props': {
+                                                    'model': 'report_cross_device',
+                                                    'label': '报告跨设备的同大小文件',
+                                                    'hint': '扫描目录位于不同分区时，在日志中列出分布在不同分区的同大小文件（无法硬链接，不计算哈希）',
+                                                    'persistent-hint': True
+                                                },
+                                            }
+                                        ],
+                                    },
+                                    {
+                                        'component': 'VCol',
+                                        'props': {"cols": 12, "sm": 6},
+                                        'content': [
+                                            {
+                                                'component': 'VSwitch',
+                                                'props': {
+                                                    'model': 'resume_scan',
+                                                    'label': '断点续扫',
+                                                    'hint': '扫描被重启等中断后，下次运行跳过已遍历的目录和已完成的文件组；修改扫描配置后断点自动失效',
+                                                    'persistent-hint': True
+                                                },
+                                            }
+                                        ],
+                                    }
+                                ],
+                            },
+                            # Incremental Dedup
+                            {
+                                'component': 'VRow',
+                                'class': 'mb-2',
+                                'content': [
+                                    {
+                                        'component': 'VCol',
+                                        'props': {"cols": 12},
+                                        'content': [
+                                            {
+                                                'component': 'VSwitch',
+                                                'props': {
+                                                    'model': 'incremental_on_transfer',
+                                                    'label': '整理完成后增量去重',
+                                                    'hint': '新文件入库后立即与哈希索引中同大小的文件比较并硬链接，无需等待完整扫描（需启用哈希索引，只处理扫描目录中的文件）',
+                                                    'persistent-hint': True
+                                                },
+                                            }
+                                        ],
+                                    }
+                                ],
                             },
                              # Exclude Dirs (Removed dense)
                             {
@@ -1007,6 +2480,19 @@ class smarthardlink(_PluginBase):
             "exclude_extensions": "",
             "exclude_keywords": "",
             "hash_buffer_size": 65536,
+            "use_hash_index": True,
+            "report_cross_device": False,
+            "hash_threads": 4,
+            "per_device_threads": 1,
+            "hash_algorithm": DEFAULT_ALGORITHM,
+            "verify_before_link": False,
+            "resume_scan": True,
+            "read_rate_limit": 0,
+            "idle_only": False,
+            "idle_threshold": 20,
+            "incremental_on_transfer": False,
+            "budget_hash_gb": 0,
+            "budget_minutes": 0,
         }
 
     def get_page(self) -> List[dict]:
@@ -1047,6 +2533,9 @@ class smarthardlink(_PluginBase):
             elif "完成" in status_text:
                  status_color = "success"
                  status_icon = "mdi-check-circle"
+            elif "取消" in status_text:
+                 status_color = "warning"
+                 status_icon = "mdi-stop-circle"
             error_text = history.get("error", "")
 
             # --- Mode chip logic ---
@@ -1066,6 +2555,7 @@ class smarthardlink(_PluginBase):
             processed_count = history.get("processed_files", 0)
             created_count = history.get("hardlinks_created", 0)
             duration_text = history.get("duration", "N/A")
+            perf_text = self._format_perf(history.get("perf"))
 
             history_rows.append({
                 'component': 'tr',
@@ -1161,11 +2651,17 @@ class smarthardlink(_PluginBase):
                             {'component': 'span', 'props': {'class': 'text-green-darken-1 font-weight-medium'}, 'text': space_saved_fmt} # Green text
                         ]
                     },
+                    # 性能
+                    {
+                        'component': 'td',
+                        'props': {'class': 'text-caption', 'style': 'white-space: nowrap;'},
+                        'text': perf_text
+                    },
                 ]
             })
 
         # --- 最终页面组装 (优化 VCardTitle 和 Table Header) ---
-        return [
+        return self._build_perf_card(historys[0].get("perf")) + self._build_duplicate_card() + [
             {
                 'component': 'VCard',
                 'props': {'variant': 'outlined', 'class': 'mb-4'},
@@ -1315,6 +2811,20 @@ class smarthardlink(_PluginBase):
                                                                 ]
                                                             }
                                                         ]
+                                                    },
+                                                    {
+                                                        'component': 'th',
+                                                        'props': {'class': 'text-caption', 'style': 'white-space: nowrap; padding: 4px 8px;'},
+                                                        'content': [
+                                                            {
+                                                                'component': 'div',
+                                                                'props': {'class': 'd-flex align-center'},
+                                                                'content': [
+                                                                    {'component': 'VIcon', 'props': {'size': '14', 'class': 'mr-1', 'color': 'grey'}, 'text': 'mdi-speedometer'},
+                                                                    {'component': 'span', 'text': '性能'}
+                                                                ]
+                                                            }
+                                                        ]
                                                     }
                                                     # --- End of modified headers ---
                                                 ]
@@ -1334,14 +2844,171 @@ class smarthardlink(_PluginBase):
             }
         ]
 
+    @staticmethod
+    def _format_perf(perf: Optional[Dict[str, Any]]) -> str:
+        """
+        历史记录表格中的性能概要
+        """
+        if not perf:
+            return "N/A"
+        phases = perf.get("phases") or {}
+        parts = [f"遍历 {phases.get('walk', 0):.1f}s"]
+        if "hash" in phases:
+            parts.append(f"哈希 {phases['hash']:.1f}s ({perf.get('hash_rate', 0) / 1024 / 1024:.1f} MB/s)")
+        if "link" in phases:
+            parts.append(f"链接 {phases['link']:.1f}s")
+        parts.append(f"命中 {perf.get('cache_hit_rate', 0) * 100:.0f}%")
+        errors = sum((perf.get("errors") or {}).values())
+        if errors:
+            parts.append(f"错误 {errors}")
+        return " · ".join(parts)
+
+    def _build_perf_card(self, perf: Optional[Dict[str, Any]]) -> List[dict]:
+        """
+        最近一次运行的性能详情：阶段耗时、错误计数、最慢的文件和目录
+        """
+        if not perf:
+            return []
+        phase_names = {"walk": "遍历", "group": "分组", "hash": "哈希", "link": "链接", "index": "索引"}
+        error_names = {"walk": "遍历", "hash": "哈希", "verify": "比较", "link": "链接"}
+        phases = perf.get("phases") or {}
+        lines = [
+            "阶段耗时：" + "，".join(f"{phase_names.get(name, name)} {seconds:.1f}s" for name, seconds in phases.items()),
+            f"遍历文件 {perf.get('files_stat', 0)} 个，哈希读取 {self._format_size(perf.get('bytes_hashed', 0))}，"
+            f"速度 {perf.get('hash_rate', 0) / 1024 / 1024:.1f} MB/s，缓存命中率 {perf.get('cache_hit_rate', 0) * 100:.1f}%",
+        ]
+        errors = perf.get("errors") or {}
+        if errors:
+            lines.append("错误：" + "，".join(f"{error_names.get(kind, kind)} {count}" for kind, count in errors.items()))
+        content = [{'component': 'div', 'props': {'class': 'text-body-2'}, 'text': line} for line in lines]
+        for key, title, unit in (("slowest_files", "最慢的文件", "size"), ("slowest_dirs", "最慢的目录", "files")):
+            items = perf.get(key) or []
+            if not items:
+                continue
+            content.append({'component': 'div', 'props': {'class': 'text-subtitle-2 mt-3'}, 'text': title})
+            for item in items:
+                extra = self._format_size(item.get("size") or 0) if unit == "size" else f"{item.get('files') or 0} 个文件"
+                content.append({
+                    'component': 'div',
+                    'props': {'class': 'text-caption text-truncate'},
+                    'text': f"{item.get('seconds', 0):.2f}s  {extra}  {item.get('path')}"
+                })
+        return [
+            {
+                'component': 'VCard',
+                'props': {'variant': 'outlined', 'class': 'mb-4'},
+                'content': [
+                    {
+                        'component': 'VCardTitle',
+                        'props': {'class': 'd-flex align-center text-h6 py-3'},
+                        'content': [
+                            {'component': 'VIcon', 'props': {'icon': 'mdi-speedometer', 'class': 'mr-2', 'color': 'primary'}},
+                            {'component': 'span', 'text': '最近一次运行性能'}
+                        ]
+                    },
+                    {'component': 'VDivider'},
+                    {'component': 'VCardText', 'content': content}
+                ]
+            }
+        ]
+
+    def _build_duplicate_card(self, limit: int = 10) -> List[dict]:
+        """
+        最近一次运行中可节省空间最多的重复文件组，完整报告通过 /duplicates 接口分页查询
+        """
+        try:
+            report = DuplicateReport(str(self.get_data_path() / "duplicate_report.db"))
+            try:
+                run_id = report.latest_run_id()
+                data = report.page(run_id, 1, limit) if run_id else None
+            finally:
+                report.close()
+        except Exception as e:
+            logger.error(f"读取重复文件组报告失败: {str(e)}")
+            return []
+        if not data or not data["items"]:
+            return []
+        rows = []
+        for group in data["items"]:
+            rows.append({
+                'component': 'tr',
+                'content': [
+                    {'component': 'td', 'props': {'class': 'text-caption'}, 'text': group["directory"]},
+                    {'component': 'td', 'props': {'class': 'text-center text-caption'}, 'text': str(group["files"])},
+                    {'component': 'td', 'props': {'class': 'text-caption'}, 'text': self._format_size(group["size"])},
+                    {'component': 'td', 'props': {'class': 'text-caption text-green-darken-1'},
+                     'text': self._format_size(group["reclaimable"])},
+                    {'component': 'td', 'props': {'class': 'text-caption'},
+                     'text': "，".join(os.path.basename(item["path"]) for item in group["paths"])},
+                ]
+            })
+        headers = ['源文件目录', '文件数', '文件大小', '可节省', '文件']
+        return [
+            {
+                'component': 'VCard',
+                'props': {'variant': 'outlined', 'class': 'mb-4'},
+                'content': [
+                    {
+                        'component': 'VCardTitle',
+                        'props': {'class': 'd-flex align-center text-h6 py-3'},
+                        'content': [
+                            {'component': 'VIcon', 'props': {'icon': 'mdi-file-multiple', 'class': 'mr-2', 'color': 'primary'}},
+                            {'component': 'span', 'text': f'最近一次运行的重复文件组（共 {data["total"]} 组，按可节省空间前 {len(rows)} 组）'}
+                        ]
+                    },
+                    {'component': 'VDivider'},
+                    {
+                        'component': 'VCardText',
+                        'props': {'class': 'pa-0'},
+                        'content': [
+                            {
+                                'component': 'VTable',
+                                'props': {'hover': True, 'density': 'compact'},
+                                'content': [
+                                    {
+                                        'component': 'thead',
+                                        'content': [
+                                            {
+                                                'component': 'tr',
+                                                'content': [{'component': 'th', 'props': {'class': 'text-caption'}, 'text': header}
+                                                            for header in headers]
+                                            }
+                                        ]
+                                    },
+                                    {'component': 'tbody', 'content': rows}
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            }
+        ]
+
     def stop_service(self):
         """
         退出插件
         """
+        # 先停止定时服务，避免在等待期间启动新的扫描任务
         if self._scheduler:
             self._scheduler.remove_all_jobs()
             if self._scheduler.running:
                 self._event.set()
                 self._scheduler.shutdown()
                 self._event.clear()
-            self._scheduler = None 
\ No newline at end of file
+            self._scheduler = None
+        # 停止正在运行的扫描任务和增量去重批次并等待其退出，已完成的部分记录在断点中；
+        # 哈希计算和逐字节比较每读取一块数据检查一次取消标志，通常很快就会退出
+        with self._job_lock:
+            self._stop_event.set()
+            self._cancel_event.set()
+        deadline = time.monotonic() + self._stop_timeout
+        if self._job_thread and self._job_thread.is_alive():
+            self._job_thread.join(timeout=self._stop_timeout)
+            if self._job_thread.is_alive():
+                logger.warning(f"扫描任务 {self._job.get('id')} 未能在 {self._stop_timeout} 秒内退出，"
+                               f"将在当前读取完成后停止")
+                return
+        if self._run_lock.acquire(timeout=max(deadline - time.monotonic(), 0.1)):
+            self._run_lock.release()
+        else:
+            logger.warning(f"增量去重未能在 {self._stop_timeout} 秒内退出，将在当前读取完成后停止") 
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+分片扫描预算模块
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional, Set, Tuple
+
+
+class ScanBudget:
+    """
+    单次运行的预算：哈希读取量上限和运行时长上限，任意一项用尽即停止提交新的文件组
+
+    预算只在文件组开始时检查，已开始的文件组会处理完，实际用量最多超出正在处理的文件组
+    """
+
+    def __init__(self, max_bytes: int = 0, max_seconds: float = 0, started_at: Optional[float] = None):
+        """
+        :param max_bytes: 哈希读取量上限（字节），0 为不限
+        :param max_seconds: 运行时长上限（秒），从 started_at 开始计算，0 为不限
+        :param started_at: 运行开始时间（time.monotonic()），默认为当前时间
+        """
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.started_at = time.monotonic() if started_at is None else started_at
+        self.reason: Optional[str] = None  # 预算用尽的原因
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_bytes or self.max_seconds)
+
+    def exhausted(self, bytes_read: int) -> bool:
+        """
+        检查预算是否用尽，用尽后保持用尽状态
+        :param bytes_read: 本次运行已读取的哈希字节数
+        """
+        if self.reason:
+            return True
+        if self.max_bytes and bytes_read >= self.max_bytes:
+            self.reason = "读取量"
+        elif self.max_seconds and time.monotonic() - self.started_at >= self.max_seconds:
+            self.reason = "运行时长"
+        return self.reason is not None
+
+
+class BudgetCursor:
+    """
+    分片扫描的持久化游标
+
+    - 游标：上次运行停止时的 (文件大小, 设备号)，下次从该位置继续，一轮结束后回到最大的文件
+    - 目录访问记录：每个目录上次访问时的修改时间，修改时间变化的目录（有文件新增、删除或改名）中的文件组优先处理
+    - 待处理的优先文件组：发现变化时未能在本次预算内处理完的文件组，后续运行继续优先处理，
+      已处理的文件组从中移除，因此即使预算很小，优先部分也会逐次推进
+    """
+
+    def __init__(self, db_file: str):
+        """
+        :param db_file: 数据库文件路径
+        """
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dir_visit (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pending_bucket (
+                size INTEGER NOT NULL,
+                dev INTEGER NOT NULL,
+                PRIMARY KEY (size, dev)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def get_cursor(self) -> Optional[Tuple[int, int]]:
+        """
+        上次停止的位置
+        :return: (文件大小, 设备号)；没有游标（新一轮）时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'cursor'").fetchone()
+        if not row:
+            return None
+        cursor = json.loads(row[0])
+        return tuple(cursor) if cursor else None
+
+    def pending_buckets(self) -> Set[Tuple[int, int]]:
+        """
+        待处理的优先文件组
+        :return: {(文件大小, 设备号), ...}
+        """
+        with self._lock:
+            return {(size, dev) for size, dev in self._conn.execute("SELECT size, dev FROM pending_bucket")}
+
+    def is_changed(self, path: str, mtime_ns: int) -> bool:
+        """
+        目录自上次访问后是否变化，从未访问过的目录视为变化
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT mtime_ns FROM dir_visit WHERE path = ?", (path,)).fetchone()
+        return row is None or row[0] != mtime_ns
+
+    def save(self, cursor: Optional[Tuple[int, int]], pending: Iterable[Tuple[int, int]],
+             visited_dirs: Iterable[Tuple[str, int]]):
+        """
+        保存本次运行的进度
+        :param cursor: 停止的位置，None 表示本轮已完成
+        :param pending: 仍待处理的优先文件组 [(文件大小, 设备号), ...]，替换原有记录
+        :param visited_dirs: 本次访问的变化目录 [(目录路径, 修改时间), ...]
+        """
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cursor', ?)",
+                               (json.dumps(list(cursor) if cursor else None),))
+            self._conn.execute("DELETE FROM pending_bucket")
+            self._conn.executemany("INSERT OR IGNORE INTO pending_bucket (size, dev) VALUES (?, ?)", pending)
+            self._conn.executemany("INSERT OR REPLACE INTO dir_visit (path, mtime_ns) VALUES (?, ?)", visited_dirs)
+            self._conn.commit()
+
+    def prune(self, current_dirs: Set[str]) -> int:
+        """
+        删除已不存在的目录的访问记录，仅在完整遍历后调用
+        :return: 删除的记录数
+        """
+        with self._lock:
+            stale = [(path,) for path, in self._conn.execute("SELECT path FROM dir_visit")
+                     if path not in current_dirs]
+            self._conn.executemany("DELETE FROM dir_visit WHERE path = ?", stale)
+            self._conn.commit()
+        return len(stale)
+
+    def close(self):
+        """
+        提交并关闭数据库
+        """
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
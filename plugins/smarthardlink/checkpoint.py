@@ -0,0 +1,196 @@
+"""
+扫描断点模块
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+if __package__ in (None, ""):
+    from walker import FileRecord
+else:
+    from plugins.smarthardlink.walker import FileRecord
+
+
+class ScanCheckpoint:
+    """
+    扫描断点
+
+    长时间的扫描被重启打断后，下次运行可以从断点继续：
+    - 已完整遍历的扫描目录及其文件列表（遍历游标）
+    - 已完成哈希与链接的同大小文件组
+    已计算的哈希保存在哈希索引中，不在此重复保存。
+    断点与配置指纹绑定，扫描目录、排除规则或哈希算法变化后断点自动失效。
+    """
+
+    def __init__(self, db_file: str, commit_interval: float = 30):
+        """
+        :param db_file: 数据库文件路径
+        :param commit_interval: 已完成文件组的最短提交间隔（秒）
+        """
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._lock = threading.Lock()
+        self._commit_interval = commit_interval
+        self._last_commit = time.monotonic()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS walked_file (
+                scan_dir TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                nlink INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_walked_file_scan_dir ON walked_file (scan_dir);
+            CREATE TABLE IF NOT EXISTS done_bucket (
+                dev INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (dev, size)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _get_meta(self) -> Dict[str, Any]:
+        return {key: json.loads(value) for key, value in self._conn.execute("SELECT key, value FROM meta")}
+
+    def _set_meta(self, **values):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            ((key, json.dumps(value, ensure_ascii=False)) for key, value in values.items()),
+        )
+
+    def load(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        读取与当前配置匹配的断点
+        :return: 断点信息；不存在或配置已变化时返回 None（不匹配的断点会被清除）
+        """
+        with self._lock:
+            meta = self._get_meta()
+        if not meta:
+            return None
+        if meta.get("fingerprint") != fingerprint:
+            self.clear()
+            return None
+        return meta
+
+    def start(self, fingerprint: str, run_id: int):
+        """
+        开始新的扫描，清除旧断点
+        """
+        self.clear()
+        with self._lock:
+            self._set_meta(fingerprint=fingerprint, run_id=run_id, started_at=int(time.time()),
+                           updated_at=int(time.time()), walked_dirs=[], phase="walk")
+            self._conn.commit()
+
+    def set_phase(self, phase: str):
+        """
+        记录当前阶段
+        """
+        with self._lock:
+            self._set_meta(phase=phase, updated_at=int(time.time()))
+            self._conn.commit()
+
+    def save_walked_dir(self, scan_dir: str, records: Iterable[FileRecord]):
+        """
+        保存一个已完整遍历的扫描目录及其文件列表
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM walked_file WHERE scan_dir = ?", (scan_dir,))
+            self._conn.executemany(
+                "INSERT INTO walked_file (scan_dir, path, size, dev, ino, mtime_ns, nlink) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((scan_dir,) + tuple(record) for record in records),
+            )
+            walked_dirs = self._get_meta().get("walked_dirs") or []
+            if scan_dir not in walked_dirs:
+                walked_dirs.append(scan_dir)
+            self._set_meta(walked_dirs=walked_dirs, updated_at=int(time.time()))
+            self._conn.commit()
+
+    def load_walked_dir(self, scan_dir: str) -> Iterator[FileRecord]:
+        """
+        读取已遍历扫描目录的文件列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, dev, ino, mtime_ns, nlink FROM walked_file WHERE scan_dir = ?", (scan_dir,)
+            ).fetchall()
+        for row in rows:
+            yield FileRecord(*row)
+
+    def done_buckets(self) -> Set[Tuple[int, int]]:
+        """
+        已完成的同大小文件组
+        :return: {(st_dev, file_size), ...}
+        """
+        with self._lock:
+            return {(dev, size) for dev, size in self._conn.execute("SELECT dev, size FROM done_bucket")}
+
+    def mark_bucket_done(self, dev: int, size: int):
+        """
+        标记同大小文件组已完成，按提交间隔批量写入磁盘
+        """
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO done_bucket (dev, size) VALUES (?, ?)", (dev, size))
+            if time.monotonic() - self._last_commit >= self._commit_interval:
+                self._set_meta(updated_at=int(time.time()))
+                self._conn.commit()
+                self._last_commit = time.monotonic()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        断点概况，用于查看
+        """
+        with self._lock:
+            meta = self._get_meta()
+            if not meta:
+                return {"exists": False}
+            walked_files = self._conn.execute("SELECT COUNT(*) FROM walked_file").fetchone()[0]
+            done_buckets = self._conn.execute("SELECT COUNT(*) FROM done_bucket").fetchone()[0]
+        return {
+            "exists": True,
+            "run_id": meta.get("run_id"),
+            "phase": meta.get("phase"),
+            "started_at": meta.get("started_at"),
+            "updated_at": meta.get("updated_at"),
+            "walked_dirs": meta.get("walked_dirs") or [],
+            "walked_files": walked_files,
+            "done_buckets": done_buckets,
+        }
+
+    def commit(self):
+        """
+        提交未保存的修改
+        """
+        with self._lock:
+            self._conn.commit()
+            self._last_commit = time.monotonic()
+
+    def clear(self):
+        """
+        清除断点
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM meta")
+            self._conn.execute("DELETE FROM walked_file")
+            self._conn.execute("DELETE FROM done_bucket")
+            self._conn.commit()
+
+    def close(self):
+        """
+        提交并关闭数据库
+        """
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
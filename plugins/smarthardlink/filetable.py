@@ -0,0 +1,142 @@
+"""
+紧凑文件表模块
+"""
+import os
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+if __package__ in (None, ""):
+    from walker import FileRecord
+else:
+    from plugins.smarthardlink.walker import FileRecord
+
+
+class FileTable:
+    """
+    按列存储的文件表，用于数百万文件规模的扫描
+
+    每个 FileRecord 连同路径字符串约占 300 字节，其中大部分是 Python 对象开销。文件表将数据拆分为：
+    - 目录：相同目录只保存一次，每个文件只记录目录编号
+    - 文件名：UTF-8 编码后连续存放在一个 bytearray 中，另以数组记录结束位置
+    - 大小、设备号、inode、修改时间、链接数：分别存放在 array 列中
+    每个文件只占几十字节，需要时再按行还原为 FileRecord。
+    """
+
+    def __init__(self):
+        self._dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self._dir_id = array("I")
+        self._names = bytearray()
+        self._name_end = array("Q")
+        self.size = array("Q")
+        self.dev = array("Q")
+        self.ino = array("Q")
+        self.mtime_ns = array("q")
+        self.nlink = array("I")
+
+    def __len__(self) -> int:
+        return len(self.size)
+
+    def append(self, record: FileRecord):
+        """
+        添加一个文件
+        """
+        dir_path, _, name = record.path.rpartition(os.sep)
+        dir_id = self._dir_ids.get(dir_path)
+        if dir_id is None:
+            dir_id = self._dir_ids[dir_path] = len(self._dirs)
+            self._dirs.append(dir_path)
+        self._dir_id.append(dir_id)
+        # 文件名可能含有无法解码的字节（以代理字符表示），编码时原样还原
+        self._names += name.encode("utf-8", "surrogateescape")
+        self._name_end.append(len(self._names))
+        self.size.append(record.size)
+        self.dev.append(record.dev)
+        self.ino.append(record.ino)
+        self.mtime_ns.append(record.mtime_ns)
+        self.nlink.append(record.nlink)
+
+    def extend(self, records: Iterable[FileRecord]):
+        """
+        批量添加文件
+        """
+        for record in records:
+            self.append(record)
+
+    def path(self, idx: int) -> str:
+        """
+        第 idx 个文件的完整路径
+        """
+        start = self._name_end[idx - 1] if idx else 0
+        name = self._names[start:self._name_end[idx]].decode("utf-8", "surrogateescape")
+        return f"{self._dirs[self._dir_id[idx]]}{os.sep}{name}"
+
+    def dir_of(self, idx: int) -> int:
+        """
+        第 idx 个文件所在目录的编号
+        """
+        return self._dir_id[idx]
+
+    def dir_path(self, dir_id: int) -> str:
+        """
+        目录编号对应的路径
+        """
+        return self._dirs[dir_id]
+
+    def dir_count(self) -> int:
+        """
+        文件表中的目录数
+        """
+        return len(self._dirs)
+
+    def record(self, idx: int) -> FileRecord:
+        """
+        将第 idx 行还原为 FileRecord
+        """
+        return FileRecord(self.path(idx), self.size[idx], self.dev[idx], self.ino[idx],
+                          self.mtime_ns[idx], self.nlink[idx])
+
+    def records(self, indices: Iterable[int]) -> List[FileRecord]:
+        """
+        按行号批量还原 FileRecord
+        """
+        return [self.record(idx) for idx in indices]
+
+    def iter_records(self, start: int = 0) -> Iterator[FileRecord]:
+        """
+        从第 start 行开始依次还原 FileRecord
+        """
+        for idx in range(start, len(self)):
+            yield self.record(idx)
+
+    def iter_size_groups(self) -> Iterator[Tuple[int, Dict[int, List[int]]]]:
+        """
+        按文件大小分组，每组再按设备号拆分
+
+        通过按大小排序行号实现，不需要为每个文件创建字典项；大小唯一的文件同样会返回，便于调用方统计
+        :return: 依次返回 (file_size, {st_dev: [行号, ...]})，文件大小从小到大
+        """
+        order = array("I", sorted(range(len(self)), key=self.size.__getitem__))
+        current_size = None
+        by_dev: Dict[int, List[int]] = {}
+        for idx in order:
+            file_size = self.size[idx]
+            if file_size != current_size:
+                if by_dev:
+                    yield current_size, by_dev
+                current_size = file_size
+                by_dev = {}
+            by_dev.setdefault(self.dev[idx], []).append(idx)
+        if by_dev:
+            yield current_size, by_dev
+
+    def nbytes(self) -> int:
+        """
+        文件表大致占用的内存（字节）
+        """
+        columns = (self._dir_id, self._name_end, self.size, self.dev, self.ino, self.mtime_ns, self.nlink)
+        return (sum(column.buffer_info()[1] * column.itemsize for column in columns)
+                + len(self._names)
+                + sum(sys.getsizeof(dir_path) for dir_path in self._dirs)
+                + sys.getsizeof(self._dirs) + sys.getsizeof(self._dir_ids))
@@ -0,0 +1,212 @@
+"""
+哈希计算模块
+"""
+import hashlib
+import mmap
+import os
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+if __package__ in (None, ""):
+    from throttle import RateLimiter
+else:
+    from plugins.smarthardlink.throttle import RateLimiter
+
+# 默认哈希算法，与早期版本保持一致
+DEFAULT_ALGORITHM = "sha1"
+
+# 可选的哈希算法。哈希值只用于对文件分组，不涉及安全性，速度更快的算法即可满足需要
+_ALGORITHMS: Dict[str, Callable[[], Any]] = {
+    "sha1": hashlib.sha1,
+    "blake2b": lambda: hashlib.blake2b(digest_size=32),
+}
+if xxhash:
+    _ALGORITHMS["xxh3_128"] = xxhash.xxh3_128
+
+
+class HashCancelled(Exception):
+    """
+    读取文件的过程中任务被取消
+    """
+
+
+def available_algorithms() -> List[str]:
+    """
+    当前环境可用的哈希算法
+    """
+    return list(_ALGORITHMS)
+
+
+def new_hasher(algorithm: str = DEFAULT_ALGORITHM):
+    """
+    创建哈希对象
+    """
+    try:
+        return _ALGORITHMS[algorithm]()
+    except KeyError:
+        raise ValueError(f"不支持的哈希算法: {algorithm}")
+
+
+def hash_file(file_path: str, buffer_size: int = 65536, algorithm: str = DEFAULT_ALGORITHM,
+              limiter: Optional[RateLimiter] = None,
+              should_stop: Optional[Callable[[], bool]] = None) -> Tuple[str, int]:
+    """
+    计算文件完整内容的哈希
+    :param limiter: 读取限速器，为空时不限速
+    :param should_stop: 每读取一块数据后检查，返回 True 时抛出 HashCancelled
+    :return: (十六进制哈希值, 读取的字节数)
+    """
+    hasher = new_hasher(algorithm)
+    bytes_read = 0
+    with open(file_path, "rb") as f:
+        while True:
+            data = f.read(buffer_size)
+            if not data:
+                break
+            hasher.update(data)
+            bytes_read += len(data)
+            if limiter:
+                limiter.consume(len(data))
+            if should_stop and should_stop():
+                raise HashCancelled(file_path)
+    return hasher.hexdigest(), bytes_read
+
+
+def hash_sample(file_path: str, file_size: int, chunk_size: int,
+                algorithm: str = DEFAULT_ALGORITHM, limiter: Optional[RateLimiter] = None,
+                should_stop: Optional[Callable[[], bool]] = None) -> Tuple[str, int]:
+    """
+    计算文件的抽样指纹：分别读取文件头、中、尾三段固定长度的数据计算哈希
+    :param limiter: 读取限速器，为空时不限速
+    :param should_stop: 每读取一段数据后检查，返回 True 时抛出 HashCancelled
+    :return: (十六进制哈希值, 读取的字节数)
+    """
+    offsets = (0, (file_size - chunk_size) // 2, file_size - chunk_size)
+    hasher = new_hasher(algorithm)
+    bytes_read = 0
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        for offset in offsets:
+            if hasattr(os, "pread"):
+                data = os.pread(fd, chunk_size, offset)
+            else:
+                os.lseek(fd, offset, os.SEEK_SET)
+                data = os.read(fd, chunk_size)
+            hasher.update(data)
+            bytes_read += len(data)
+            if limiter:
+                limiter.consume(len(data))
+            if should_stop and should_stop():
+                raise HashCancelled(file_path)
+    finally:
+        os.close(fd)
+    return hasher.hexdigest(), bytes_read
+
+
+def files_identical(path_a: str, path_b: str, chunk_size: int = 8 * 1024 * 1024,
+                    limiter: Optional[RateLimiter] = None, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+    """
+    通过内存映射逐字节比较两个文件的内容
+    :param limiter: 读取限速器，为空时不限速
+    :param should_stop: 每比较一块数据前检查，返回 True 时抛出 HashCancelled
+    """
+    with open(path_a, "rb") as fa, open(path_b, "rb") as fb:
+        size = os.fstat(fa.fileno()).st_size
+        if size != os.fstat(fb.fileno()).st_size:
+            return False
+        if size == 0:
+            return True
+        with mmap.mmap(fa.fileno(), 0, access=mmap.ACCESS_READ) as ma, \
+                mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ) as mb:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                ma.madvise(mmap.MADV_SEQUENTIAL)
+                mb.madvise(mmap.MADV_SEQUENTIAL)
+            for offset in range(0, size, chunk_size):
+                if should_stop and should_stop():
+                    raise HashCancelled(path_a)
+                if limiter:
+                    limiter.consume(2 * min(chunk_size, size - offset))
+                if ma[offset:offset + chunk_size] != mb[offset:offset + chunk_size]:
+                    return False
+    return True
+
+
+class HashEngine:
+    """
+    并行哈希引擎
+
+    使用线程池执行哈希计算（hashlib 处理大块数据时会释放 GIL），同时按设备号限制
+    每块磁盘上同时读取的文件数：多块磁盘可以同时读取，单块机械硬盘又不会因为并发
+    随机读取而互相抢占磁头。
+    """
+
+    def __init__(self, max_workers: int = 4, per_device: int = 1):
+        """
+        :param max_workers: 线程池总线程数
+        :param per_device: 每个设备同时读取的最大文件数
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.per_device = max(1, int(per_device))
+
+    def run(self, tasks: Iterable[Tuple[int, Any]], func: Callable[[Any], Any], lookahead: int = 2,
+            should_stop: Optional[Callable[[], bool]] = None) -> Iterator[Tuple[Any, Any]]:
+        """
+        并行执行任务，任务只有在所属设备还有空闲名额时才会提交到线程池，
+        因此不会出现线程占着位置等待磁盘的情况。
+        任务在有空闲线程时才从 tasks 中按需取出，所属设备繁忙的任务暂存等待，
+        暂存数量不超过 max_workers x lookahead，tasks 可以是惰性生成的
+        :param tasks: [(st_dev, item), ...]
+        :param func: 对每个 item 执行的函数，应自行处理异常
+        :param lookahead: 每个线程最多预取的任务数
+        :param should_stop: 返回 True 后不再取出和提交新任务，只等待已提交的任务完成
+        :return: 按完成顺序返回 (item, func(item))
+        """
+        source = iter(tasks)
+        exhausted = False
+        max_pending = self.max_workers * max(1, int(lookahead))
+        pending: Dict[int, Deque[Any]] = defaultdict(deque)
+        pending_count = 0
+        in_flight: Dict[int, int] = defaultdict(int)
+        running = {}  # {future: (dev, item)}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="smarthardlink-hash") as pool:
+            def fill():
+                nonlocal exhausted, pending_count
+                while len(running) < self.max_workers and not (should_stop and should_stop()):
+                    # 轮流从各个设备取任务，保证多块磁盘同时被读取
+                    progressed = False
+                    for dev, queue in pending.items():
+                        if len(running) >= self.max_workers:
+                            break
+                        if queue and in_flight[dev] < self.per_device:
+                            item = queue.popleft()
+                            pending_count -= 1
+                            running[pool.submit(func, item)] = (dev, item)
+                            in_flight[dev] += 1
+                            progressed = True
+                    if progressed:
+                        continue
+                    # 暂存的任务都属于繁忙的设备，再取一个任务
+                    if exhausted or pending_count >= max_pending:
+                        break
+                    try:
+                        dev, item = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[dev].append(item)
+                    pending_count += 1
+
+            fill()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    dev, item = running.pop(future)
+                    in_flight[dev] -= 1
+                    yield item, future.result()
+                fill()
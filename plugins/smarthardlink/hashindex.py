@@ -0,0 +1,176 @@
+"""
+哈希索引模块
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+
+class IndexedFile(NamedTuple):
+    """
+    索引中保存的文件
+    """
+    dev: int
+    ino: int
+    size: int
+    mtime_ns: int
+    path: str
+    sample_hash: Optional[str]
+    full_hash: Optional[str]
+
+
+class HashIndex:
+    """
+    持久化的文件哈希索引
+
+    以 (st_dev, st_ino) 为主键保存文件的抽样指纹和完整哈希，并记录计算时的
+    (st_size, st_mtime_ns) 和哈希算法。只有当文件的大小、修改时间和哈希算法都未变化时
+    才复用已保存的哈希，因此未变化的文件在后续扫描中无需再次读取。
+    完整扫描遍历到的文件都会记录 stat 信息，增量去重据此按 (st_dev, st_size) 查找候选文件。
+    """
+
+    _UPSERT_SQL = """
+        INSERT INTO file_hash (dev, ino, size, mtime_ns, path, sample_hash, full_hash, last_seen, algorithm)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(dev, ino) DO UPDATE SET
+            sample_hash = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns
+                                    AND algorithm = excluded.algorithm
+                               THEN COALESCE(excluded.sample_hash, sample_hash)
+                               ELSE excluded.sample_hash END,
+            full_hash = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns
+                                  AND algorithm = excluded.algorithm
+                             THEN COALESCE(excluded.full_hash, full_hash)
+                             ELSE excluded.full_hash END,
+            size = excluded.size,
+            mtime_ns = excluded.mtime_ns,
+            path = excluded.path,
+            last_seen = excluded.last_seen,
+            algorithm = excluded.algorithm
+    """
+
+    def __init__(self, db_file: str, algorithm: str = "sha1", commit_interval: float = 30):
+        """
+        打开（必要时创建）索引数据库
+        :param db_file: 数据库文件路径
+        :param algorithm: 当前使用的哈希算法，其他算法保存的哈希视为无效
+        :param commit_interval: 新哈希的最短提交间隔（秒），扫描被中断时已计算的哈希不会丢失
+        """
+        self.algorithm = algorithm
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._lock = threading.Lock()
+        self._commit_interval = commit_interval
+        self._last_commit = time.monotonic()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_hash (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                sample_hash TEXT,
+                full_hash TEXT,
+                last_seen INTEGER NOT NULL,
+                algorithm TEXT NOT NULL DEFAULT 'sha1',
+                PRIMARY KEY (dev, ino)
+            )
+            """
+        )
+        # 早期版本创建的索引没有 algorithm 列，其中的哈希均为 SHA1
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(file_hash)")}
+        if "algorithm" not in columns:
+            self._conn.execute("ALTER TABLE file_hash ADD COLUMN algorithm TEXT NOT NULL DEFAULT 'sha1'")
+        # 增量去重按 (设备号, 文件大小) 查找候选文件
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_file_hash_size ON file_hash (dev, size)")
+        self._conn.commit()
+
+    def lookup(self, dev: int, ino: int, size: int, mtime_ns: int) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """
+        查询文件已保存的哈希
+        :return: (sample_hash, full_hash)；文件不在索引中、大小/修改时间已变化或哈希算法不同时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, algorithm, sample_hash, full_hash FROM file_hash WHERE dev = ? AND ino = ?",
+                (dev, ino),
+            ).fetchone()
+        if not row or row[0] != size or row[1] != mtime_ns or row[2] != self.algorithm:
+            return None
+        return row[3], row[4]
+
+    def save(self, dev: int, ino: int, size: int, mtime_ns: int, path: str, run_id: int,
+             sample_hash: Optional[str] = None, full_hash: Optional[str] = None):
+        """
+        保存文件的哈希。stat 信息和算法未变化时，未传入的哈希保留原值；否则旧哈希全部作废
+        """
+        with self._lock:
+            self._conn.execute(
+                self._UPSERT_SQL,
+                (dev, ino, size, mtime_ns, path, sample_hash, full_hash, run_id, self.algorithm),
+            )
+            if time.monotonic() - self._last_commit >= self._commit_interval:
+                self._conn.commit()
+                self._last_commit = time.monotonic()
+
+    def find_by_size(self, dev: int, size: int) -> List[IndexedFile]:
+        """
+        查找同一设备上大小相同、由当前哈希算法计算的文件，用于增量去重
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT dev, ino, size, mtime_ns, path, sample_hash, full_hash FROM file_hash "
+                "WHERE dev = ? AND size = ? AND algorithm = ? ORDER BY path",
+                (dev, size, self.algorithm),
+            ).fetchall()
+        return [IndexedFile(*row) for row in rows]
+
+    def remove(self, dev: int, ino: int):
+        """
+        删除文件记录
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM file_hash WHERE dev = ? AND ino = ?", (dev, ino))
+
+    def save_seen(self, rows: Iterable[Tuple[int, int, int, int, str]], run_id: int):
+        """
+        记录本次扫描中存在的文件：新文件只保存 stat 信息（哈希在需要时计算），
+        已有记录更新路径和扫描标识，stat 信息变化时旧哈希作废
+        :param rows: [(st_dev, st_ino, st_size, st_mtime_ns, path), ...]
+        """
+        with self._lock:
+            self._conn.executemany(
+                self._UPSERT_SQL,
+                ((dev, ino, size, mtime_ns, path, None, None, run_id, self.algorithm)
+                 for dev, ino, size, mtime_ns, path in rows),
+            )
+
+    def prune(self, run_id: int) -> int:
+        """
+        删除本次扫描中未再出现的文件记录
+        :return: 删除的记录数
+        """
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM file_hash WHERE last_seen < ?", (run_id,))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def commit(self):
+        """
+        提交未保存的修改
+        """
+        with self._lock:
+            self._conn.commit()
+            self._last_commit = time.monotonic()
+
+    def close(self):
+        """
+        提交并关闭数据库
+        """
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
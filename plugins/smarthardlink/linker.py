@@ -0,0 +1,211 @@
+"""
+批量链接模块
+"""
+import json
+import os
+import time
+import uuid
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+if __package__ in (None, ""):
+    from walker import FileRecord
+else:
+    from plugins.smarthardlink.walker import FileRecord
+
+
+class LinkOp(NamedTuple):
+    """
+    一次链接操作：将 target 替换为 source 的硬链接
+    """
+    source: str
+    target: str
+    temp: str  # 与 target 位于同一目录的临时文件名
+    source_ino: int
+    target_ino: int
+    size: int
+    mtime_ns: int  # target 在遍历时的修改时间
+
+
+def _fsync_dir(dir_path: str):
+    """
+    同步目录，确保其中的改名和链接写入磁盘
+    """
+    fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _target_unchanged(op: LinkOp) -> bool:
+    """
+    target 是否仍是遍历时的文件
+    """
+    try:
+        st = os.lstat(op.target)
+    except OSError:
+        return False
+    return st.st_ino == op.target_ino and st.st_size == op.size and st.st_mtime_ns == op.mtime_ns
+
+
+class LinkExecutor:
+    """
+    批量链接执行器
+
+    每个重复文件先以 os.link 在同一目录中创建指向源文件的临时链接，再用 os.replace 原子地替换，
+    过程中原文件始终存在，不会出现旧实现中“已改名、未链接”的中间状态。
+    操作按批执行：执行前将整批操作写入意图日志并同步，执行时按目录分组，每个目录只同步一次，
+    整批完成后清空日志。进程在执行中途退出时，由 recover_journal 根据日志逐项完成或撤销。
+    """
+
+    def __init__(self, journal_file: str, on_result: Callable[[LinkOp, Optional[str]], None],
+                 batch_size: int = 256, max_delay: float = 5):
+        """
+        :param journal_file: 意图日志文件路径
+        :param on_result: 每个操作完成后的回调 (op, 错误信息)，成功时错误信息为 None
+        :param batch_size: 每批最多的操作数
+        :param max_delay: 操作最长等待时间（秒），超过后即使未满一批也应执行
+        """
+        os.makedirs(os.path.dirname(journal_file), exist_ok=True)
+        self.journal_file = journal_file
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._on_result = on_result
+        self._ops: List[LinkOp] = []
+        self._first_added = 0.0
+
+    def add(self, source: FileRecord, target: FileRecord):
+        """
+        添加一个链接操作，在 flush 时执行
+        """
+        # 临时文件名使用固定长度，避免长文件名加上前后缀后超出文件系统的文件名长度限制；
+        # 与目标文件的对应关系由日志记录
+        temp = os.path.join(os.path.dirname(target.path), f".shl-{uuid.uuid4().hex[:8]}.tmp")
+        if not self._ops:
+            self._first_added = time.monotonic()
+        self._ops.append(LinkOp(source.path, target.path, temp, source.ino, target.ino, target.size,
+                                target.mtime_ns))
+
+    @property
+    def pending(self) -> int:
+        return len(self._ops)
+
+    def due(self) -> bool:
+        """
+        是否应执行当前批次
+        """
+        return bool(self._ops) and (len(self._ops) >= self.batch_size
+                                    or time.monotonic() - self._first_added >= self.max_delay)
+
+    def flush(self):
+        """
+        执行当前批次的所有操作
+        """
+        if not self._ops:
+            return
+        ops, self._ops = self._ops, []
+        _write_journal(self.journal_file, ops)
+        by_dir: Dict[str, List[LinkOp]] = {}
+        for op in ops:
+            by_dir.setdefault(os.path.dirname(op.target), []).append(op)
+        results: List[Tuple[LinkOp, Optional[str]]] = []
+        for dir_path, dir_ops in by_dir.items():
+            for op in dir_ops:
+                results.append((op, self._execute(op)))
+            try:
+                _fsync_dir(dir_path)
+            except OSError:
+                # 部分文件系统（如某些网络存储）不支持同步目录，链接本身已完成
+                pass
+        _clear_journal(self.journal_file)
+        for op, error in results:
+            self._on_result(op, error)
+
+    @staticmethod
+    def _execute(op: LinkOp) -> Optional[str]:
+        """
+        执行一个链接操作
+        :return: 失败时返回错误信息
+        """
+        try:
+            os.link(op.source, op.temp)
+        except OSError as e:
+            return f"创建临时链接失败: {e}"
+        try:
+            # 源文件或重复文件在等待期间可能被替换或修改
+            if os.lstat(op.temp).st_ino != op.source_ino:
+                os.remove(op.temp)
+                return "源文件已变化"
+            if not _target_unchanged(op):
+                os.remove(op.temp)
+                return "文件已变化"
+            os.replace(op.temp, op.target)
+        except OSError as e:
+            try:
+                os.remove(op.temp)
+            except OSError:
+                pass
+            return f"替换失败: {e}"
+        return None
+
+
+def _write_journal(journal_file: str, ops: List[LinkOp]):
+    """
+    写入意图日志并同步到磁盘
+    """
+    with open(journal_file, "w", encoding="utf-8") as f:
+        for op in ops:
+            f.write(json.dumps(op._asdict(), ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _clear_journal(journal_file: str):
+    """
+    清空意图日志
+    """
+    with open(journal_file, "w", encoding="utf-8") as f:
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def recover_journal(journal_file: str) -> Tuple[int, int]:
+    """
+    处理上次中断时未完成的批次：临时链接仍在时，若重复文件未变化则完成替换，否则删除临时链接
+    :return: (完成的操作数, 撤销的操作数)
+    """
+    if not os.path.exists(journal_file):
+        return 0, 0
+    ops = []
+    with open(journal_file, encoding="utf-8") as f:
+        for line in f:
+            try:
+                ops.append(LinkOp(**json.loads(line)))
+            except (ValueError, TypeError):
+                # 写入日志时中断，最后一行可能不完整；此时该批次尚未开始执行
+                continue
+    replayed = rolled_back = 0
+    dirs = set()
+    for op in ops:
+        try:
+            temp_ino = os.lstat(op.temp).st_ino
+        except OSError:
+            # 没有临时链接：该操作尚未开始或已完成替换
+            continue
+        dirs.add(os.path.dirname(op.target))
+        try:
+            if temp_ino == op.source_ino and _target_unchanged(op):
+                os.replace(op.temp, op.target)
+                replayed += 1
+            else:
+                os.remove(op.temp)
+                rolled_back += 1
+        except OSError:
+            continue
+    for dir_path in dirs:
+        try:
+            _fsync_dir(dir_path)
+        except OSError:
+            pass
+    _clear_journal(journal_file)
+    return replayed, rolled_back
@@ -0,0 +1,89 @@
+"""
+运行性能统计模块
+"""
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class RunMetrics:
+    """
+    单次运行的性能统计
+
+    - 各阶段耗时：遍历、分组、哈希、链接等，链接与哈希并行执行，链接阶段记录的是链接线程的累计耗时
+    - 错误计数：按类别统计系统调用失败的次数
+    - 最慢的文件和目录：各保留耗时最长的 N 个
+    所有方法都是线程安全的，可以在哈希线程和链接线程中调用。
+    """
+
+    def __init__(self, slowest_n: int = 10):
+        """
+        :param slowest_n: 保留最慢文件/目录的数量
+        """
+        self.slowest_n = slowest_n
+        self._lock = threading.Lock()
+        self._phases: Dict[str, float] = {}
+        self._errors: Dict[str, int] = {}
+        self._slowest: Dict[str, List[Tuple[float, str, Optional[int]]]] = {"files": [], "dirs": []}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        统计代码块的耗时，计入指定阶段
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float):
+        """
+        累加阶段耗时
+        """
+        with self._lock:
+            self._phases[name] = self._phases.get(name, 0.0) + seconds
+
+    def count_error(self, kind: str, count: int = 1):
+        """
+        累加错误次数
+        """
+        with self._lock:
+            self._errors[kind] = self._errors.get(kind, 0) + count
+
+    def record_slow(self, kind: str, path: str, seconds: float, size: Optional[int] = None):
+        """
+        记录文件或目录的处理耗时，只保留最慢的 N 个
+        :param kind: files 或 dirs
+        :param size: 文件大小或目录中的文件数
+        """
+        with self._lock:
+            heap = self._slowest[kind]
+            item = (seconds, path, size)
+            if len(heap) < self.slowest_n:
+                heapq.heappush(heap, item)
+            elif seconds > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+    def phase_time(self, name: str) -> float:
+        """
+        阶段累计耗时（秒）
+        """
+        with self._lock:
+            return self._phases.get(name, 0.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为可保存到历史记录的字典
+        """
+        with self._lock:
+            return {
+                "phases": {name: round(seconds, 3) for name, seconds in self._phases.items()},
+                "errors": dict(self._errors),
+                "slowest_files": [{"path": path, "seconds": round(seconds, 3), "size": size}
+                                  for seconds, path, size in sorted(self._slowest["files"], reverse=True)],
+                "slowest_dirs": [{"path": path, "seconds": round(seconds, 3), "files": size}
+                                 for seconds, path, size in sorted(self._slowest["dirs"], reverse=True)],
+            }
@@ -0,0 +1,121 @@
+"""
+扫描流水线模块
+
+完整扫描中按 (设备号, 文件大小) 分组、按 inode 合并以及抽样指纹与完整哈希比较的部分，
+不依赖 MoviePilot，插件和性能基准测试共用同一份实现
+"""
+from typing import Callable, Container, Dict, List, Optional, Tuple
+
+if __package__ in (None, ""):
+    from filetable import FileTable
+    from walker import FileRecord
+else:
+    from plugins.smarthardlink.filetable import FileTable
+    from plugins.smarthardlink.walker import FileRecord
+
+
+class BucketPlan:
+    """
+    分组结果：需要计算哈希的同大小文件组，以及无需计算哈希的文件统计
+    """
+
+    def __init__(self):
+        self.buckets: List[Tuple[int, List[List[FileRecord]]]] = []  # [(file_size, [inode_group, ...]), ...]
+        self.skipped_files = 0  # 大小唯一或已全部是同一 inode 硬链接的文件数
+        self.skipped_bytes = 0
+        self.hardlinks = 0  # 与组内其他文件共享 inode 的文件数
+        self.resumed_buckets = 0  # 因已完成而跳过的文件组数
+        self.resumed_files = 0
+
+
+def group_by_inode(files: List[FileRecord]) -> List[List[FileRecord]]:
+    """
+    按 (设备号, inode) 对文件分组，同组文件互为硬链接
+    """
+    inode_groups = {}
+    for record in files:
+        inode_groups.setdefault((record.dev, record.ino), []).append(record)
+    return list(inode_groups.values())
+
+
+def plan_buckets(file_table: FileTable, done_buckets: Container[Tuple[int, int]] = (),
+                 on_size_group: Optional[Callable[[int, Dict[int, List[int]]], None]] = None,
+                 on_bucket: Optional[Callable[[int, int, List[int]], None]] = None) -> BucketPlan:
+    """
+    按 (设备号, 文件大小) 分组，同一设备上大小唯一的文件不可能有可硬链接的重复文件，无需计算哈希；
+    只有需要比较的文件才还原为 FileRecord，并按 inode 合并，同一 inode 只需读取一次
+    :param done_buckets: 已完成的 (设备号, 文件大小)，直接跳过
+    :param on_size_group: 每个文件大小调用一次，参数为 (file_size, {st_dev: [行号, ...]})
+    :param on_bucket: 每个需要计算哈希的文件组调用一次，参数为 (file_size, st_dev, [行号, ...])
+    :return: 分组结果，文件组按文件大小从小到大排列
+    """
+    plan = BucketPlan()
+    for file_size, rows_by_dev in file_table.iter_size_groups():
+        if on_size_group:
+            on_size_group(file_size, rows_by_dev)
+        for file_dev, rows in rows_by_dev.items():
+            if (file_dev, file_size) in done_buckets:
+                plan.resumed_buckets += 1
+                plan.resumed_files += len(rows)
+                continue
+            if len(rows) < 2:
+                plan.skipped_files += 1
+                plan.skipped_bytes += file_size
+                continue
+            files = file_table.records(rows)
+            inode_groups = group_by_inode(files)
+            # 同一 inode 的其余文件已是硬链接，无论是否找到重复文件都计入
+            plan.hardlinks += len(files) - len(inode_groups)
+            if len(inode_groups) < 2:
+                plan.skipped_files += len(files)
+                plan.skipped_bytes += file_size * len(files)
+                continue
+            plan.buckets.append((file_size, inode_groups))
+            if on_bucket:
+                on_bucket(file_size, file_dev, rows)
+    return plan
+
+
+def compare_bucket(groups: List[List[FileRecord]], sample_hash: Callable[[FileRecord], Optional[str]],
+                   full_hash: Callable[[FileRecord], Optional[str]], sample_chunk_size: int,
+                   should_stop: Optional[Callable[[], bool]] = None
+                   ) -> Optional[Tuple[int, List[Tuple[str, List[FileRecord]]]]]:
+    """
+    比较一组同设备、同大小文件的内容：大文件先比较抽样指纹，抽样已能区分的文件不可能重复，
+    其余文件再以完整哈希确认；小文件的抽样即为全部内容，直接计算完整哈希
+    :param groups: 按 inode 分组的文件，每个 inode 只读取一个代表文件
+    :param sample_hash: 计算抽样指纹，失败时返回 None，该 inode 不参与比较
+    :param full_hash: 计算完整哈希，失败时返回 None，该 inode 不参与比较
+    :param should_stop: 返回 True 时不再读取新的文件
+    :return: (处理的文件数, [(哈希值, [FileRecord, ...]), ...] 内容相同且包含多个 inode 的文件组)；
+             被停止时返回 None
+    """
+    file_size = groups[0][0].size
+    processed = 0
+    candidates = groups
+    if file_size > sample_chunk_size * 3:
+        sample_groups: Dict[str, List[List[FileRecord]]] = {}
+        for group in groups:
+            if should_stop and should_stop():
+                return None
+            digest = sample_hash(group[0])
+            if digest:
+                sample_groups.setdefault(digest, []).append(group)
+        candidates = []
+        for same_sample_groups in sample_groups.values():
+            if len(same_sample_groups) < 2:
+                processed += len(same_sample_groups[0])
+                continue
+            candidates.extend(same_sample_groups)
+    # 哈希结果应用到同一 inode 的所有文件
+    full_groups: Dict[str, List[List[FileRecord]]] = {}
+    for group in candidates:
+        if should_stop and should_stop():
+            return None
+        digest = full_hash(group[0])
+        if digest:
+            full_groups.setdefault(digest, []).append(group)
+            processed += len(group)
+    duplicate_groups = [(digest, [record for group in same_groups for record in group])
+                        for digest, same_groups in full_groups.items() if len(same_groups) > 1]
+    return processed, duplicate_groups
@@ -0,0 +1,233 @@
+"""
+重复文件组报告模块
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+if __package__ in (None, ""):
+    from walker import FileRecord
+else:
+    from plugins.smarthardlink.walker import FileRecord
+
+
+class DuplicateReport:
+    """
+    按运行保存发现的重复文件组，供界面分页浏览
+
+    试运行只在日志中逐组输出结果，保存后无需重新扫描即可查看将被链接的文件；
+    每组记录源文件所在目录、文件数、inode 数和可节省空间（文件大小 x (inode 数 - 1)），
+    分页查询只读取当前页的文件组及其文件，报告再大也不需要整体载入内存。
+    """
+
+    # 可排序的字段：{接口参数: 数据库列}
+    SORT_COLUMNS = {"reclaimable": "reclaimable", "files": "file_count", "directory": "directory"}
+
+    def __init__(self, db_file: str, keep_runs: int = 10, commit_interval: float = 30):
+        """
+        :param db_file: 数据库文件路径
+        :param keep_runs: 保留最近几次运行的报告
+        :param commit_interval: 最短提交间隔（秒）
+        """
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self.keep_runs = keep_runs
+        self._lock = threading.Lock()
+        self._commit_interval = commit_interval
+        self._last_commit = time.monotonic()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS report_run (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                checkpoint_id INTEGER,
+                kind TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                status TEXT,
+                started_at INTEGER NOT NULL,
+                finished_at INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS dup_group (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id INTEGER NOT NULL,
+                file_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                file_count INTEGER NOT NULL,
+                inode_count INTEGER NOT NULL,
+                reclaimable INTEGER NOT NULL,
+                directory TEXT NOT NULL,
+                source_path TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_dup_group_reclaimable ON dup_group (run_id, reclaimable);
+            CREATE INDEX IF NOT EXISTS idx_dup_group_files ON dup_group (run_id, file_count);
+            CREATE INDEX IF NOT EXISTS idx_dup_group_directory ON dup_group (run_id, directory);
+            CREATE TABLE IF NOT EXISTS dup_file (
+                group_id INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                ino INTEGER NOT NULL,
+                is_source INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_dup_file_group ON dup_file (group_id);
+            """
+        )
+        # 早期版本以开始时间（秒）作为运行标识，同一秒内开始的运行会共用记录；
+        # 重建为自增标识，原有记录保留原标识，断点标识即原运行标识
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(report_run)")}
+        if "checkpoint_id" not in columns:
+            self._conn.executescript(
+                """
+                ALTER TABLE report_run RENAME TO report_run_old;
+                CREATE TABLE report_run (
+                    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    checkpoint_id INTEGER,
+                    kind TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    status TEXT,
+                    started_at INTEGER NOT NULL,
+                    finished_at INTEGER
+                );
+                INSERT INTO report_run (run_id, checkpoint_id, kind, mode, status, started_at, finished_at)
+                    SELECT run_id, run_id, kind, mode, status, started_at, finished_at FROM report_run_old;
+                DROP TABLE report_run_old;
+                """
+            )
+        self._conn.commit()
+
+    def start_run(self, kind: str, mode: str, checkpoint_id: Optional[int] = None, resume: bool = False) -> int:
+        """
+        开始记录一次运行
+        :param kind: 完整扫描或增量
+        :param mode: 试运行或实际运行
+        :param checkpoint_id: 完整扫描断点的运行标识
+        :param resume: 是否从断点继续，是则沿用该断点已有的记录
+        :return: 报告中该次运行的标识，每次运行各不相同，与断点的运行标识无关
+        """
+        with self._lock:
+            if resume and checkpoint_id is not None:
+                row = self._conn.execute(
+                    "SELECT run_id FROM report_run WHERE checkpoint_id = ? ORDER BY run_id DESC LIMIT 1",
+                    (checkpoint_id,)).fetchone()
+                if row:
+                    return row[0]
+            cursor = self._conn.execute(
+                "INSERT INTO report_run (checkpoint_id, kind, mode, started_at) VALUES (?, ?, ?, ?)",
+                (checkpoint_id, kind, mode, int(time.time())),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def add_group(self, run_id: int, file_hash: str, files: List[FileRecord]):
+        """
+        记录一个重复文件组，files[0] 为保留的源文件，按提交间隔批量写入磁盘
+        """
+        source = files[0]
+        inode_count = len({(record.dev, record.ino) for record in files})
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO dup_group (run_id, file_hash, size, file_count, inode_count, reclaimable, directory, "
+                "source_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, file_hash, source.size, len(files), inode_count, source.size * (inode_count - 1),
+                 os.path.dirname(source.path), source.path),
+            )
+            group_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO dup_file (group_id, path, ino, is_source) VALUES (?, ?, ?, ?)",
+                ((group_id, record.path, record.ino, int(idx == 0)) for idx, record in enumerate(files)),
+            )
+            if time.monotonic() - self._last_commit >= self._commit_interval:
+                self._conn.commit()
+                self._last_commit = time.monotonic()
+
+    def finish_run(self, run_id: int, status: str, drop_if_empty: bool = False):
+        """
+        结束一次运行，并删除超出保留数量的旧报告
+        :param drop_if_empty: 没有发现重复文件组时不保留该次运行（用于频繁触发的增量去重）
+        """
+        with self._lock:
+            self._conn.execute("UPDATE report_run SET status = ?, finished_at = ? WHERE run_id = ?",
+                               (status, int(time.time()), run_id))
+            stale = []
+            if drop_if_empty and not self._conn.execute(
+                    "SELECT 1 FROM dup_group WHERE run_id = ? LIMIT 1", (run_id,)).fetchone():
+                stale.append(run_id)
+            stale.extend(row[0] for row in self._conn.execute(
+                "SELECT run_id FROM report_run WHERE run_id != ? ORDER BY run_id DESC LIMIT -1 OFFSET ?",
+                (run_id, max(self.keep_runs - 1, 0))))
+            for stale_id in stale:
+                self._conn.execute(
+                    "DELETE FROM dup_file WHERE group_id IN (SELECT id FROM dup_group WHERE run_id = ?)", (stale_id,))
+                self._conn.execute("DELETE FROM dup_group WHERE run_id = ?", (stale_id,))
+                self._conn.execute("DELETE FROM report_run WHERE run_id = ?", (stale_id,))
+            self._conn.commit()
+            self._last_commit = time.monotonic()
+
+    def runs(self) -> List[Dict[str, Any]]:
+        """
+        已保存报告的运行，最新的在前
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.run_id, r.kind, r.mode, r.status, r.started_at, r.finished_at, "
+                "COUNT(g.id), COALESCE(SUM(g.file_count), 0), COALESCE(SUM(g.reclaimable), 0) "
+                "FROM report_run r LEFT JOIN dup_group g ON g.run_id = r.run_id "
+                "GROUP BY r.run_id ORDER BY r.run_id DESC"
+            ).fetchall()
+        return [{"run_id": run_id, "kind": kind, "mode": mode, "status": status, "started_at": started_at,
+                 "finished_at": finished_at, "groups": groups, "files": files, "reclaimable": reclaimable}
+                for run_id, kind, mode, status, started_at, finished_at, groups, files, reclaimable in rows]
+
+    def latest_run_id(self) -> Optional[int]:
+        """
+        最近一次运行的标识
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(run_id) FROM report_run").fetchone()
+        return row[0] if row else None
+
+    def page(self, run_id: int, page: int = 1, page_size: int = 50, sort: str = "reclaimable",
+             descending: bool = True) -> Dict[str, Any]:
+        """
+        分页查询一次运行的重复文件组
+        :param sort: 排序字段，见 SORT_COLUMNS
+        :return: {"total": 文件组总数, "page": 页码, "page_size": 每页数量, "items": [文件组, ...]}
+        """
+        column = self.SORT_COLUMNS.get(sort)
+        if not column:
+            raise ValueError(f"不支持的排序字段: {sort}")
+        page = max(int(page), 1)
+        page_size = min(max(int(page_size), 1), 500)
+        direction = "DESC" if descending else "ASC"
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM dup_group WHERE run_id = ?", (run_id,)).fetchone()[0]
+            groups = self._conn.execute(
+                "SELECT id, file_hash, size, file_count, inode_count, reclaimable, directory, source_path "
+                f"FROM dup_group WHERE run_id = ? ORDER BY {column} {direction}, id LIMIT ? OFFSET ?",
+                (run_id, page_size, (page - 1) * page_size),
+            ).fetchall()
+            files: Dict[int, List[Dict[str, Any]]] = {}
+            if groups:
+                placeholders = ",".join("?" * len(groups))
+                for group_id, path, ino, is_source in self._conn.execute(
+                        f"SELECT group_id, path, ino, is_source FROM dup_file WHERE group_id IN ({placeholders})",
+                        [group[0] for group in groups]):
+                    files.setdefault(group_id, []).append({"path": path, "ino": ino, "source": bool(is_source)})
+        return {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "items": [{"id": group_id, "hash": file_hash, "size": size, "files": file_count, "inodes": inode_count,
+                       "reclaimable": reclaimable, "directory": directory, "source": source_path,
+                       "paths": files.get(group_id, [])}
+                      for group_id, file_hash, size, file_count, inode_count, reclaimable, directory, source_path
+                      in groups],
+        }
+
+    def close(self):
+        """
+        提交并关闭数据库
+        """
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,129 @@
+"""
+读取限速模块
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+
+class RateLimiter:
+    """
+    令牌桶限速器
+
+    所有哈希线程共享同一个限速器，总读取速度不超过设定值。令牌不足时记为欠额，
+    调用方在锁外按欠额等待，因此多个线程同时读取时总速度仍然准确。
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        :param rate: 每秒允许读取的字节数
+        :param burst: 令牌桶容量（字节），默认允许 0.25 秒的突发读取，避免短时间内集中读取
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst) if burst else self.rate / 4
+        self.waited = 0.0  # 累计限速等待时间（秒）
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int):
+        """
+        消耗令牌，超出速度限制时等待
+        :param amount: 本次读取的字节数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += wait
+        if wait > 0:
+            time.sleep(wait)
+
+
+class DiskIdleGate:
+    """
+    磁盘空闲检测
+
+    通过 /proc/diskstats 中的 io_ticks（设备忙碌的毫秒数）计算磁盘利用率，利用率低于阈值时才允许读取。
+    每个设备每隔 check_interval 秒检测一次：检测时当前线程暂停读取 sample_interval 秒，
+    此时测得的利用率来自其他进程（如做种），每设备并发为 1 时不受本插件自身读取的影响。
+    """
+
+    def __init__(self, threshold: float = 20, sample_interval: float = 1, check_interval: float = 30,
+                 diskstats: str = "/proc/diskstats"):
+        """
+        :param threshold: 利用率阈值（百分比），低于该值视为空闲
+        :param sample_interval: 每次采样的时长（秒）
+        :param check_interval: 磁盘空闲后再次检测的间隔（秒）
+        :param diskstats: 磁盘统计文件路径
+        """
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.check_interval = check_interval
+        self.waited = 0.0  # 因磁盘繁忙累计等待的时间（秒）
+        self.unsupported_devices: Set[int] = set()  # 在磁盘统计中找不到的设备，不做空闲检测
+        self._diskstats = diskstats
+        self._idle_until: Dict[int, float] = {}  # {st_dev: 下次检测的时间}
+        self._lock = threading.Lock()
+
+    def _read_io_ticks(self, dev: int) -> Optional[int]:
+        """
+        读取设备的 io_ticks，设备号来自 st_dev
+        """
+        key = (str(os.major(dev)), str(os.minor(dev)))
+        try:
+            with open(self._diskstats) as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) >= 13 and (fields[0], fields[1]) == key:
+                        return int(fields[12])
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def utilization(self, dev: int) -> Optional[float]:
+        """
+        采样 sample_interval 秒，计算设备利用率
+        :return: 利用率（百分比）；设备不在磁盘统计中时返回 None
+        """
+        start = self._read_io_ticks(dev)
+        if start is None:
+            return None
+        time.sleep(self.sample_interval)
+        end = self._read_io_ticks(dev)
+        if end is None:
+            return None
+        return min(100.0, (end - start) / (self.sample_interval * 1000) * 100)
+
+    def wait_until_idle(self, dev: int, should_stop: Optional[Callable[[], bool]] = None) -> float:
+        """
+        等待设备空闲
+        :param dev: 设备号（st_dev）
+        :param should_stop: 返回 True 时停止等待，用于响应取消
+        :return: 本次等待的时间（秒），不包括最后一次判定为空闲的采样
+        """
+        now = time.monotonic()
+        with self._lock:
+            if dev in self.unsupported_devices or self._idle_until.get(dev, 0) > now:
+                return 0.0
+        waited = 0.0
+        while True:
+            util = self.utilization(dev)
+            if util is None:
+                with self._lock:
+                    self.unsupported_devices.add(dev)
+                return waited
+            if util < self.threshold:
+                with self._lock:
+                    self._idle_until[dev] = time.monotonic() + self.check_interval
+                    self.waited += waited
+                return waited
+            waited += self.sample_interval
+            if should_stop and should_stop():
+                with self._lock:
+                    self.waited += waited
+                return waited
+
@@ -0,0 +1,153 @@
+"""
+目录遍历模块
+"""
+import bisect
+import os
+import re
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Pattern
+
+
+class FileRecord(NamedTuple):
+    """
+    遍历得到的文件信息，来自同一次 lstat，在整个处理流程中传递，避免重复获取文件状态
+    """
+    path: str
+    size: int
+    dev: int
+    ino: int
+    mtime_ns: int
+    nlink: int
+
+
+class ExcludeMatcher:
+    """
+    预编译的排除规则
+
+    - 排除目录：按路径前缀匹配。去掉被其他前缀覆盖的冗余前缀后排序，
+      任意路径最多只需与二分查找得到的一个前缀比较
+    - 排除扩展名：frozenset 查找
+    - 排除关键词：合并为一个正则表达式，每个路径只需匹配一次
+    """
+
+    def __init__(self, exclude_dirs: Iterable[str] = (), exclude_extensions: Iterable[str] = (),
+                 exclude_keywords: Iterable[str] = (), on_invalid: Optional[Callable[[str, Exception], None]] = None):
+        """
+        :param exclude_dirs: 排除的目录（路径前缀）
+        :param exclude_extensions: 排除的扩展名，不带点，忽略大小写
+        :param exclude_keywords: 排除的路径正则表达式
+        :param on_invalid: 正则表达式无效时的回调 (keyword, error)，无效的表达式会被忽略
+        """
+        prefixes = sorted({d.strip() for d in exclude_dirs if d and d.strip()})
+        self._prefixes: List[str] = []
+        for prefix in prefixes:
+            # 排序后被覆盖的前缀一定紧跟在覆盖它的前缀之后
+            if self._prefixes and prefix.startswith(self._prefixes[-1]):
+                continue
+            self._prefixes.append(prefix)
+        self._extensions = frozenset(f".{ext.strip().lower()}" for ext in exclude_extensions
+                                     if ext and ext.strip())
+        self._keyword_patterns = self._compile_keywords(exclude_keywords, on_invalid)
+
+    @staticmethod
+    def _compile_keywords(keywords: Iterable[str],
+                          on_invalid: Optional[Callable[[str, Exception], None]]) -> List[Pattern]:
+        """
+        将所有关键词合并编译为一个正则表达式
+        """
+        valid = []
+        has_groups = False
+        for keyword in keywords:
+            if not keyword:
+                continue
+            try:
+                has_groups = has_groups or re.compile(keyword).groups > 0
+                valid.append(keyword)
+            except re.error as e:
+                if on_invalid:
+                    on_invalid(keyword, e)
+        if not valid:
+            return []
+        if not has_groups:
+            try:
+                return [re.compile("|".join(f"(?:{keyword})" for keyword in valid))]
+            except re.error:
+                pass
+        # 合并后分组编号和分组名会相互影响（如 \1 指向其他表达式的分组），含有分组或无法合并时逐个匹配
+        return [re.compile(keyword) for keyword in valid]
+
+    def _match_prefix(self, path: str) -> bool:
+        idx = bisect.bisect_right(self._prefixes, path)
+        return idx > 0 and path.startswith(self._prefixes[idx - 1])
+
+    def is_dir_excluded(self, dir_path: str) -> bool:
+        """
+        目录是否整体被排除，被排除的目录在遍历时不再进入
+        """
+        if not self._prefixes:
+            return False
+        return self._match_prefix(dir_path) or self._match_prefix(dir_path + os.sep)
+
+    def is_excluded(self, file_path: str) -> bool:
+        """
+        文件是否应该被排除
+        """
+        if self._prefixes and self._match_prefix(file_path):
+            return True
+        if self._extensions and os.path.splitext(file_path)[1].lower() in self._extensions:
+            return True
+        return any(pattern.search(file_path) for pattern in self._keyword_patterns)
+
+
+def walk_files(root: str,
+               on_error: Optional[Callable[[str, OSError], None]] = None,
+               skip_dir: Optional[Callable[[str], bool]] = None,
+               on_dir_done: Optional[Callable[[str, float, int], None]] = None,
+               dir_mtimes: Optional[Dict[str, int]] = None) -> Iterator[FileRecord]:
+    """
+    基于 os.scandir 遍历目录下的所有普通文件（不跟随符号链接）
+
+    目录和文件类型通过 DirEntry 判断（多数文件系统上由 readdir 直接返回，无需额外系统调用），
+    每个文件只调用一次 DirEntry.stat(follow_symlinks=False)
+    :param root: 起始目录
+    :param on_error: 出错时的回调 (path, error)，出错的目录或文件会被跳过
+    :param skip_dir: 判断子目录是否跳过的函数，被跳过的目录不会进入
+    :param on_dir_done: 每个目录遍历完成后的回调 (path, 耗时秒, 文件数)，耗时包含调用方处理该目录文件的时间
+    :param dir_mtimes: 不为空时记录进入的各目录的修改时间 {目录路径: 修改时间}，子目录的修改时间取自 DirEntry，
+                       无法获取修改时间的目录不记录
+    """
+    if dir_mtimes is not None:
+        try:
+            dir_mtimes[root] = os.stat(root).st_mtime_ns
+        except OSError:
+            pass
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        start = time.perf_counter() if on_dir_done else 0
+        file_count = 0
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not skip_dir or not skip_dir(entry.path):
+                                stack.append(entry.path)
+                                if dir_mtimes is not None:
+                                    try:
+                                        dir_mtimes[entry.path] = entry.stat(follow_symlinks=False).st_mtime_ns
+                                    except OSError:
+                                        pass
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            file_count += 1
+                            yield FileRecord(entry.path, st.st_size, st.st_dev, st.st_ino,
+                                             st.st_mtime_ns, st.st_nlink)
+                    except OSError as e:
+                        if on_error:
+                            on_error(entry.path, e)
+        except OSError as e:
+            if on_error:
+                on_error(current, e)
+        if on_dir_done:
+            on_dir_done(current, time.perf_counter() - start, file_count)
@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import errno
 import os
 import re
 import shutil
 import string
+import threading
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Tuple, Dict, Any, Optional, Set, Union
+from typing import Callable, List, Tuple, Dict, Any, Optional, Set, Union
 
 from pydantic import BaseModel
 import pytz
@@ -32,6 +34,8 @@ from app.helper.downloader import DownloaderHelper
 from app.schemas import ServiceInfo
 from app.modules.qbittorrent import Qbittorrent
 from app.modules.transmission import Transmission
+from plugins.trashclean.scanner import DirInfo, ScanSnapshot, scan_tree, scan_trees
+from plugins.trashclean.sizeindex import DirSizeIndex
 
 
 # --- 配置模型 ---
@@ -48,6 +52,8 @@ class TrashCleanConfig(BaseModel):
     size_reduction_cleanup: bool = False  # 清理体积减少的目录
     size_reduction_threshold: int = 80  # 体积减少阈值(%)
     scan_interval: int = 24  # 监控间隔(小时)
+    scan_workers: int = 4  # 并行扫描线程数
+    scan_cache_hours: int = 12  # 扫描缓存有效期(小时)，0 表示不使用缓存
     exclude_dirs: List[str] = []  # 排除的目录
     onlyonce: bool = False  # 仅执行一次
 
@@ -58,7 +64,7 @@ class TrashClean(_PluginBase):
     plugin_name = "垃圾文件清理"
     plugin_desc = "自动清理下载文件夹中的垃圾文件"
     plugin_icon = "https://raw.githubusercontent.com/madrays/MoviePilot-Plugins/main/icons/clean1.png"
-    plugin_version = "1.1"
+    plugin_version = "1.6"
     plugin_author = "madrays"
     author_url = "https://github.com/madrays"
     plugin_config_prefix = "trashclean_"
@@ -77,10 +83,14 @@ class TrashClean(_PluginBase):
     _size_reduction_cleanup = False
     _size_reduction_threshold = 80
     _scan_interval = 24
+    _scan_workers = 4
+    _scan_cache_hours = 12
     _exclude_dirs = []
 
     _scheduler: Optional[BackgroundScheduler] = None
     _plugin_dir: Path = Path(__file__).parent
+    # 目录大小索引（扫描缓存和历史数据）
+    _size_index: Optional[DirSizeIndex] = None
     
     # 目录监控数据
     _dir_size_history: Dict[str, Dict[str, Any]] = {}
@@ -96,8 +106,11 @@ class TrashClean(_PluginBase):
         "start_time": None,
         "status": "idle",
         "message": "",
-        "percent": 0
+        "percent": 0,
+        "scanned_dirs": 0
     }
+    # 清理进度锁，扫描线程与接口查询会同时访问进度
+    _progress_lock = threading.Lock()
 
     def init_plugin(self, config: dict = None):
         """初始化插件"""
@@ -116,6 +129,8 @@ class TrashClean(_PluginBase):
             self._size_reduction_cleanup = config.get('size_reduction_cleanup', False)
             self._size_reduction_threshold = config.get('size_reduction_threshold', 80)
             self._scan_interval = config.get('scan_interval', 24)
+            self._scan_workers = self._parse_scan_workers(config.get('scan_workers', 4))
+            self._scan_cache_hours = self._parse_scan_cache_hours(config.get('scan_cache_hours', 12))
             
             # 确保排除目录正确初始化
             exclude_dirs = config.get('exclude_dirs', [])
@@ -179,17 +194,19 @@ class TrashClean(_PluginBase):
             return {"status": "error", "message": "未设置监控路径"}
         
         # 初始化进度数据
-        self._clean_progress = {
-            "running": True,
-            "total_dirs": 0,
-            "processed_dirs": 0,
-            "current_dir": "",
-            "removed_dirs": [],
-            "start_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "status": "running",
-            "message": "开始清理任务...",
-            "percent": 0
-        }
+        with self._progress_lock:
+            self._clean_progress = {
+                "running": True,
+                "total_dirs": 0,
+                "processed_dirs": 0,
+                "current_dir": "",
+                "removed_dirs": [],
+                "start_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "status": "running",
+                "message": "开始清理任务...",
+                "percent": 0,
+                "scanned_dirs": 0
+            }
         
         # 初始化结果
         result = {
@@ -205,21 +222,20 @@ class TrashClean(_PluginBase):
             # 确保我们首先加载历史数据
             self._load_history_data()
             
+            # 每个监控路径只遍历一次，得到的快照供历史数据、清理判断、历史数据精简和目录统计共用
+            logger.info(f"{log_prefix}: 开始扫描目录结构")
+            self._update_clean_progress(message="扫描目录结构...", percent=2)
+            snapshot = self._scan_monitor_paths(use_cache=True, on_dir=self._count_scanned_dir)
+            total_dirs = len(snapshot)
+            logger.info(f"{log_prefix}: 共 {total_dirs} 个目录，其中 {snapshot.reused_dirs} 个未变化的目录使用缓存")
+            self._update_clean_progress(total_dirs=total_dirs, message=f"扫描完成，共 {total_dirs} 个目录")
+            
             # 更新目录大小历史
             logger.info(f"{log_prefix}: 开始更新目录大小历史数据")
-            self._update_clean_progress(message="更新目录大小历史数据...", percent=5)
-            self._update_dir_size_history()
-            
-            # 计算总目录数
-            self._update_clean_progress(message="扫描目录结构...", percent=10)
-            total_dirs = 0
-            for monitor_path in self._monitor_paths:
-                if not os.path.exists(monitor_path):
-                    continue
-                for _ in os.walk(monitor_path):
-                    total_dirs += 1
-            
-            self._clean_progress["total_dirs"] = total_dirs
+            self._update_clean_progress(message="更新目录大小历史数据...", percent=10)
+            self._update_dir_size_history(snapshot)
+            # 部分目录的大小仍来自缓存时，作为清理依据前需要重新统计
+            size_from_cache = snapshot.reused_dirs > 0
             
             # 处理每个监控路径
             processed_dirs = 0
@@ -235,8 +251,9 @@ class TrashClean(_PluginBase):
                     percent=10 + (processed_dirs / (total_dirs or 1)) * 80
                 )
                 
-                # 遍历目录处理垃圾文件
-                for root, dirs, files in os.walk(monitor_path, topdown=False):
+                # 按快照自底向上处理垃圾文件
+                for dir_node in snapshot.dirs(monitor_path):
+                    root = dir_node.path
                     processed_dirs += 1
                     
                     # 更新进度
@@ -251,23 +268,28 @@ class TrashClean(_PluginBase):
                         continue
                     
                     # 处理空目录
-                    if self._empty_dir_cleanup and not files and not dirs:
+                    if self._empty_dir_cleanup and not dir_node.file_count and not dir_node.dir_count:
                         # 主目录不删除
                         if root != monitor_path:
-                            if self._remove_directory(root):
+                            if self._remove_empty_directory(root):
+                                snapshot.remove(root)
                                 dir_info = {"path": root, "type": "empty", "size": 0}
                                 result["removed_dirs"].append(dir_info)
                                 self._clean_progress["removed_dirs"].append(dir_info)
                                 result["removed_empty_dirs_count"] += 1
                         continue
                     
-                    # 计算目录大小
-                    dir_size_bytes = self._get_directory_size(root)
+                    # 目录大小（已扣除本次删除的子目录）
+                    dir_size_bytes = dir_node.size
+                    # 缓存的大小不反映目录内文件的原地修改（如下载中的文件），满足清理条件时以实际大小为准
+                    if size_from_cache and root != monitor_path and self._is_size_cleanup_candidate(root, dir_size_bytes):
+                        dir_size_bytes = self._recount_dir_size(snapshot, root)
                     dir_size_mb = dir_size_bytes / (1024 * 1024)
                     
                     # 处理小体积目录
                     if self._small_dir_cleanup and dir_size_mb <= self._small_dir_max_size and root != monitor_path:
                         if self._remove_directory(root):
+                            snapshot.remove(root)
                             dir_info = {"path": root, "type": "small", "size": dir_size_mb}
                             result["removed_dirs"].append(dir_info)
                             self._clean_progress["removed_dirs"].append(dir_info)
@@ -291,6 +313,7 @@ class TrashClean(_PluginBase):
                                 logger.info(f"{log_prefix}: 目录 {root} 体积减少 {reduction_percent:.2f}%, 超过阈值 {self._size_reduction_threshold}%, 将被清理")
                                 
                                 if root != monitor_path and self._remove_directory(root):
+                                    snapshot.remove(root)
                                     dir_info = {
                                         "path": root, 
                                         "type": "size_reduction", 
@@ -305,13 +328,13 @@ class TrashClean(_PluginBase):
                                     # 从历史记录中移除已删除的目录
                                     if root in self._dir_size_history:
                                         logger.debug(f"{log_prefix}: 从历史记录中移除已删除的目录: {root}")
-                                        del self._dir_size_history[root]
+                                        self._delete_dir_history([root])
                                     
                                     continue
             
             # 保存更新后的历史数据
             self._update_clean_progress(message="保存历史数据...", percent=90)
-            self._save_history_data()
+            self._save_history_data(snapshot)
             
             # 发送通知
             if self._notify and (result["removed_empty_dirs_count"] > 0 or 
@@ -326,7 +349,7 @@ class TrashClean(_PluginBase):
             
             # 更新目录统计并保存
             self._update_clean_progress(message="更新目录统计...", percent=99)
-            self._update_and_save_dir_stats()
+            self._refresh_dir_stats(snapshot)
             
             # 标记清理完成
             self._update_clean_progress(
@@ -423,16 +446,6 @@ class TrashClean(_PluginBase):
                 
         return False
     
-    def _get_directory_size(self, path: str) -> int:
-        """获取目录大小(字节)"""
-        total_size = 0
-        for dirpath, _, filenames in os.walk(path):
-            for f in filenames:
-                fp = os.path.join(dirpath, f)
-                if os.path.exists(fp):
-                    total_size += os.path.getsize(fp)
-        return total_size
-    
     def _remove_directory(self, dir_path: str) -> bool:
         """删除目录"""
         try:
@@ -444,99 +457,228 @@ class TrashClean(_PluginBase):
             logger.error(f"{self.plugin_name}: 删除目录 {dir_path} 失败: {str(e)}")
         return False
     
-    def _update_dir_size_history(self):
+    def _remove_empty_directory(self, dir_path: str) -> bool:
+        """删除空目录，扫描后目录中新增了内容时删除失败，不会误删新文件"""
+        try:
+            os.rmdir(dir_path)
+            logger.info(f"{self.plugin_name}: 已删除空目录: {dir_path}")
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            if e.errno in (errno.ENOTEMPTY, errno.EEXIST):
+                logger.info(f"{self.plugin_name}: 目录 {dir_path} 在扫描后已有新内容，跳过删除")
+            else:
+                logger.error(f"{self.plugin_name}: 删除目录 {dir_path} 失败: {str(e)}")
+        return False
+    
+    def _scan_monitor_paths(self, paths: Optional[List[str]] = None, use_cache: bool = False,
+                            on_dir: Optional[Callable[[str], None]] = None) -> ScanSnapshot:
+        """
+        扫描监控路径，每个路径只遍历一次，各监控路径及其一级子目录由线程池并行扫描
+        :param paths: 要扫描的路径，默认为所有监控路径
+        :param use_cache: 修改时间未变化的目录在缓存有效期内使用目录大小索引中的缓存，不重新读取
+        :param on_dir: 每个目录扫描完成后的回调 (path)，在扫描线程中调用
+        """
+        snapshot = ScanSnapshot()
+        cache = None
+        if use_cache and self._size_index and self._scan_cache_hours > 0:
+            try:
+                cache = self._size_index.load_scan_cache(self._scan_cache_hours)
+            except Exception as e:
+                logger.error(f"{self.plugin_name}: 读取目录大小索引失败，将完整扫描: {str(e)}")
+        roots = []
+        for monitor_path in self._monitor_paths if paths is None else paths:
+            if monitor_path and os.path.exists(monitor_path) and monitor_path not in roots:
+                roots.append(monitor_path)
+        results = scan_trees(
+            roots,
+            workers=self._scan_workers,
+            on_error=lambda path, e: logger.warning(f"{self.plugin_name}: 读取目录 {path} 失败: {str(e)}"),
+            cache=cache,
+            on_dir=on_dir
+        )
+        for monitor_path, dirs in zip(roots, results):
+            snapshot.add_root(monitor_path, dirs)
+        return snapshot
+    
+    def _count_scanned_dir(self, path: str):
+        """扫描线程每完成一个目录调用一次，定期更新扫描进度"""
+        with self._progress_lock:
+            scanned_dirs = self._clean_progress.get("scanned_dirs", 0) + 1
+            self._clean_progress["scanned_dirs"] = scanned_dirs
+            if scanned_dirs % 100 == 0:
+                self._clean_progress["current_dir"] = path
+                self._clean_progress["message"] = f"扫描目录结构，已扫描 {scanned_dirs} 个目录..."
+    
+    @staticmethod
+    def _parse_scan_workers(value: Any) -> int:
+        """解析并行扫描线程数，无效时使用默认值"""
+        try:
+            return min(max(int(value), 1), 32)
+        except (TypeError, ValueError):
+            return 4
+    
+    @staticmethod
+    def _parse_scan_cache_hours(value: Any) -> int:
+        """解析扫描缓存有效期，无效时使用默认值"""
+        try:
+            return min(max(int(value), 0), 24 * 7)
+        except (TypeError, ValueError):
+            return 12
+    
+    def _is_size_cleanup_candidate(self, path: str, size_bytes: int) -> bool:
+        """按大小判断目录是否满足小体积或体积减少的清理条件"""
+        if self._small_dir_cleanup and size_bytes / (1024 * 1024) <= self._small_dir_max_size:
+            return True
+        if self._size_reduction_cleanup and path in self._dir_size_history:
+            previous_size = self._dir_size_history[path].get("size", 0)
+            if previous_size > 0 and size_bytes > 0 and previous_size > size_bytes:
+                return ((previous_size - size_bytes) / previous_size) * 100 >= self._size_reduction_threshold
+        return False
+    
+    def _recount_dir_size(self, snapshot: ScanSnapshot, path: str) -> int:
+        """重新统计目录的实际大小(字节)，并更正快照中该目录及其父目录的大小"""
+        dirs = scan_tree(path)
+        if not dirs:
+            return snapshot.get(path).size
+        size = dirs[-1].size
+        if size != snapshot.get(path).size:
+            logger.debug(f"{self.plugin_name}: 目录 {path} 实际大小 {size/(1024*1024):.2f}MB 与缓存不同")
+            snapshot.resize(path, size)
+        return size
+    
+    def _update_dir_size_history(self, snapshot: ScanSnapshot):
         """更新目录大小历史数据"""
         now = datetime.now()
         
-        # 遍历监控路径下的所有子目录
-        for monitor_path in self._monitor_paths:
-            if not os.path.exists(monitor_path):
+        # 找出需要新增或按扫描间隔更新记录的目录
+        due_dirs = []
+        for dir_info in snapshot:
+            root = dir_info.path
+            # 跳过排除目录
+            if self._is_excluded_dir(root):
                 continue
+            if root not in self._dir_size_history:
+                due_dirs.append(dir_info)
+                continue
+            last_update = datetime.strptime(
+                self._dir_size_history[root]["last_update"], 
+                "%Y-%m-%d %H:%M:%S"
+            )
+            if (now - last_update).total_seconds() / 3600 >= self._scan_interval:
+                due_dirs.append(dir_info)
+        
+        # 历史数据是体积减少清理的基准，其中使用缓存的目录可能因文件原地修改而大小过时，写入前重新统计
+        self._refresh_cached_subtrees(snapshot, due_dirs)
+        
+        for dir_info in due_dirs:
+            root, dir_size = dir_info.path, dir_info.size
+            if root not in self._dir_size_history:
+                # 新增目录记录
+                self._set_dir_history(root, dir_size, now.strftime("%Y-%m-%d %H:%M:%S"))
+                logger.debug(f"{self.plugin_name}: 新增目录记录: {root}, 大小: {dir_size/(1024*1024):.2f}MB")
+            else:
+                # 超过扫描间隔，记录旧值和新值
+                old_size = self._dir_size_history[root]["size"]
+                if old_size > 0 and dir_size > 0 and old_size > dir_size:
+                    reduction_percent = ((old_size - dir_size) / old_size) * 100
+                    logger.debug(f"{self.plugin_name}: 目录 {root} 体积减少: 从 {old_size/(1024*1024):.2f}MB 减少到 {dir_size/(1024*1024):.2f}MB, 减少了 {reduction_percent:.2f}%")
                 
-            for root, _, _ in os.walk(monitor_path):
-                # 跳过排除目录
-                if self._is_excluded_dir(root):
-                    continue
-                
-                # 计算目录大小
-                dir_size = self._get_directory_size(root)
-                
-                if root not in self._dir_size_history:
-                    # 新增目录记录
-                    self._dir_size_history[root] = {
-                        "size": dir_size,
-                        "last_update": now.strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                    logger.debug(f"{self.plugin_name}: 新增目录记录: {root}, 大小: {dir_size/(1024*1024):.2f}MB")
-                else:
-                    # 根据扫描间隔更新
-                    last_update = datetime.strptime(
-                        self._dir_size_history[root]["last_update"], 
-                        "%Y-%m-%d %H:%M:%S"
-                    )
-                    
-                    # 如果超过扫描间隔，更新记录
-                    if (now - last_update).total_seconds() / 3600 >= self._scan_interval:
-                        # 记录旧值和新值
-                        old_size = self._dir_size_history[root]["size"]
-                        if old_size > 0 and dir_size > 0 and old_size > dir_size:
-                            reduction_percent = ((old_size - dir_size) / old_size) * 100
-                            logger.debug(f"{self.plugin_name}: 目录 {root} 体积减少: 从 {old_size/(1024*1024):.2f}MB 减少到 {dir_size/(1024*1024):.2f}MB, 减少了 {reduction_percent:.2f}%")
-                        
-                        self._dir_size_history[root] = {
-                            "size": dir_size,
-                            "last_update": now.strftime("%Y-%m-%d %H:%M:%S")
-                        }
+                self._set_dir_history(root, dir_size, now.strftime("%Y-%m-%d %H:%M:%S"))
+    
+    def _refresh_cached_subtrees(self, snapshot: ScanSnapshot, dirs: List[DirInfo]):
+        """重新读取 dirs 及其子目录中使用缓存的目录，使这些目录的大小反映文件的原地修改"""
+        if not snapshot.reused_dirs or not dirs:
+            return
+        targets = {dir_info.path for dir_info in dirs}
+        stale = []
+        for dir_info in snapshot:
+            if not dir_info.reused:
+                continue
+            node = dir_info
+            while node and node.path not in targets:
+                node = node.parent
+            if node:
+                stale.append(dir_info)
+        count = snapshot.refresh(
+            stale, on_error=lambda path, e: logger.warning(f"{self.plugin_name}: 读取目录 {path} 失败: {str(e)}"))
+        if count:
+            logger.info(f"{self.plugin_name}: 更新历史数据前重新统计了 {count} 个使用缓存的目录")
+    
+    def _set_dir_history(self, path: str, size: int, last_update: str):
+        """更新一条历史数据，同时写入目录大小索引"""
+        self._dir_size_history[path] = {
+            "size": size,
+            "last_update": last_update
+        }
+        if self._size_index:
+            self._size_index.set_history(path, size, last_update)
+    
+    def _delete_dir_history(self, paths: List[str]):
+        """删除历史数据，同时从目录大小索引中删除"""
+        for path in paths:
+            self._dir_size_history.pop(path, None)
+        if self._size_index:
+            self._size_index.delete_history(paths)
+    
+    def _open_size_index(self):
+        """打开目录大小索引，首次使用时导入旧版本的 JSON 历史数据"""
+        if self._size_index:
+            return
+        self._size_index = DirSizeIndex(str(self._plugin_dir / "dir_size_index.db"))
+        history_file = self._plugin_dir / "history_data.json"
+        if history_file.exists():
+            count = self._size_index.import_history_file(str(history_file))
+            logger.info(f"{self.plugin_name}: 已将 {count} 条历史数据导入目录大小索引")
     
     def _load_history_data(self):
         """加载历史数据"""
         try:
-            history_file = self._plugin_dir / "history_data.json"
-            if history_file.exists():
-                import json
-                with open(history_file, "r", encoding="utf-8") as f:
-                    self._dir_size_history = json.load(f)
-                logger.info(f"{self.plugin_name}: 成功加载历史数据，共 {len(self._dir_size_history)} 条记录")
+            self._open_size_index()
+            self._dir_size_history = self._size_index.load_history()
+            logger.info(f"{self.plugin_name}: 成功加载历史数据，共 {len(self._dir_size_history)} 条记录")
         except Exception as e:
             logger.error(f"{self.plugin_name}: 加载历史数据失败: {str(e)}")
             self._dir_size_history = {}
     
-    def _save_history_data(self):
-        """保存历史数据"""
+    def _save_history_data(self, snapshot: ScanSnapshot):
+        """
+        保存历史数据
+        :param snapshot: 本次扫描的目录快照（已同步清理结果），用于确定当前监控的目录
+        """
         try:
-            history_file = self._plugin_dir / "history_data.json"
+            # 当前存在的目录，来自本次扫描的快照（已排除清理删除的目录）
+            current_dirs = set(snapshot.current_dirs())
             
-            # 清理历史数据：只保留当前监控路径下的目录数据
+            # 清理历史数据：只移除不再监控或确认已不存在的目录数据
             if self._dir_size_history:
                 logger.info(f"{self.plugin_name}: 开始清理历史数据，当前共 {len(self._dir_size_history)} 条记录")
                 
-                # 获取当前所有监控路径
-                current_monitored_paths = []
-                for monitor_path in self._monitor_paths:
-                    if os.path.exists(monitor_path):
-                        current_monitored_paths.append(os.path.normpath(monitor_path))
-                        # 遍历该监控路径下的所有子目录
-                        for root, _, _ in os.walk(monitor_path):
-                            current_monitored_paths.append(os.path.normpath(root))
-                
-                # 标准化路径格式
-                current_monitored_paths = [path.replace('\\', '/') for path in current_monitored_paths]
-                
-                # 仅保留当前监控路径下的目录数据
-                new_history = {}
-                for path, data in self._dir_size_history.items():
+                # 标准化路径格式后按集合查找，每条记录只需一次哈希查找
+                current_monitored_paths = {os.path.normpath(root).replace('\\', '/') for root in current_dirs}
+                monitor_prefixes = tuple(os.path.normpath(root).replace('\\', '/').rstrip('/') + '/'
+                                         for root in snapshot.roots)
+                stale_paths = []
+                for path in self._dir_size_history:
                     norm_path = os.path.normpath(path).replace('\\', '/')
-                    if any(norm_path.startswith(monitored_path) for monitored_path in current_monitored_paths):
-                        new_history[path] = data
+                    if norm_path in current_monitored_paths:
+                        continue
+                    # 快照中没有的目录可能只是本次读取失败，仍存在时保留其历史数据
+                    if (norm_path + '/').startswith(monitor_prefixes) and os.path.exists(path):
+                        continue
+                    stale_paths.append(path)
                 
                 # 更新历史数据
-                removed_count = len(self._dir_size_history) - len(new_history)
-                self._dir_size_history = new_history
-                logger.info(f"{self.plugin_name}: 历史数据清理完成，共移除 {removed_count} 条不再监控的路径数据，保留 {len(self._dir_size_history)} 条记录")
-            
-            import json
-            with open(history_file, "w", encoding="utf-8") as f:
-                json.dump(self._dir_size_history, f, ensure_ascii=False, indent=2)
+                self._delete_dir_history(stale_paths)
+                logger.info(f"{self.plugin_name}: 历史数据清理完成，共移除 {len(stale_paths)} 条不再监控的路径数据，保留 {len(self._dir_size_history)} 条记录")
+            
+            if self._size_index:
+                # 保存扫描缓存，已删除的目录不再保留
+                for monitor_path in snapshot.roots:
+                    self._size_index.save_scan(monitor_path, snapshot.dirs(monitor_path), current_dirs,
+                                               snapshot.started_ns)
+                self._size_index.commit()
             logger.info(f"{self.plugin_name}: 成功保存历史数据，共 {len(self._dir_size_history)} 条记录")
         except Exception as e:
             logger.error(f"{self.plugin_name}: 保存历史数据失败: {str(e)}")
@@ -598,6 +740,8 @@ class TrashClean(_PluginBase):
             "size_reduction_cleanup": self._size_reduction_cleanup,
             "size_reduction_threshold": self._size_reduction_threshold,
             "scan_interval": self._scan_interval,
+            "scan_workers": self._scan_workers,
+            "scan_cache_hours": self._scan_cache_hours,
             "exclude_dirs": self._exclude_dirs
         }
 
@@ -627,6 +771,12 @@ class TrashClean(_PluginBase):
             self._size_reduction_cleanup = config_payload.get('size_reduction_cleanup', False)
             self._size_reduction_threshold = config_payload.get('size_reduction_threshold', 80)
             self._scan_interval = config_payload.get('scan_interval', 24)
+            # 未提供时保留当前设置
+            self._scan_workers = self._parse_scan_workers(config_payload.get('scan_workers', self._scan_workers))
+            config_payload["scan_workers"] = self._scan_workers
+            self._scan_cache_hours = self._parse_scan_cache_hours(
+                config_payload.get('scan_cache_hours', self._scan_cache_hours))
+            config_payload["scan_cache_hours"] = self._scan_cache_hours
             self._exclude_dirs = config_payload.get('exclude_dirs', [])
             
             # 保存配置
@@ -740,9 +890,7 @@ class TrashClean(_PluginBase):
             
             # 统计目录信息
             try:
-                total_size = self._get_directory_size(path)
-                file_count = sum(len(files) for _, _, files in os.walk(path))
-                dir_count = sum(len(dirs) for _, dirs, _ in os.walk(path))
+                total_size, file_count, dir_count = self._scan_monitor_paths([path]).stats(path)
                 
                 result.append({
                     "path": path,
@@ -944,6 +1092,9 @@ class TrashClean(_PluginBase):
                 self._scheduler.shutdown()
             self._scheduler = None
             logger.info(f"{self.plugin_name}: 服务已停止")
+        if self._size_index:
+            self._size_index.close()
+            self._size_index = None
 
     def _get_downloader_status(self) -> List[Dict[str, Any]]:
         """获取所有下载器状态"""
@@ -1228,29 +1379,40 @@ class TrashClean(_PluginBase):
                              current_dir=None, removed_dirs=None, status=None, 
                              message=None, percent=None):
         """更新清理进度信息"""
-        if running is not None:
-            self._clean_progress["running"] = running
-        if total_dirs is not None:
-            self._clean_progress["total_dirs"] = total_dirs
-        if processed_dirs is not None:
-            self._clean_progress["processed_dirs"] = processed_dirs
-        if current_dir is not None:
-            self._clean_progress["current_dir"] = current_dir
-        if removed_dirs is not None:
-            self._clean_progress["removed_dirs"] = removed_dirs
-        if status is not None:
-            self._clean_progress["status"] = status
-        if message is not None:
-            self._clean_progress["message"] = message
-        if percent is not None:
-            self._clean_progress["percent"] = percent
+        with self._progress_lock:
+            if running is not None:
+                self._clean_progress["running"] = running
+            if total_dirs is not None:
+                self._clean_progress["total_dirs"] = total_dirs
+            if processed_dirs is not None:
+                self._clean_progress["processed_dirs"] = processed_dirs
+            if current_dir is not None:
+                self._clean_progress["current_dir"] = current_dir
+            if removed_dirs is not None:
+                self._clean_progress["removed_dirs"] = removed_dirs
+            if status is not None:
+                self._clean_progress["status"] = status
+            if message is not None:
+                self._clean_progress["message"] = message
+            if percent is not None:
+                self._clean_progress["percent"] = percent
     
     def _get_clean_progress(self) -> Dict[str, Any]:
         """获取清理进度"""
-        return self._clean_progress
+        with self._progress_lock:
+            progress = dict(self._clean_progress)
+            progress["removed_dirs"] = list(progress.get("removed_dirs", []))
+        return progress
         
     def _update_and_save_dir_stats(self):
         """更新并保存目录统计"""
+        return self._refresh_dir_stats()
+    
+    def _refresh_dir_stats(self, snapshot: Optional[ScanSnapshot] = None):
+        """
+        统计各监控路径的大小、文件数和目录数并保存
+        :param snapshot: 清理任务的目录快照，提供时直接使用，不再重新遍历
+        """
         try:
             # 获取当前时间
             now = datetime.now(tz=pytz.timezone(settings.TZ))
@@ -1267,14 +1429,8 @@ class TrashClean(_PluginBase):
             # 记录开始时间
             start_time = time.time()
             
-            # 获取所有需要扫描的目录
-            total_dirs = 0
-            valid_paths = []
-            
             # 先检查哪些路径存在
-            for monitor_path in self._monitor_paths:
-                if os.path.exists(monitor_path):
-                    valid_paths.append(monitor_path)
+            valid_paths = [monitor_path for monitor_path in self._monitor_paths if os.path.exists(monitor_path)]
             
             if not valid_paths:
                 logger.warning(f"{self.plugin_name}: 没有有效的监控路径")
@@ -1285,52 +1441,25 @@ class TrashClean(_PluginBase):
                     "message": "没有有效的监控路径"
                 }
             
-            # 统计总目录数，用于进度计算
-            logger.info(f"{self.plugin_name}: 开始统计目录总数...")
-            progress_data["message"] = "统计目录总数..."
-            progress_data["progress"] = 5
-            self._dir_stats_cache = progress_data.copy()
-            
-            for path in valid_paths:
-                for _ in os.walk(path):
-                    total_dirs += 1
-                    
-            logger.info(f"{self.plugin_name}: 共发现 {total_dirs} 个目录")
-            
             # 初始化结果数组
             result = []
-            processed_dirs = 0
             
             # 处理每个监控路径
-            for path in valid_paths:
+            for index, path in enumerate(valid_paths):
                 # 更新进度
-                processed_percentage = 10 + (processed_dirs / (total_dirs or 1)) * 80
                 progress_data["message"] = f"扫描路径: {path}"
-                progress_data["progress"] = int(processed_percentage)
+                progress_data["progress"] = int(10 + (index / len(valid_paths)) * 80)
                 self._dir_stats_cache = progress_data.copy()
                 
                 logger.info(f"{self.plugin_name}: 开始处理监控路径: {path}")
                 
                 # 统计目录信息
                 try:
-                    # 计算总大小
-                    total_size = self._get_directory_size(path)
-                    
-                    # 统计文件和目录数量
-                    file_count = 0
-                    dir_count = 0
-                    
-                    for root, dirs, files in os.walk(path):
-                        processed_dirs += 1
-                        dir_count += len(dirs)
-                        file_count += len(files)
-                        
-                        # 定期更新进度
-                        if processed_dirs % 10 == 0:
-                            processed_percentage = 10 + (processed_dirs / (total_dirs or 1)) * 80
-                            progress_data["message"] = f"扫描目录: {root}"
-                            progress_data["progress"] = int(processed_percentage)
-                            self._dir_stats_cache = progress_data.copy()
+                    # 清理任务已扫描过的路径直接使用其快照，否则单独扫描一次
+                    path_snapshot = snapshot
+                    if path_snapshot is None or path not in path_snapshot.roots:
+                        path_snapshot = self._scan_monitor_paths([path])
+                    total_size, file_count, dir_count = path_snapshot.stats(path)
                     
                     # 添加到结果
                     result.append({
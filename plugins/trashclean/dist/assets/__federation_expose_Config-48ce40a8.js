@@ -42,6 +42,8 @@ const _sfc_main = defineComponent({
         size_reduction_cleanup: false,
         size_reduction_threshold: 80,
         scan_interval: 24,
+        scan_workers: 4,
+        scan_cache_hours: 12,
         exclude_dirs: []
       },
       originalConfig: null,
@@ -140,6 +142,8 @@ const _sfc_main = defineComponent({
           size_reduction_cleanup: state.editableConfig.size_reduction_cleanup,
           size_reduction_threshold: parseInt(state.editableConfig.size_reduction_threshold) || 80,
           scan_interval: parseInt(state.editableConfig.scan_interval) || 24,
+          scan_workers: parseInt(state.editableConfig.scan_workers) || 4,
+          scan_cache_hours: Number.isNaN(parseInt(state.editableConfig.scan_cache_hours)) ? 12 : parseInt(state.editableConfig.scan_cache_hours),
           exclude_dirs: state.editableConfig.exclude_dirs || []
         };
         
@@ -709,6 +713,38 @@ function _sfc_render(_ctx, _cache, $props, $setup, $data, $options) {
                             disabled: _ctx.saving,
                             density: "compact"
                           }, null, 8, ["modelValue", "rules", "disabled"]),
+                          _createVNode(_component_v_text_field, {
+                            modelValue: _ctx.editableConfig.scan_workers,
+                            "onUpdate:modelValue": _cache[58] || (_cache[58] = $event => ((_ctx.editableConfig.scan_workers) = $event)),
+                            modelModifiers: { number: true },
+                            label: "并行扫描线程数",
+                            type: "number",
+                            variant: "outlined",
+                            min: 1,
+                            max: 32,
+                            rules: [v => v === null || v === '' || (Number.isInteger(Number(v)) && Number(v) >= 1 && Number(v) <= 32) || '必须是1-32之间的整数'],
+                            hint: "各监控路径及其一级子目录并行扫描，监控路径位于不同磁盘或网络存储时可适当调大",
+                            "persistent-hint": "",
+                            disabled: _ctx.saving,
+                            density: "compact",
+                            class: "mt-3"
+                          }, null, 8, ["modelValue", "rules", "disabled"]),
+                          _createVNode(_component_v_text_field, {
+                            modelValue: _ctx.editableConfig.scan_cache_hours,
+                            "onUpdate:modelValue": _cache[59] || (_cache[59] = $event => ((_ctx.editableConfig.scan_cache_hours) = $event)),
+                            modelModifiers: { number: true },
+                            label: "扫描缓存有效期(小时)",
+                            type: "number",
+                            variant: "outlined",
+                            min: 0,
+                            max: 168,
+                            rules: [v => v === null || v === '' || (Number.isInteger(Number(v)) && Number(v) >= 0 && Number(v) <= 168) || '必须是0-168之间的整数'],
+                            hint: "有效期内未变化的目录沿用上次读取的大小；文件被原地截断或改写时目录修改时间不变，有效期内可能漏判小体积或体积减少的目录。设为0则每次完整扫描",
+                            "persistent-hint": "",
+                            disabled: _ctx.saving,
+                            density: "compact",
+                            class: "mt-3"
+                          }, null, 8, ["modelValue", "rules", "disabled"]),
                           _createElementVNode("div", _hoisted_13, [
                             _createElementVNode("div", _hoisted_14, [
                               _createVNode(_component_v_icon, {
@@ -1,6 +1,6 @@
 import { importShared } from './__federation_fn_import-054b33c3.js';
 import Page from './__federation_expose_Page-59789d8c.js';
-import Config from './__federation_expose_Config-f5e3c41a.js';
+import Config from './__federation_expose_Config-48ce40a8.js';
 import { _ as _export_sfc } from './_plugin-vue_export-helper-c4c0bc37.js';
 import { p as propsFactory, i as includes, a as isOn, e as eventName, g as genericComponent, b as getCurrentInstance, m as makeLayoutProps, c as makeThemeProps, d as provideTheme, f as createLayout, u as useRtl, h as provideDefaults, j as convertToUnit, k as destructComputed, l as isCssColor, n as isParsableColor, o as parseColor, q as getForeground, r as getCurrentInstanceName, s as isObject, S as SUPPORTS_INTERSECTION, t as clamp, v as consoleWarn, w as makeLayoutItemProps, x as useProxiedModel, y as useToggleScope, z as useLayoutItem, A as deepEqual, B as wrapInArray, C as findChildrenWithProvide, I as IconValue, D as useTheme, E as useIcon, F as flattenFragments, G as useResizeObserver, H as IN_BROWSER, J as hasEvent, K as keyCodes, L as useLocale, M as EventProp, N as filterInputAttrs, O as matchesSelector, P as omit, Q as callEvent, R as pick, T as makeDisplayProps, U as useDisplay, V as useGoTo, W as focusableChildren, X as consoleError, Y as defineComponent$1, Z as deprecate, _ as getPropertyFromItem, $ as isPrimitive, a0 as focusChild, a1 as CircularBuffer, a2 as defer, a3 as templateRef, a4 as isClickInsideElement, a5 as getNextElement, a6 as debounce, a7 as ensureValidVNode, a8 as checkPrintable, a9 as noop, aa as pickWithRest, ab as keys, ac as getEventCoordinates, ad as HSVtoRGB, ae as RGBtoHSV, af as HSVtoHSL, ag as HSLtoHSV, ah as HSVtoHex, ai as HexToHSV, aj as has, ak as getDecimals, al as createRange, am as keyValues, an as SUPPORTS_EYE_DROPPER, ao as HSVtoCSS, ap as RGBtoCSS, aq as getContrast, ar as isComposingIgnoreKey, as as getObjectValueByPath, at as isEmpty, au as defineFunctionalComponent, av as breakpoints, aw as useDate, ax as humanReadableFileSize, ay as provideLocale, az as useLayout, aA as VuetifyLayoutKey, aB as refElement, aC as VClassIcon, aD as VComponentIcon, aE as VLigatureIcon, aF as VSvgIcon, aG as aliases, aH as mdi } from './date-1a9a1148.js';
 
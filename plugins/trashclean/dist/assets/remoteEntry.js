@@ -64,7 +64,7 @@ const currentImports = {};
       return __federation_import('./__federation_expose_Page-59789d8c.js').then(module =>Object.keys(module).every(item => exportSet.has(item)) ? () => module.default : () => module)},
 "./Config":()=>{
       dynamicLoadingCss(["Config-9f79c6ea.css"], false, './Config');
-      return __federation_import('./__federation_expose_Config-f5e3c41a.js').then(module =>Object.keys(module).every(item => exportSet.has(item)) ? () => module.default : () => module)},
+      return __federation_import('./__federation_expose_Config-48ce40a8.js').then(module =>Object.keys(module).every(item => exportSet.has(item)) ? () => module.default : () => module)},
 "./Dashboard":()=>{
       dynamicLoadingCss(["Dashboard-a2f1da0f.css"], false, './Dashboard');
       return __federation_import('./__federation_expose_Dashboard-e8365cec.js').then(module =>Object.keys(module).every(item => exportSet.has(item)) ? () => module.default : () => module)},};
@@ -0,0 +1,335 @@
+"""
+目录扫描模块
+"""
+import os
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class DirInfo:
+    """
+    快照中的一个目录，文件数和子目录数与 os.walk 返回的 files、dirs 一致
+    """
+    __slots__ = ("path", "parent", "own_size", "size", "file_count", "dir_count", "mtime_ns", "reused")
+
+    def __init__(self, path: str, parent: Optional["DirInfo"], own_size: int, file_count: int, dir_count: int,
+                 mtime_ns: int, reused: bool = False):
+        self.path = path
+        self.parent = parent  # 父目录，扫描起点为 None
+        self.own_size = own_size  # 直接包含的文件总大小
+        self.size = own_size  # 包含所有子目录的总大小
+        self.file_count = file_count  # 直接包含的文件数（含符号链接）
+        self.dir_count = dir_count  # 直接包含的子目录数（含指向目录的符号链接和无法读取的目录）
+        self.mtime_ns = mtime_ns
+        self.reused = reused  # 目录内容来自缓存，未重新读取
+
+
+def _list_dir(path: str) -> Tuple[int, int, int, List[Tuple[str, int]]]:
+    """
+    读取目录的直接内容
+    :return: (直接包含的文件总大小, 文件数, 子目录数, [(需要进入的子目录路径, 修改时间), ...])
+
+    与 os.walk 的分类保持一致：指向目录的符号链接视为目录但不进入，不计大小；
+    指向文件的符号链接按目标文件大小计算，失效的链接计入文件数但不计大小
+    """
+    own_size = file_count = dir_count = 0
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                dir_count += 1
+                if not entry.is_symlink():
+                    try:
+                        mtime_ns = entry.stat(follow_symlinks=False).st_mtime_ns
+                    except OSError:
+                        mtime_ns = 0
+                    subdirs.append((entry.path, mtime_ns))
+                continue
+            file_count += 1
+            try:
+                own_size += entry.stat().st_size
+            except OSError:
+                continue
+    return own_size, file_count, dir_count, subdirs
+
+
+def _read_cached(path: str, mtime_ns: int, cache: Optional[Dict[str, Any]]) \
+        -> Optional[Tuple[int, int, int, List[Tuple[str, int]]]]:
+    """
+    修改时间未变化时使用缓存的目录内容，只需 stat 各子目录以获取其修改时间
+    :param cache: {目录路径: CachedDir}，见 DirSizeIndex.load_scan_cache
+    :return: 与 _list_dir 相同；没有可用的缓存时返回 None
+    """
+    cached = cache.get(path) if cache else None
+    if not cached or cached.mtime_ns != mtime_ns:
+        return None
+    subdirs = []
+    for subdir in cached.subdirs:
+        try:
+            st = os.stat(subdir, follow_symlinks=False)
+        except OSError:
+            return None
+        if not stat.S_ISDIR(st.st_mode):
+            return None
+        subdirs.append((subdir, st.st_mtime_ns))
+    return cached.own_size, cached.file_count, cached.dir_count, subdirs
+
+
+def scan_tree(root: str, on_error: Optional[Callable[[str, OSError], None]] = None,
+              cache: Optional[Dict[str, Any]] = None, on_dir: Optional[Callable[[str], None]] = None) -> List[DirInfo]:
+    """
+    一次后序遍历扫描 root 下的所有目录
+
+    每个目录只读取一次，子目录完成后将其总大小累加到父目录，
+    避免对每个目录重新遍历整棵子树（深层目录树下接近平方级的开销）
+    :param root: 起始目录
+    :param on_error: 读取目录出错时的回调 (path, error)，无法读取的目录不出现在结果中，与 os.walk 一致
+    :param cache: 上次扫描的目录内容 {目录路径: CachedDir}，修改时间未变化的目录不再重新读取
+    :param on_dir: 每个目录扫描完成后的回调 (path)
+    :return: 按后序排列的目录（子目录在父目录之前，与 os.walk(topdown=False) 的顺序一致），路径拼接方式与 os.walk 相同
+    """
+    result: List[DirInfo] = []
+    try:
+        mtime_ns = os.stat(root).st_mtime_ns
+        listing = _read_cached(root, mtime_ns, cache)
+        reused = listing is not None
+        own_size, file_count, dir_count, subdirs = listing if reused else _list_dir(root)
+    except OSError as e:
+        if on_error:
+            on_error(root, e)
+        return result
+    # 栈元素: (目录, 未处理的子目录迭代器)
+    stack = [(DirInfo(root, None, own_size, file_count, dir_count, mtime_ns, reused), iter(subdirs))]
+    while stack:
+        info, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            result.append(info)
+            if on_dir:
+                on_dir(info.path)
+            if info.parent:
+                info.parent.size += info.size
+            continue
+        child_path, mtime_ns = child
+        listing = _read_cached(child_path, mtime_ns, cache)
+        reused = listing is not None
+        if not reused:
+            try:
+                listing = _list_dir(child_path)
+            except OSError as e:
+                if on_error:
+                    on_error(child_path, e)
+                continue
+        own_size, file_count, dir_count, subdirs = listing
+        stack.append((DirInfo(child_path, info, own_size, file_count, dir_count, mtime_ns, reused),
+                      iter(subdirs)))
+    return result
+
+
+def scan_trees(roots: List[str], workers: int = 1, on_error: Optional[Callable[[str, OSError], None]] = None,
+               cache: Optional[Dict[str, Any]] = None,
+               on_dir: Optional[Callable[[str], None]] = None) -> List[List[DirInfo]]:
+    """
+    扫描多个目录，各目录的一级子目录作为独立任务在线程池中并行扫描
+
+    监控路径常位于不同的磁盘或网络存储上，按一级子目录拆分后，单个监控路径内部也能并行读取。
+    各目录本身在调用线程中读取，子目录的结果按目录读取的顺序合并，与逐个调用 scan_tree 的结果（含顺序）一致
+    :param roots: 起始目录
+    :param workers: 最大并行线程数，不大于 1 时在调用线程中依次扫描
+    :param on_error: 读取目录出错时的回调 (path, error)，可能在多个线程中同时调用
+    :param cache: 上次扫描的目录内容，见 scan_tree，扫描过程中只读
+    :param on_dir: 每个目录扫描完成后的回调 (path)，可能在多个线程中同时调用
+    :return: 与 roots 顺序对应的扫描结果
+    """
+    if workers <= 1:
+        return [scan_tree(root, on_error=on_error, cache=cache, on_dir=on_dir) for root in roots]
+    tops: List[Tuple[Optional[DirInfo], List[Tuple[str, int]]]] = []
+    for root in roots:
+        try:
+            mtime_ns = os.stat(root).st_mtime_ns
+            listing = _read_cached(root, mtime_ns, cache)
+            reused = listing is not None
+            own_size, file_count, dir_count, subdirs = listing if reused else _list_dir(root)
+        except OSError as e:
+            if on_error:
+                on_error(root, e)
+            tops.append((None, []))
+            continue
+        tops.append((DirInfo(root, None, own_size, file_count, dir_count, mtime_ns, reused), subdirs))
+    results: List[List[DirInfo]] = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="trashclean-scan") as pool:
+        futures = [[pool.submit(scan_tree, path, on_error, cache, on_dir) for path, _ in subdirs]
+                   for _, subdirs in tops]
+        for (info, _), subtree_futures in zip(tops, futures):
+            if info is None:
+                results.append([])
+                continue
+            dirs: List[DirInfo] = []
+            for future in subtree_futures:
+                subtree = future.result()
+                if not subtree:
+                    continue
+                # 子树的最后一项是其起始目录
+                subtree[-1].parent = info
+                info.size += subtree[-1].size
+                dirs.extend(subtree)
+            dirs.append(info)
+            if on_dir:
+                on_dir(info.path)
+            results.append(dirs)
+    return results
+
+
+class ScanSnapshot:
+    """
+    一次扫描得到的所有监控路径的目录快照：目录树、大小、文件数、子目录数和修改时间
+
+    清理任务的各个阶段（计数、历史数据、清理判断、历史数据精简、目录统计）都使用同一份快照，
+    清理过程中删除的目录通过 remove 同步到快照中，后续阶段看到的结果与重新遍历一致
+    """
+
+    def __init__(self):
+        self.roots: List[str] = []
+        self.started_ns = time.time_ns()  # 扫描开始的时间
+        self._by_root: Dict[str, List[DirInfo]] = {}
+        self._dirs: Dict[str, DirInfo] = {}
+        self._removed: Dict[str, DirInfo] = {}
+
+    def add_root(self, root: str, dirs: List[DirInfo]):
+        """
+        添加一个监控路径的扫描结果
+        :param dirs: scan_tree 的返回值
+        """
+        self.roots.append(root)
+        self._by_root[root] = dirs
+        for info in dirs:
+            self._dirs[info.path] = info
+
+    @property
+    def reused_dirs(self) -> int:
+        """
+        使用缓存、未重新读取的目录数
+        """
+        return sum(1 for info in self if info.reused)
+
+    def __len__(self) -> int:
+        return sum(len(dirs) for dirs in self._by_root.values())
+
+    def __iter__(self) -> Iterator[DirInfo]:
+        for dirs in self._by_root.values():
+            yield from dirs
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._dirs
+
+    def get(self, path: str) -> Optional[DirInfo]:
+        return self._dirs.get(path)
+
+    def dirs(self, root: str) -> List[DirInfo]:
+        """
+        监控路径下按后序排列的所有目录（包含本次已删除的目录）
+        """
+        return self._by_root.get(root, [])
+
+    def remove(self, path: str):
+        """
+        记录已删除的目录：从其各级父目录的大小中扣除该目录的大小，该目录及其下所有目录不再视为存在
+        """
+        info = self._dirs.get(path)
+        if not info or path in self._removed:
+            return
+        self._removed[path] = info
+        parent = info.parent
+        while parent:
+            parent.size -= info.size
+            parent = parent.parent
+
+    def resize(self, path: str, size: int):
+        """
+        更正目录的总大小（如删除前重新统计的结果），差值同步到其各级父目录
+        """
+        info = self._dirs.get(path)
+        if not info:
+            return
+        delta = size - info.size
+        while info:
+            info.size += delta
+            info = info.parent
+
+    def refresh(self, dirs: Iterable[DirInfo], on_error: Optional[Callable[[str, OSError], None]] = None) -> int:
+        """
+        重新读取使用缓存的目录，更正其直接文件大小和文件数，大小差值同步到其各级父目录
+
+        缓存的目录修改时间未变化，子目录结构仍然有效，只有目录内文件的原地修改（截断、改写）需要重新统计
+        :param dirs: 需要重新读取的目录，未使用缓存或本次已删除的目录会被忽略
+        :param on_error: 读取目录出错时的回调 (path, error)，出错的目录保留缓存的结果
+        :return: 重新读取的目录数
+        """
+        count = 0
+        for info in dirs:
+            if not info.reused or info.path in self._removed:
+                continue
+            try:
+                own_size, file_count, dir_count, _ = _list_dir(info.path)
+            except OSError as e:
+                if on_error:
+                    on_error(info.path, e)
+                continue
+            delta = own_size - info.own_size
+            info.own_size, info.file_count, info.dir_count = own_size, file_count, dir_count
+            info.reused = False
+            node = info
+            while node:
+                node.size += delta
+                node = node.parent
+            count += 1
+        return count
+
+    def _gone_dirs(self, dirs: List[DirInfo]) -> Set[str]:
+        """
+        已不存在的目录：本次删除的目录及其下的所有目录
+        按父目录在前的顺序（后序的逆序）检查，每个目录只需查看其父目录，总开销与目录数成正比
+        """
+        gone: Set[str] = set()
+        if not self._removed:
+            return gone
+        for info in reversed(dirs):
+            if info.path in self._removed or (info.parent is not None and info.parent.path in gone):
+                gone.add(info.path)
+        return gone
+
+    def current_dirs(self) -> Iterator[str]:
+        """
+        当前存在的所有目录
+        """
+        for dirs in self._by_root.values():
+            gone = self._gone_dirs(dirs)
+            for info in dirs:
+                if info.path not in gone:
+                    yield info.path
+
+    def stats(self, root: str) -> Tuple[int, int, int]:
+        """
+        监控路径的统计，已扣除本次删除的目录
+        :return: (总大小, 文件总数, 目录总数)，与对 os.walk 结果求和一致
+        """
+        dirs = self._by_root.get(root)
+        if not dirs:
+            return 0, 0, 0
+        gone = self._gone_dirs(dirs)
+        file_count = dir_count = 0
+        for info in dirs:
+            if info.path not in gone:
+                file_count += info.file_count
+                dir_count += info.dir_count
+            elif info.path in self._removed and info.parent is not None and info.parent.path not in gone:
+                # 父目录仍存在，但列出的子目录已被删除
+                dir_count -= 1
+        return dirs[-1].size, file_count, dir_count
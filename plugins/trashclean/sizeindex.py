@@ -0,0 +1,174 @@
+"""
+目录大小索引模块
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Set
+
+if __package__ in (None, ""):
+    from scanner import DirInfo
+else:
+    from plugins.trashclean.scanner import DirInfo
+
+
+class CachedDir(NamedTuple):
+    """
+    上次扫描时读取的目录内容
+    """
+    mtime_ns: int
+    own_size: int
+    file_count: int
+    dir_count: int
+    subdirs: List[str]  # 需要进入的子目录路径
+
+
+class DirSizeIndex:
+    """
+    持久化的目录大小索引
+
+    - 扫描缓存：每个目录的直接文件大小、子树大小、文件数、子目录数和修改时间。
+      目录的修改时间只在其中的条目新增、删除或改名时变化，修改时间不变的目录直接使用缓存，
+      只需 stat 一次以获取子目录的修改时间，无需重新读取目录和 stat 其中的文件，
+      因此再次扫描时只有发生变化的分支会被重新读取。
+      文件被原地截断或改写时目录的修改时间不变，缓存的大小在有效期内不会更新
+    - 历史数据：体积减少清理所用的目录大小基准，逐条更新，不再整体重写
+    """
+
+    # 修改时间与读取时间相差不足该值的目录不使用缓存，避免在读取的同一时刻被修改而无法察觉（纳秒）
+    RACY_WINDOW_NS = 2 * 10 ** 9
+
+    def __init__(self, db_file: str):
+        """
+        :param db_file: 数据库文件路径
+        """
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS dir_scan (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                own_size INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                file_count INTEGER NOT NULL,
+                dir_count INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                checked_ns INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_dir_scan_parent ON dir_scan (parent);
+            CREATE TABLE IF NOT EXISTS size_history (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_update TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def load_scan_cache(self, max_age_hours: float) -> Dict[str, CachedDir]:
+        """
+        读取可用的扫描缓存，供 scan_tree 使用
+        :param max_age_hours: 缓存的有效期（小时），超过后重新读取目录，
+                              限制目录内文件原地修改（不改变目录修改时间）造成偏差的时长
+        :return: {目录路径: CachedDir}
+        """
+        max_age_ns = int(max_age_hours * 3600 * 10 ** 9)
+        now_ns = time.time_ns()
+        cache: Dict[str, CachedDir] = {}
+        children: Dict[str, List[str]] = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, parent, own_size, file_count, dir_count, mtime_ns, checked_ns FROM dir_scan"
+            ).fetchall()
+        for path, parent, own_size, file_count, dir_count, mtime_ns, checked_ns in rows:
+            if parent is not None:
+                children.setdefault(parent, []).append(path)
+            if now_ns - checked_ns > max_age_ns or mtime_ns + self.RACY_WINDOW_NS > checked_ns:
+                continue
+            cache[path] = CachedDir(mtime_ns, own_size, file_count, dir_count, [])
+        for path, subdirs in children.items():
+            cached = cache.get(path)
+            if cached:
+                cached.subdirs.extend(sorted(subdirs))
+        return cache
+
+    def save_scan(self, root: str, dirs: Iterable[DirInfo], current: Set[str], checked_ns: int):
+        """
+        保存一个监控路径的扫描结果：重新读取的目录整行写入，使用缓存的目录只更新子树大小，
+        并删除该路径下已不存在的目录
+        :param dirs: 该路径下的所有目录
+        :param current: 当前存在的目录（已排除本次删除的目录）
+        :param checked_ns: 扫描开始的时间（time.time_ns()）
+        """
+        listed = []
+        reused = []
+        for info in dirs:
+            if info.path not in current:
+                continue
+            if info.reused:
+                reused.append((info.size, info.path, info.size))
+            else:
+                listed.append((info.path, info.parent.path if info.parent else None, info.own_size, info.size,
+                               info.file_count, info.dir_count, info.mtime_ns, checked_ns))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO dir_scan (path, parent, own_size, size, file_count, dir_count, mtime_ns, "
+                "checked_ns) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", listed)
+            self._conn.executemany("UPDATE dir_scan SET size = ? WHERE path = ? AND size != ?", reused)
+            # 按路径区间查找 root 下的记录（"/" 之后的字符是 "0"），不受路径中通配符的影响
+            prefix = root.rstrip(os.sep) + os.sep
+            stale = [(path,) for path, in self._conn.execute(
+                "SELECT path FROM dir_scan WHERE path = ? OR (path >= ? AND path < ?)",
+                (root, prefix, prefix[:-1] + chr(ord(os.sep) + 1)))
+                     if path not in current]
+            self._conn.executemany("DELETE FROM dir_scan WHERE path = ?", stale)
+
+    def load_history(self) -> Dict[str, Dict[str, Any]]:
+        """
+        读取全部历史数据
+        :return: {目录路径: {"size": 字节数, "last_update": 更新时间}}
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT path, size, last_update FROM size_history").fetchall()
+        return {path: {"size": size, "last_update": last_update} for path, size, last_update in rows}
+
+    def set_history(self, path: str, size: int, last_update: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO size_history (path, size, last_update) VALUES (?, ?, ?)",
+                               (path, size, last_update))
+
+    def delete_history(self, paths: Iterable[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM size_history WHERE path = ?", ((path,) for path in paths))
+
+    def import_history_file(self, history_file: str) -> int:
+        """
+        导入旧版本的 JSON 历史数据，导入后将原文件改名保留
+        :return: 导入的记录数
+        """
+        with open(history_file, "r", encoding="utf-8") as f:
+            history = json.load(f)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO size_history (path, size, last_update) VALUES (?, ?, ?)",
+                ((path, data.get("size", 0), data.get("last_update", "")) for path, data in history.items()))
+            self._conn.commit()
+        os.replace(history_file, f"{history_file}.bak")
+        return len(history)
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        """
+        提交并关闭数据库
+        """
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,15 @@
+"""
+单元测试只覆盖不依赖 MoviePilot 的模块
+
+插件包的 __init__.py 需要 MoviePilot 运行环境，因此将插件目录加入 sys.path，
+按模块名直接导入（各模块在 __package__ 为空时使用同目录导入）
+"""
+import os
+import sys
+
+PLUGINS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "plugins")
+
+for plugin in ("smarthardlink", "trashclean"):
+    plugin_dir = os.path.join(PLUGINS_DIR, plugin)
+    if plugin_dir not in sys.path:
+        sys.path.insert(0, plugin_dir)
@@ -0,0 +1,50 @@
+from filetable import FileTable
+from walker import FileRecord
+
+
+def _record(path: str, size: int, dev: int = 1, ino: int = 0) -> FileRecord:
+    return FileRecord(path, size, dev, ino, 1_700_000_000_000_000_000, 1)
+
+
+def _groups(table: FileTable):
+    return [(size, {dev: [table.path(row) for row in rows] for dev, rows in by_dev.items()})
+            for size, by_dev in table.iter_size_groups()]
+
+
+def test_empty_table():
+    assert list(FileTable().iter_size_groups()) == []
+
+
+def test_groups_by_size_ascending_then_by_device():
+    table = FileTable()
+    table.extend([
+        _record("/a/big1", 300, dev=1, ino=1),
+        _record("/a/small", 100, dev=1, ino=2),
+        _record("/b/big2", 300, dev=2, ino=3),
+        _record("/a/big3", 300, dev=1, ino=4),
+        _record("/a/mid", 200, dev=1, ino=5),
+    ])
+    assert _groups(table) == [
+        (100, {1: ["/a/small"]}),
+        (200, {1: ["/a/mid"]}),
+        (300, {1: ["/a/big1", "/a/big3"], 2: ["/b/big2"]}),
+    ]
+
+
+def test_rows_restore_records():
+    records = [_record("/lib/show/e01.mkv", 500, ino=1), _record("/lib/show/e02.mkv", 500, ino=2),
+               _record("/lib/other/e01.mkv", 500, ino=3)]
+    table = FileTable()
+    table.extend(records)
+    (size, by_dev), = table.iter_size_groups()
+    assert size == 500
+    assert table.records(by_dev[1]) == records
+    assert table.dir_count() == 2
+
+
+def test_undecodable_names_round_trip():
+    path = "/lib/" + b"caf\xe9.mkv".decode("utf-8", "surrogateescape")
+    table = FileTable()
+    table.append(_record(path, 10))
+    (_, by_dev), = table.iter_size_groups()
+    assert table.record(by_dev[1][0]).path == path
@@ -0,0 +1,121 @@
+import os
+
+import pytest
+
+from linker import LinkExecutor, recover_journal
+from walker import FileRecord
+
+
+def _write(path, data: bytes) -> FileRecord:
+    path.write_bytes(data)
+    st = os.lstat(path)
+    return FileRecord(str(path), st.st_size, st.st_dev, st.st_ino, st.st_mtime_ns, st.st_nlink)
+
+
+def _temps(directory):
+    return [name for name in os.listdir(directory) if name.startswith(".shl-")]
+
+
+class _Crash(BaseException):
+    pass
+
+
+@pytest.fixture
+def pair(tmp_path):
+    media = tmp_path / "media"
+    media.mkdir()
+    source = _write(media / "source.mkv", b"x" * 4096)
+    target = _write(media / "copy.mkv", b"x" * 4096)
+    return media, source, target
+
+
+def _crash_before_replace(monkeypatch, executor: LinkExecutor):
+    """
+    临时链接创建后、替换前中断，留下意图日志和临时链接
+    """
+    def crash(*args, **kwargs):
+        raise _Crash()
+
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(_Crash):
+        executor.flush()
+    monkeypatch.undo()
+
+
+def test_flush_links_and_clears_journal(tmp_path, pair):
+    media, source, target = pair
+    results = []
+    executor = LinkExecutor(str(tmp_path / "journal.jsonl"), lambda op, error: results.append(error))
+    executor.add(source, target)
+    assert executor.pending == 1
+    executor.flush()
+    assert results == [None]
+    assert os.stat(target.path).st_ino == source.ino
+    assert _temps(media) == []
+    assert (tmp_path / "journal.jsonl").read_text() == ""
+
+
+def test_long_target_name(tmp_path):
+    media = tmp_path / "media"
+    media.mkdir()
+    source = _write(media / "source.mkv", b"y" * 100)
+    target = _write(media / ("t" * 250 + ".mkv"), b"y" * 100)
+    results = []
+    executor = LinkExecutor(str(tmp_path / "journal.jsonl"), lambda op, error: results.append(error))
+    executor.add(source, target)
+    executor.flush()
+    assert results == [None]
+    assert os.stat(target.path).st_ino == source.ino
+
+
+def test_changed_target_is_kept(tmp_path, pair):
+    media, source, target = pair
+    results = []
+    executor = LinkExecutor(str(tmp_path / "journal.jsonl"), lambda op, error: results.append(error))
+    executor.add(source, target)
+    with open(target.path, "ab") as f:
+        f.write(b"new")
+    executor.flush()
+    assert results == ["文件已变化"]
+    assert os.stat(target.path).st_ino == target.ino
+    assert _temps(media) == []
+
+
+def test_recover_replays_interrupted_link(tmp_path, pair, monkeypatch):
+    media, source, target = pair
+    journal = tmp_path / "journal.jsonl"
+    executor = LinkExecutor(str(journal), lambda op, error: None)
+    executor.add(source, target)
+    _crash_before_replace(monkeypatch, executor)
+    assert len(_temps(media)) == 1
+    assert os.stat(target.path).st_ino == target.ino
+
+    assert recover_journal(str(journal)) == (1, 0)
+    assert os.stat(target.path).st_ino == source.ino
+    assert _temps(media) == []
+    assert journal.read_text() == ""
+    assert recover_journal(str(journal)) == (0, 0)
+
+
+def test_recover_rolls_back_when_target_changed(tmp_path, pair, monkeypatch):
+    media, source, target = pair
+    journal = tmp_path / "journal.jsonl"
+    executor = LinkExecutor(str(journal), lambda op, error: None)
+    executor.add(source, target)
+    _crash_before_replace(monkeypatch, executor)
+    with open(target.path, "ab") as f:
+        f.write(b"edited after the crash")
+
+    assert recover_journal(str(journal)) == (0, 1)
+    assert os.stat(target.path).st_ino == target.ino
+    assert os.path.getsize(target.path) == 4096 + len(b"edited after the crash")
+    assert _temps(media) == []
+
+
+def test_recover_skips_incomplete_journal(tmp_path, pair):
+    _, source, target = pair
+    journal = tmp_path / "journal.jsonl"
+    journal.write_text('{"source": "' + source.path + '", "tar')
+    assert recover_journal(str(journal)) == (0, 0)
+    assert os.stat(target.path).st_ino == target.ino
+    assert recover_journal(str(tmp_path / "missing.jsonl")) == (0, 0)
@@ -0,0 +1,62 @@
+from walker import ExcludeMatcher
+
+
+def test_dir_prefixes():
+    matcher = ExcludeMatcher(exclude_dirs=["/media/tv/skip", "/media/tv/skip/deeper", " ", "/media/other"])
+    assert matcher.is_excluded("/media/tv/skip/a.mkv")
+    assert matcher.is_excluded("/media/tv/skip/deeper/b.mkv")
+    assert matcher.is_excluded("/media/other/c.mkv")
+    assert not matcher.is_excluded("/media/tv/keep/a.mkv")
+    assert not matcher.is_excluded("/media/a.mkv")
+
+
+def test_dir_excluded_with_and_without_trailing_separator():
+    matcher = ExcludeMatcher(exclude_dirs=["/media/tv/skip/"])
+    assert matcher.is_dir_excluded("/media/tv/skip")
+    assert matcher.is_dir_excluded("/media/tv/skip/season 1")
+    assert not matcher.is_dir_excluded("/media/tv/skipped")
+    assert not matcher.is_dir_excluded("/media/tv")
+
+
+def test_extensions_ignore_case_and_dot():
+    matcher = ExcludeMatcher(exclude_extensions=["NFO", " jpg ", ""])
+    assert matcher.is_excluded("/media/movie/movie.nfo")
+    assert matcher.is_excluded("/media/movie/poster.JPG")
+    assert not matcher.is_excluded("/media/movie/movie.mkv")
+    assert not matcher.is_excluded("/media/movie/nfo")
+
+
+def test_keywords_merged_into_one_pattern():
+    matcher = ExcludeMatcher(exclude_keywords=["sample", r"\.part$"])
+    assert matcher.is_excluded("/media/movie/sample/clip.mkv")
+    assert matcher.is_excluded("/media/movie/movie.mkv.part")
+    assert not matcher.is_excluded("/media/movie/movie.mkv")
+
+
+def test_keywords_with_backreferences_matched_separately():
+    # 合并后 \1 会指向前一个表达式的分组
+    matcher = ExcludeMatcher(exclude_keywords=["(a)b", r"(x)\1"])
+    assert matcher.is_excluded("/media/xx/movie.mkv")
+    assert matcher.is_excluded("/media/ab/movie.mkv")
+    assert not matcher.is_excluded("/media/x/movie.mkv")
+
+
+def test_keywords_with_duplicate_group_names():
+    matcher = ExcludeMatcher(exclude_keywords=["(?P<n>y)", "(?P<n>z)"])
+    assert matcher.is_excluded("/media/y/movie.mkv")
+    assert matcher.is_excluded("/media/z/movie.mkv")
+
+
+def test_invalid_keyword_reported_and_ignored():
+    invalid = []
+    matcher = ExcludeMatcher(exclude_keywords=["[unclosed", "trailer"],
+                             on_invalid=lambda keyword, error: invalid.append(keyword))
+    assert invalid == ["[unclosed"]
+    assert matcher.is_excluded("/media/trailer/movie.mkv")
+    assert not matcher.is_excluded("/media/[unclosed/movie.mkv")
+
+
+def test_no_rules():
+    matcher = ExcludeMatcher()
+    assert not matcher.is_dir_excluded("/media")
+    assert not matcher.is_excluded("/media/movie.mkv")
@@ -0,0 +1,93 @@
+import os
+import shutil
+
+import pytest
+
+from scanner import ScanSnapshot, scan_tree
+
+
+def _walk_stats(root: str):
+    """
+    用 os.walk 统计 (总大小, 文件总数, 目录总数)，作为快照统计的参照
+    """
+    size = file_count = dir_count = 0
+    for dir_path, dirs, files in os.walk(root):
+        file_count += len(files)
+        dir_count += len(dirs)
+        size += sum(os.path.getsize(os.path.join(dir_path, name)) for name in files)
+    return size, file_count, dir_count
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """
+    root/
+      top.bin          10
+      a/x.bin          100
+      a/a1/y.bin       1000
+      b/z.bin          10000
+    """
+    root = tmp_path / "root"
+    (root / "a" / "a1").mkdir(parents=True)
+    (root / "b").mkdir()
+    for path, size in (("top.bin", 10), ("a/x.bin", 100), ("a/a1/y.bin", 1000), ("b/z.bin", 10000)):
+        (root / path).write_bytes(b"x" * size)
+    return str(root)
+
+
+@pytest.fixture
+def snapshot(tree):
+    snapshot = ScanSnapshot()
+    snapshot.add_root(tree, scan_tree(tree))
+    return snapshot
+
+
+def test_snapshot_matches_walk(tree, snapshot):
+    assert snapshot.stats(tree) == _walk_stats(tree) == (11110, 4, 3)
+    assert snapshot.get(os.path.join(tree, "a")).size == 1100
+
+
+def test_remove_matches_walk_after_delete(tree, snapshot):
+    removed = os.path.join(tree, "a")
+    shutil.rmtree(removed)
+    snapshot.remove(removed)
+    assert snapshot.stats(tree) == _walk_stats(tree) == (10010, 2, 1)
+    assert set(snapshot.current_dirs()) == {tree, os.path.join(tree, "b")}
+    # 已删除的目录仍保留在快照中，不再视为存在
+    assert removed in snapshot
+
+
+def test_remove_nested_then_parent(tree, snapshot):
+    nested = os.path.join(tree, "a", "a1")
+    parent = os.path.join(tree, "a")
+    snapshot.remove(nested)
+    assert snapshot.get(parent).size == 100
+    assert snapshot.stats(tree) == (10110, 3, 2)
+    snapshot.remove(parent)
+    shutil.rmtree(parent)
+    assert snapshot.stats(tree) == _walk_stats(tree)
+
+
+def test_remove_twice_or_unknown_is_noop(tree, snapshot):
+    removed = os.path.join(tree, "b")
+    snapshot.remove(removed)
+    snapshot.remove(removed)
+    snapshot.remove(os.path.join(tree, "missing"))
+    assert snapshot.stats(tree) == (1110, 3, 2)
+
+
+def test_resize_propagates_to_ancestors(tree, snapshot):
+    nested = os.path.join(tree, "a", "a1")
+    snapshot.resize(nested, 400)
+    assert snapshot.get(nested).size == 400
+    assert snapshot.get(os.path.join(tree, "a")).size == 500
+    assert snapshot.stats(tree)[0] == 10510
+    snapshot.resize(os.path.join(tree, "missing"), 1)
+    assert snapshot.stats(tree)[0] == 10510
+
+
+def test_resize_then_remove(tree, snapshot):
+    nested = os.path.join(tree, "a", "a1")
+    snapshot.resize(nested, 0)
+    snapshot.remove(os.path.join(tree, "a"))
+    assert snapshot.stats(tree)[0] == 10010
@@ -0,0 +1,79 @@
+import os
+import time
+
+import pytest
+
+from scanner import scan_tree
+from sizeindex import DirSizeIndex
+
+HOUR_NS = 3600 * 10 ** 9
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """
+    root/{a,b}，各含一个文件，目录修改时间设为一天前
+    """
+    root = tmp_path / "root"
+    for name, size in (("a", 100), ("b", 200)):
+        (root / name).mkdir(parents=True)
+        (root / name / "file.bin").write_bytes(b"x" * size)
+    old_ns = time.time_ns() - 24 * HOUR_NS
+    for path in (root / "a", root / "b", root):
+        os.utime(path, ns=(old_ns, old_ns))
+    return str(root)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DirSizeIndex(str(tmp_path / "data" / "size_index.db"))
+    yield index
+    index.close()
+
+
+def _save(index: DirSizeIndex, root: str, checked_ns: int):
+    dirs = scan_tree(root)
+    index.save_scan(root, dirs, {info.path for info in dirs}, checked_ns)
+    index.commit()
+
+
+def test_cache_reused_on_next_scan(tree, index):
+    _save(index, tree, time.time_ns())
+    cache = index.load_scan_cache(12)
+    assert set(cache) == {tree, os.path.join(tree, "a"), os.path.join(tree, "b")}
+    assert cache[tree].subdirs == [os.path.join(tree, "a"), os.path.join(tree, "b")]
+    assert cache[os.path.join(tree, "b")].own_size == 200
+
+    dirs = scan_tree(tree, cache=cache)
+    assert all(info.reused for info in dirs)
+    assert dirs[-1].size == 300
+
+
+def test_dirs_modified_close_to_check_time_not_cached(tree, index):
+    # 读取前刚被修改的目录，同一时刻的后续修改可能不改变修改时间
+    recent = os.path.join(tree, "a")
+    os.utime(recent)
+    _save(index, tree, os.stat(recent).st_mtime_ns + DirSizeIndex.RACY_WINDOW_NS // 2)
+    cache = index.load_scan_cache(12)
+    assert recent not in cache
+    assert os.path.join(tree, "b") in cache
+
+    dirs = {info.path: info for info in scan_tree(tree, cache=cache)}
+    assert not dirs[recent].reused
+    assert dirs[os.path.join(tree, "b")].reused
+
+
+def test_cache_expires(tree, index):
+    _save(index, tree, time.time_ns() - 3 * HOUR_NS)
+    assert index.load_scan_cache(2) == {}
+    assert len(index.load_scan_cache(4)) == 3
+
+
+def test_removed_dirs_dropped_from_cache(tree, index):
+    _save(index, tree, time.time_ns())
+    dirs = scan_tree(tree)
+    current = {info.path for info in dirs} - {os.path.join(tree, "a")}
+    index.save_scan(tree, dirs, current, time.time_ns())
+    cache = index.load_scan_cache(12)
+    assert os.path.join(tree, "a") not in cache
+    assert cache[tree].subdirs == [os.path.join(tree, "b")]